@@ -0,0 +1,173 @@
+from config import AppConfig
+
+REASON_RAMP = "clean responses"
+
+class RttEstimator:
+    """Smoothed round-trip time and variance for one host.
+
+    Follows the RFC 6298 retransmission timer: samples come from completed
+    handshakes and RSTs, and the probe timeout is SRTT + 4 * RTTVAR clamped
+    to the configured bounds. Until the first sample arrives the initial
+    timeout is used.
+    """
+
+    __slots__ = ('srtt', 'rttvar', 'samples', 'initial_timeout', 'min_timeout', 'max_timeout')
+
+    def __init__(
+        self,
+        initial_timeout: float = AppConfig.DEFAULT_TIMEOUT,
+        min_timeout: float = AppConfig.MIN_TIMEOUT,
+        max_timeout: float = AppConfig.MAX_TIMEOUT
+    ) -> None:
+        """Initialize the estimator with no samples."""
+        self.srtt = 0.0
+        self.rttvar = 0.0
+        self.samples = 0
+        self.initial_timeout = initial_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+
+    def update(self, rtt: float) -> None:
+        """Fold a measured round-trip time into the smoothed estimate."""
+        if self.samples == 0:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+        self.samples += 1
+
+    def timeout(self, attempt: int = 0) -> float:
+        """Return the probe timeout, doubled for every retry attempt."""
+        if self.samples == 0:
+            timeout = self.initial_timeout
+        else:
+            timeout = self.srtt + 4 * self.rttvar
+        return min(max(timeout * (2 ** attempt), self.min_timeout), self.max_timeout)
+
+class AimdController:
+    """Additive-increase / multiplicative-decrease limit on in-flight probes.
+
+    Until the first back-off the limit grows by `increase` per completed probe
+    (slow start, doubling every window); afterwards it grows by
+    `increase / limit`, i.e. by about `increase` per window of probes.
+    Silence alone is not loss, since filtered ports never answer, so timeouts
+    ramp the limit like answers do. The limit
+    shrinks at once on local socket errors and on proof of a drop, a retry
+    answering after a timeout. It also shrinks when a window of outcomes
+    answers less than `answer_drop` times the host's usual share, or when
+    the window's mean RTT grows past `rtt_growth` times the lowest seen.
+    Decreases are spaced at least `cooldown` seconds apart so one burst of
+    losses is only punished once.
+    """
+
+    __slots__ = (
+        'limit', 'minimum', 'maximum', 'increase', 'decrease', 'answer_drop', 'rtt_growth', 'cooldown',
+        'reason', 'window_total', 'window_answered', 'window_rtt', 'answer_rate', 'rtt_floor',
+        'last_decrease', 'on_change'
+    )
+
+    def __init__(
+        self,
+        initial: float,
+        minimum: float,
+        maximum: float,
+        increase: float = AppConfig.AIMD_INCREASE,
+        decrease: float = AppConfig.AIMD_DECREASE,
+        answer_drop: float = AppConfig.AIMD_ANSWER_DROP,
+        rtt_growth: float = AppConfig.AIMD_RTT_GROWTH,
+        cooldown: float = AppConfig.AIMD_COOLDOWN,
+        on_change=None
+    ) -> None:
+        """Initialize the controller at the given limit."""
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.increase = increase
+        self.decrease = decrease
+        self.answer_drop = answer_drop
+        self.rtt_growth = rtt_growth
+        self.cooldown = cooldown
+        self.reason = "initial"
+        self.window_total = 0
+        self.window_answered = 0
+        self.window_rtt = 0.0
+        # Smoothed share of probes answered, and the lowest mean RTT of a window.
+        self.answer_rate = None
+        self.rtt_floor = None
+        self.last_decrease = float('-inf')
+        self.on_change = on_change
+
+    def current(self) -> int:
+        """Return the current integer limit."""
+        return int(self.limit)
+
+    def _set_limit(self, limit: float, reason: str) -> None:
+        """Apply a new limit and report it if the integer value changed."""
+        previous = self.current()
+        self.limit = min(max(limit, self.minimum), self.maximum)
+        if self.current() != previous:
+            self.reason = reason
+            if self.on_change:
+                self.on_change(self.current(), reason)
+
+    def on_success(self, now: float, rtt: float = None) -> None:
+        """Record a clean response and ramp the limit up."""
+        self._ramp()
+        self._count(now, rtt)
+
+    def on_timeout(self, now: float) -> None:
+        """Record a probe that got no answer; it ramps the limit too and lowers the answer rate."""
+        self._ramp()
+        self._count(now, None, answered=False)
+
+    def _ramp(self) -> None:
+        """Grow the limit after a probe that showed no sign of congestion."""
+        if self.last_decrease == float('-inf'):
+            self._set_limit(self.limit + self.increase, REASON_RAMP)
+        else:
+            self._set_limit(self.limit + self.increase / self.limit, REASON_RAMP)
+
+    def on_loss(self, now: float, reason: str) -> None:
+        """Record proof of a dropped probe, such as a retry answering after a timeout."""
+        self.back_off(now, reason)
+
+    def on_error(self, now: float, reason: str) -> None:
+        """Record a local socket error such as fd or ephemeral port exhaustion."""
+        self.back_off(now, reason)
+
+    def back_off(self, now: float, reason: str) -> None:
+        """Shrink the limit multiplicatively, at most once per cooldown."""
+        if now - self.last_decrease < self.cooldown:
+            return
+        self.last_decrease = now
+        self._set_limit(self.limit * self.decrease, reason)
+
+    def _count(self, now: float, rtt, answered: bool = True) -> None:
+        """Add an outcome to the measurement window and back off if the window got worse."""
+        self.window_total += 1
+        if answered:
+            self.window_answered += 1
+            self.window_rtt += rtt or 0.0
+        if self.window_total < max(self.current(), AppConfig.AIMD_MIN_WINDOW):
+            return
+        total, answers, rtt_sum = self.window_total, self.window_answered, self.window_rtt
+        self.window_total = self.window_answered = 0
+        self.window_rtt = 0.0
+        reason = None
+        if self.answer_rate is not None:
+            expected = self.answer_rate * total
+            # Hosts that rarely answer give too few answers to tell a drop from chance.
+            if expected >= AppConfig.AIMD_MIN_ANSWERS and answers < expected * self.answer_drop:
+                reason = f"answers {answers}/{total}, expected {expected:.0f}"
+        self.answer_rate = answers / total if self.answer_rate is None else 0.75 * self.answer_rate + 0.25 * answers / total
+        if answers:
+            mean = rtt_sum / answers
+            if (self.rtt_floor is not None and mean > self.rtt_floor * self.rtt_growth
+                    and mean - self.rtt_floor > AppConfig.AIMD_RTT_SLACK):
+                reason = reason or f"rtt {mean * 1000:.0f} ms, floor {self.rtt_floor * 1000:.0f} ms"
+                # Backed off once; a path that stays slower becomes the new floor.
+                self.rtt_floor = mean
+            self.rtt_floor = mean if self.rtt_floor is None else min(self.rtt_floor, mean)
+        if reason:
+            self.back_off(now, reason)
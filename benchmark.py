@@ -0,0 +1,356 @@
+"""Loopback benchmark for the scan engine.
+
+Usage: python -m benchmark --open 200 --closed 2000 --filtered 50
+
+Sets up listening (open), unbound (closed) and full-backlog (filtered)
+ports on 127.0.0.1, scans them and writes the measurements as JSON to
+results/benchmarks/ so runs can be compared across commits. Each run is
+forked into a fresh process, so peak memory is measured per run and shard
+processes are accounted for separately.
+"""
+import os
+import sys
+import glob
+import json
+import socket
+import argparse
+import platform
+import threading
+import subprocess
+import multiprocessing
+
+from config import AppConfig
+from manager import TimeManager
+from ports import PortSet
+from scanner import ScanEngine, PORT_OPEN, PORT_CLOSED, PORT_FILTERED, PORT_ERROR
+from scheduler import SCAN_ORDERS
+from sharding import ShardedScanner
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+BENCHMARK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results', 'benchmarks')
+SAMPLE_INTERVAL = 0.01
+
+class LoopbackEnvironment:
+    """Synthetic open, closed and filtered ports on a loopback address.
+
+    Open ports are listeners that are never accepted from. Closed ports are
+    free ports nobody listens on, so the kernel answers with a RST. Filtered
+    ports are listeners with a zero backlog whose only queue slot is taken by
+    a connection that is never accepted, so further SYNs are dropped.
+    """
+
+    def __init__(self, open_count: int, closed_count: int, filtered_count: int, host: str = '127.0.0.1') -> None:
+        """Initialize the environment; nothing is bound until it is entered."""
+        self.host = host
+        self.counts = {PORT_OPEN: open_count, PORT_CLOSED: closed_count, PORT_FILTERED: filtered_count}
+        self.expected = {}
+        self.sockets = []
+
+    def listen(self, backlog: int) -> socket.socket:
+        """Bind a listener to a free port."""
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sockets.append(listener)
+        listener.bind((self.host, 0))
+        listener.listen(backlog)
+        return listener
+
+    def free_port(self) -> int:
+        """Return a port that was free a moment ago and has no listener."""
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            s.bind((self.host, 0))
+            return s.getsockname()[1]
+
+    def fill_backlog(self, port: int) -> None:
+        """Occupy the accept queue of a zero-backlog listener."""
+        filler = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sockets.append(filler)
+        filler.settimeout(1.0)
+        filler.connect((self.host, port))
+
+    def __enter__(self):
+        try:
+            for _ in range(self.counts[PORT_OPEN]):
+                port = self.listen(128).getsockname()[1]
+                self.expected[port] = PORT_OPEN
+            for _ in range(self.counts[PORT_FILTERED]):
+                port = self.listen(0).getsockname()[1]
+                self.fill_backlog(port)
+                self.expected[port] = PORT_FILTERED
+            while len(self.expected) < sum(self.counts.values()):
+                port = self.free_port()
+                self.expected.setdefault(port, PORT_CLOSED)
+        except OSError:
+            self.close()
+            raise
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close every socket of the environment."""
+        for s in self.sockets:
+            s.close()
+        self.sockets = []
+
+class ResourceSampler:
+    """Background sampler of peak thread and file descriptor counts.
+
+    Counts of this process and the sum over its live child processes (the
+    shard workers) are kept apart. Child counts stay None where the platform
+    does not expose them.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL) -> None:
+        """Initialize the sampler."""
+        self.interval = interval
+        self.peak_threads = 0
+        self.peak_fds = None
+        self.peak_child_threads = None
+        self.peak_child_fds = None
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def sample(self) -> None:
+        """Record the current counts."""
+        self.peak_threads = max(self.peak_threads, threading.active_count())
+        fds = count_fds()
+        if fds is not None:
+            self.peak_fds = max(self.peak_fds or 0, fds)
+        pids = child_pids()
+        if pids is None:
+            return
+        # A child that exits between listing and reading counts as zero.
+        threads = sum(count_threads(pid) or 0 for pid in pids)
+        fds = sum(count_fds(pid) or 0 for pid in pids)
+        self.peak_child_threads = max(self.peak_child_threads or 0, threads)
+        self.peak_child_fds = max(self.peak_child_fds or 0, fds)
+
+    def run(self) -> None:
+        """Sample until stopped."""
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def start(self) -> None:
+        """Take a first sample and start sampling in the background."""
+        self.sample()
+        self.thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling and take a last sample."""
+        self.stopped.set()
+        self.thread.join()
+        self.sample()
+
+def count_fds(pid: int = None):
+    """Return the number of open file descriptors of a process, or None where it cannot be counted.
+
+    Without a pid this process is counted.
+    """
+    paths = (f'/proc/{pid}/fd',) if pid else ('/proc/self/fd', '/dev/fd')
+    for path in paths:
+        try:
+            return len(os.listdir(path))
+        except OSError:
+            continue
+    return None
+
+def count_threads(pid: int):
+    """Return the number of threads of a process, or None where it cannot be counted."""
+    try:
+        with open(f'/proc/{pid}/status', encoding='ascii') as file:
+            for line in file:
+                if line.startswith('Threads:'):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+def child_pids():
+    """Return the pids of the live child processes of this process, or None where they cannot be listed.
+
+    The kernel's list is read instead of asking multiprocessing, which would
+    reap the shard workers behind the scanner's back.
+    """
+    paths = glob.glob(f'/proc/{os.getpid()}/task/*/children')
+    if not paths:
+        return None
+    pids = set()
+    for path in paths:
+        try:
+            with open(path, encoding='ascii') as file:
+                pids.update(int(pid) for pid in file.read().split())
+        except OSError:
+            # The thread exited after the listing.
+            continue
+    return pids
+
+def peak_rss_kib(children: bool = False):
+    """Return the peak resident set size in KiB, or None if unknown.
+
+    This is the peak of this process, or with `children` the largest peak of
+    its child processes that have been waited for.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kibibytes.
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+def git_revision():
+    """Return the current git commit of the repository, or None."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmark(environment: LoopbackEnvironment, **options) -> dict:
+    """Scan the environment once and return the measurements."""
+    ports = PortSet.from_ports(environment.expected)
+    processes = options.pop('processes', 1)
+    if processes > 1:
+        engine = ShardedScanner([environment.host], ports, processes=processes, **options)
+    else:
+        engine = ScanEngine([environment.host], ports, **options)
+    found = {}
+    first_result = None
+    sampler = ResourceSampler()
+    sampler.start()
+    start_time = TimeManager.get_current_time()
+    try:
+        for record in engine.results():
+            if first_result is None and record['state'] == PORT_OPEN:
+                first_result = TimeManager.get_elapsed_time(start_time)
+            found[record['port']] = record['state']
+    finally:
+        duration = TimeManager.get_elapsed_time(start_time)
+        sampler.stop()
+
+    states = {}
+    for port, expected in environment.expected.items():
+        counts = states.setdefault(expected, {'expected': 0, 'correct': 0, 'errors': 0})
+        counts['expected'] += 1
+        counts['correct'] += found.get(port) == expected
+        counts['errors'] += found.get(port) == PORT_ERROR
+    opened = states.get(PORT_OPEN, {'expected': 0, 'correct': 0})
+    return {
+        'probes': engine.scanned,
+        'duration': round(duration, 4),
+        'ports_per_second': round(engine.scanned / duration, 1) if duration else None,
+        'time_to_first_result': round(first_result, 4) if first_result is not None else None,
+        'false_negative_rate': (
+            round(1 - opened['correct'] / opened['expected'], 4) if opened['expected'] else None
+        ),
+        'states': states,
+        'peak_rss_kib': peak_rss_kib(),
+        'peak_child_rss_kib': peak_rss_kib(children=True) if processes > 1 else None,
+        'peak_threads': sampler.peak_threads,
+        'peak_fds': sampler.peak_fds,
+        'peak_child_threads': sampler.peak_child_threads,
+        'peak_child_fds': sampler.peak_child_fds,
+        'in_flight_budget': engine.budget.limit,
+        'telemetry': engine.telemetry.snapshot()
+    }
+
+def measure_run(environment: LoopbackEnvironment, options: dict, sender) -> None:
+    """Run one benchmark and send its measurements back; the target of a run process."""
+    sender.send(run_benchmark(environment, **options))
+    sender.close()
+
+def run_isolated(environment: LoopbackEnvironment, **options) -> dict:
+    """Run one benchmark in a fresh process and return the measurements.
+
+    ru_maxrss only ever grows, so measuring every run in the same process
+    would report the peak of the largest run so far. The run process is
+    forked so it inherits the environment's sockets; where fork is not
+    available the run happens in this process instead.
+    """
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        return run_benchmark(environment, **options)
+    context = multiprocessing.get_context('fork')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=measure_run, args=(environment, options, sender))
+    process.start()
+    sender.close()
+    try:
+        return receiver.recv()
+    except EOFError:
+        process.join()
+        raise RuntimeError(f"Benchmark run failed with exit code {process.exitcode}") from None
+    finally:
+        receiver.close()
+        process.join()
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser for the benchmark."""
+    parser = argparse.ArgumentParser(prog='python -m benchmark', description='Benchmark the scan engine on loopback.')
+    parser.add_argument('--open', type=int, default=200, help='number of listening ports')
+    parser.add_argument('--closed', type=int, default=2000, help='number of ports without a listener')
+    parser.add_argument('--filtered', type=int, default=50, help='number of ports that drop connection attempts')
+    parser.add_argument('--runs', type=int, default=1, help='number of scans of the same environment')
+    parser.add_argument('-t', '--timeout', type=float, default=AppConfig.DEFAULT_TIMEOUT, help='initial connect timeout in seconds')
+    parser.add_argument('-r', '--retries', type=int, default=AppConfig.DEFAULT_RETRIES, help='retries for probes that timed out')
+    parser.add_argument('-c', '--concurrency', type=int, default=AppConfig.DEFAULT_CONCURRENCY, help='upper bound for probes in flight')
+    parser.add_argument('-P', '--processes', type=int, default=AppConfig.DEFAULT_PROCESSES, help='number of worker processes')
+    parser.add_argument('--order', choices=SCAN_ORDERS, default=AppConfig.DEFAULT_SCAN_ORDER, help='probe order')
+    parser.add_argument('-o', '--output', metavar='PATH', help=f'JSON output file; defaults to a new file in {BENCHMARK_DIR}')
+    return parser
+
+def main(argv=None) -> int:
+    """Run the benchmark and save the results."""
+    args = build_parser().parse_args(argv)
+    options = {
+        'timeout': args.timeout,
+        'retries': args.retries,
+        'concurrency': args.concurrency,
+        'processes': args.processes,
+        'order': args.order
+    }
+    try:
+        environment = LoopbackEnvironment(args.open, args.closed, args.filtered)
+        with environment:
+            runs = []
+            for index in range(args.runs):
+                run = run_isolated(environment, report=(PORT_OPEN, PORT_CLOSED, PORT_FILTERED, PORT_ERROR), **options)
+                runs.append(run)
+                print(
+                    f"Run {index + 1}: {run['probes']} probes in {run['duration']:.2f}s, "
+                    f"{run['ports_per_second']} ports/s, first result {run['time_to_first_result']}s, "
+                    f"false negatives {run['false_negative_rate']}",
+                    file=sys.stderr
+                )
+    except OSError as e:
+        print(f"Could not set up the loopback environment: {e}", file=sys.stderr)
+        return 1
+
+    report = {
+        'timestamp': TimeManager.get_formatted_time(),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'environment': {'open': args.open, 'closed': args.closed, 'filtered': args.filtered},
+        'options': options,
+        'runs': runs
+    }
+    output = args.output
+    if not output:
+        os.makedirs(BENCHMARK_DIR, exist_ok=True)
+        stamp = report['timestamp'].replace(' ', '_').replace(':', '-')
+        output = os.path.join(BENCHMARK_DIR, f"benchmark_{stamp}_{report['revision'] or 'unknown'}.json")
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=4)
+    print(f"Results saved to {output}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
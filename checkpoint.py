@@ -0,0 +1,181 @@
+import os
+import json
+from itertools import islice
+
+from config import AppConfig
+from manager import TimeManager
+from portstate import PortStateStore
+from results import target_file_name
+
+# 2: shards generate their own residue class of the schedule instead of slicing it.
+CHECKPOINT_VERSION = 2
+CHECKPOINT_PREFIX = 'checkpoint_'
+
+def checkpoint_path(results_dir: str, target: str) -> str:
+    """Return the checkpoint file of a target; a target has at most one unfinished scan."""
+    return os.path.join(results_dir, f"{CHECKPOINT_PREFIX}{target_file_name(target)}.json")
+
+def replace_file(path: str, data: bytes) -> None:
+    """Write a file atomically, so a crash leaves either the old or the new version."""
+    temporary = f"{path}.tmp"
+    with open(temporary, 'wb') as file:
+        file.write(data)
+    os.replace(temporary, path)
+
+class ScheduleCursor:
+    """Completed part of a deterministic probe schedule.
+
+    Workers finish probes out of order, so the cursor keeps a watermark below
+    which every schedule index is done plus the sparse set of done indices
+    above it. The set stays about as large as the number of probes in flight.
+    """
+
+    __slots__ = ('watermark', 'completed')
+
+    def __init__(self, watermark: int = 0, completed=()) -> None:
+        """Initialize the cursor."""
+        self.watermark = watermark
+        self.completed = set(completed)
+
+    def complete(self, index: int) -> None:
+        """Mark a schedule index as done."""
+        if index != self.watermark:
+            self.completed.add(index)
+            return
+        self.watermark += 1
+        completed = self.completed
+        while self.watermark in completed:
+            completed.remove(self.watermark)
+            self.watermark += 1
+
+    def count(self) -> int:
+        """Return the number of completed probes."""
+        return self.watermark + len(self.completed)
+
+    def remaining(self, probes):
+        """Yield (index, probe) for the probes of the schedule that are not done yet.
+
+        Skipping to the watermark still walks the schedule, which is cheap
+        next to probing; nothing below it is probed again.
+        """
+        completed = self.completed
+        for index, probe in enumerate(islice(probes, self.watermark, None), self.watermark):
+            if index not in completed:
+                yield index, probe
+
+    def to_dict(self) -> dict:
+        """Return a JSON-serializable copy."""
+        return {'watermark': self.watermark, 'completed': sorted(self.completed)}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'ScheduleCursor':
+        """Build a cursor from to_dict output."""
+        return cls(data['watermark'], data['completed'])
+
+class Checkpoint:
+    """Periodically saved position of a scan, enough to resume it after a stop or crash.
+
+    The JSON file holds the scan parameters in `meta`, the phase being
+    scanned, one ScheduleCursor per shard of that phase and the probe count
+    of earlier phases. Open ports found so far are kept in the file unless
+    they are already streamed to an NDJSON sink, which is then flushed before
+    every save. An optional PortStateStore is saved next to it as .pss.
+    Findings are recorded before the cursor that covers them, so a resumed
+    scan neither re-probes completed work nor loses results.
+    """
+
+    def __init__(self, path: str, meta: dict, sink=None, store: PortStateStore = None,
+                 interval: float = AppConfig.CHECKPOINT_INTERVAL) -> None:
+        """Initialize an empty checkpoint for a new scan."""
+        self.path = path
+        self.meta = meta
+        self.sink = sink
+        self.stream = sink.path if sink is not None else None
+        self.store = store
+        self.interval = interval
+        self.phase = 0
+        self.scanned_before = 0
+        self.cursors = []
+        self.findings = []
+        self.open_count = 0
+        self.last_save = TimeManager.get_current_time()
+
+    @property
+    def store_path(self) -> str:
+        """Return the path of the port state file saved with the checkpoint."""
+        return os.path.splitext(self.path)[0] + '.pss'
+
+    def add_finding(self, record: dict) -> None:
+        """Remember an open port, unless the sink already keeps it."""
+        self.open_count += 1
+        if self.stream is None:
+            self.findings.append(record)
+
+    def resume_cursors(self):
+        """Return the ScheduleCursor of every shard of the current phase, or None at its start."""
+        return [ScheduleCursor.from_dict(cursor) for cursor in self.cursors] or None
+
+    def finish_phase(self, engine) -> None:
+        """Move on to the next phase after an engine has scanned all of its schedule."""
+        self.phase += 1
+        self.scanned_before += engine.scanned
+        self.cursors = []
+        self.save()
+
+    def update(self, engine) -> None:
+        """Take the cursors of an engine whose results have all been consumed."""
+        self.cursors = [cursor.to_dict() for cursor in engine.cursors()]
+
+    def save(self, engine=None) -> None:
+        """Write the checkpoint, taking the cursors from the engine first if given."""
+        if engine is not None:
+            self.update(engine)
+        if self.sink is not None:
+            self.sink.flush()
+        if self.store is not None:
+            replace_file(self.store_path, self.store.to_bytes())
+        state = {
+            'version': CHECKPOINT_VERSION,
+            'timestamp': TimeManager.get_formatted_time(),
+            'meta': self.meta,
+            'stream': self.stream,
+            'phase': self.phase,
+            'scanned_before': self.scanned_before,
+            'cursors': self.cursors,
+            'open_count': self.open_count,
+            'findings': self.findings
+        }
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        replace_file(self.path, json.dumps(state).encode('utf-8'))
+        self.last_save = TimeManager.get_current_time()
+
+    def maybe_save(self, engine=None) -> None:
+        """Save if the checkpoint interval has passed since the last save."""
+        if TimeManager.get_elapsed_time(self.last_save) >= self.interval:
+            self.save(engine)
+
+    def remove(self) -> None:
+        """Delete the checkpoint files once the scan has completed."""
+        for path in (self.path, self.store_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    @classmethod
+    def load(cls, path: str) -> 'Checkpoint':
+        """Read a checkpoint; the caller reopens the sink at `stream`, if any."""
+        with open(path, encoding='utf-8') as file:
+            state = json.load(file)
+        if state.get('version') != CHECKPOINT_VERSION:
+            raise ValueError(f"Unsupported checkpoint version: {state.get('version')}")
+        checkpoint = cls(path, state['meta'])
+        checkpoint.stream = state['stream']
+        checkpoint.phase = state['phase']
+        checkpoint.scanned_before = state['scanned_before']
+        checkpoint.cursors = state['cursors']
+        checkpoint.open_count = state['open_count']
+        checkpoint.findings = state['findings']
+        if os.path.exists(checkpoint.store_path):
+            checkpoint.store = PortStateStore.load(checkpoint.store_path)
+        return checkpoint
@@ -0,0 +1,400 @@
+"""Headless command line entry point for the port scanner.
+
+Usage: python -m cli 192.168.1.1 -p 1-1024
+
+This module must not import customtkinter or pygame, so it can run from cron
+or CI runners without a display.
+"""
+import os
+import sys
+import json
+import random
+import signal
+import sqlite3
+import argparse
+
+from config import AppConfig
+from manager import TimeManager
+from scanner import ScanEngine, PORT_OPEN, PORT_CLOSED, PORT_FILTERED, PORT_ERROR
+from scheduler import TargetList, validate_target, SCAN_ORDERS, ORDER_RANDOM
+from sharding import ShardedScanner
+from adaptive import REASON_RAMP
+from portstate import PortStateStore
+from telemetry import ScanTelemetry
+from ports import parse_port_spec
+from incremental import IncrementalPlan, find_baseline, load_baseline
+from checkpoint import Checkpoint, checkpoint_path
+from history import ScanHistory, history_path
+from fingerprint import FingerprintCache, fingerprint_cache_path
+from results import (
+    NdjsonSink,
+    EVENT_STARTED,
+    EVENT_COMPLETED,
+    EVENT_STOPPED,
+    EVENT_CANCELLED,
+    iter_open_ports,
+    summarize_stream,
+    write_json_report,
+    write_txt_report,
+    result_file_prefix
+)
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser for the command line interface."""
+    start_port, end_port = AppConfig.DEFAULT_PORT_RANGE
+    parser = argparse.ArgumentParser(prog='python -m cli', description='Headless TCP connect port scanner.')
+    parser.add_argument('targets', nargs='*', help='addresses, host names, CIDR networks (10.0.0.0/22) or ranges (10.0.0.1-50)')
+    parser.add_argument('-iL', '--input-list', dest='input_list', action='append', default=[], help='read targets from a file, one per line')
+    parser.add_argument('--window', type=int, default=AppConfig.SCHEDULER_WINDOW, help='number of hosts whose ports are interleaved')
+    parser.add_argument('-p', '--ports', default=f'{start_port}-{end_port}', help="ports to scan, e.g. 1-1024, 22,80,443,8000-8100, top:100 or a preset such as 'web'")
+    parser.add_argument('--order', choices=SCAN_ORDERS, default=AppConfig.DEFAULT_SCAN_ORDER, help='probe order: ascending, most common ports first, or a random permutation of all host/port pairs')
+    parser.add_argument('--seed', type=int, help='seed for --order random, to repeat a previous scan order')
+    parser.add_argument('-t', '--timeout', type=float, default=AppConfig.DEFAULT_TIMEOUT, help='initial connect timeout in seconds, used until a host RTT is measured')
+    parser.add_argument('--min-timeout', type=float, default=AppConfig.MIN_TIMEOUT, help='lower bound for adaptive timeouts')
+    parser.add_argument('--max-timeout', type=float, default=AppConfig.MAX_TIMEOUT, help='upper bound for adaptive timeouts')
+    parser.add_argument('-r', '--retries', type=int, default=AppConfig.DEFAULT_RETRIES, help='retries for probes that timed out')
+    parser.add_argument('-c', '--concurrency', type=int, default=AppConfig.DEFAULT_CONCURRENCY, help='upper bound for the adaptive number of probes in flight')
+    parser.add_argument('-S', '--source-address', dest='source_addresses', action='append', default=list(AppConfig.SOURCE_ADDRESSES), metavar='ADDRESS', help='local address to send probes from; repeat to rotate across several')
+    parser.add_argument('--no-rst', dest='abort_on_close', action='store_false', help='close probe sockets normally instead of with a RST, leaving them in TIME_WAIT')
+    parser.add_argument('-P', '--processes', type=int, default=AppConfig.DEFAULT_PROCESSES, help='shard the scan across this many worker processes')
+    parser.add_argument('--fingerprint', action='store_true', default=AppConfig.FINGERPRINT_ENABLED, help='identify open ports by the banner their service sends on the probe connection')
+    parser.add_argument('--all', action='store_true', help='also report closed and filtered ports')
+    parser.add_argument('--json', action='store_true', help='print one JSON record per line')
+    parser.add_argument('--ndjson', metavar='PATH', help='append findings and scan lifecycle events to an NDJSON file as they happen')
+    parser.add_argument('--report', metavar='PATH', help='write a .json or .txt report generated from the --ndjson stream')
+    parser.add_argument('--state-file', metavar='PATH', help='save the open, closed and filtered state of every probed port as a compact binary file')
+    parser.add_argument('--incremental', action='store_true', help='re-check the last results for these targets and print only ports that opened or closed')
+    parser.add_argument('--baseline', metavar='PATH', help='result file (.pss, .ndjson or .json) to compare against; defaults to the newest in --results-dir')
+    parser.add_argument('--slices', type=int, default=1, help='with --incremental, scan a daily rotating 1/N slice of the ports besides the known open ones')
+    parser.add_argument('--stats', action='store_true', help='print outcome counters, latency and probe rate at the end')
+    parser.add_argument('--prometheus', metavar='PATH', help='write the scan telemetry in the Prometheus text format')
+    parser.add_argument('--resume', action='store_true', help='continue the interrupted scan of these targets from its checkpoint in --results-dir')
+    parser.add_argument('--no-checkpoint', dest='checkpoint', action='store_false', help=f'do not save a checkpoint every {AppConfig.CHECKPOINT_INTERVAL:g} seconds')
+    parser.add_argument('--no-history', dest='history', action='store_false', help=f'do not record the findings in {AppConfig.HISTORY_FILE_NAME} in --results-dir')
+    parser.add_argument('--results-dir', default=RESULTS_DIR, help='directory holding earlier results and the incremental state files')
+    return parser
+
+def format_record(record: dict) -> str:
+    """Format a result record as a human readable line."""
+    line = f"{record['host']}:{record['port']} {record['state']}"
+    if record['service']:
+        line += f" ({record['service']})"
+    if record.get('product'):
+        line += f" {record['product']} {record.get('version') or ''}".rstrip()
+    if record.get('error'):
+        line += f" {record['error']}"
+    return line
+
+def format_delta(record: dict, change: str) -> str:
+    """Format an incremental scan change as a human readable line."""
+    sign = '+' if change == 'opened' else '-'
+    return f"{sign} {format_record(record)}"
+
+def main(argv=None) -> int:
+    """Run a headless scan and stream results to stdout."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    specs = args.targets + [f'@{path}' for path in args.input_list]
+    if not specs:
+        parser.error('at least one target or --input-list is required')
+    target = ','.join(specs)
+    resumed = None
+    if args.resume:
+        try:
+            resumed = Checkpoint.load(checkpoint_path(args.results_dir, target))
+        except (OSError, ValueError) as e:
+            print(f"Cannot resume {target}: {e}", file=sys.stderr)
+            return 2
+        # The schedule depends on these, so they must match the interrupted scan.
+        meta = resumed.meta
+        args.ports, args.order, args.seed, args.window = meta['ports'], meta['order'], meta['seed'], meta['window']
+        # Scans started from the GUI record none of the CLI-only options.
+        args.processes, args.all, args.state_file = meta['processes'], meta.get('all', False), meta.get('state_file')
+        args.incremental, args.baseline, args.slices = meta['incremental'], meta.get('baseline'), meta['slices']
+        args.fingerprint = meta.get('fingerprint', args.fingerprint)
+        args.report = args.report or meta.get('report')
+        args.ndjson = resumed.stream
+        print(f"Resuming from {resumed.path} ({resumed.scanned_before + sum(cursor.count() for cursor in resumed.resume_cursors() or [])} probes done)", file=sys.stderr)
+    if args.report and not args.ndjson:
+        parser.error('--report requires --ndjson')
+    invalid = [spec for spec in specs if not validate_target(spec)]
+    if invalid:
+        print(f"Invalid target: {', '.join(invalid)}", file=sys.stderr)
+        return 2
+    try:
+        port_spec = parse_port_spec(args.ports)
+    except ValueError as e:
+        print(f"Invalid port specification: {e}", file=sys.stderr)
+        return 2
+    if port_spec.udp:
+        print(f"UDP ports are not scanned by the TCP engine: {port_spec.udp}", file=sys.stderr)
+    ports = port_spec.tcp
+    if not ports:
+        print("No TCP ports to scan", file=sys.stderr)
+        return 2
+
+    shown = (PORT_OPEN, PORT_CLOSED, PORT_FILTERED, PORT_ERROR) if args.all else (PORT_OPEN, PORT_ERROR)
+    keep_all = args.state_file or args.incremental
+    report = (PORT_OPEN, PORT_CLOSED, PORT_FILTERED, PORT_ERROR) if keep_all else shown
+    scanner_class = ShardedScanner if args.processes > 1 else ScanEngine
+    options = {'processes': args.processes} if args.processes > 1 else {}
+
+    plan = None
+    phases = [(TargetList(specs), ports, None)]
+    if args.incremental:
+        baseline = args.baseline if resumed else args.baseline or find_baseline(args.results_dir, target)
+        plan = IncrementalPlan(
+            load_baseline(baseline) if baseline else PortStateStore(),
+            ports,
+            slices=args.slices,
+            slice_index=resumed.meta.get('slice_index') if resumed else None
+        )
+        phases = plan.phases(TargetList(specs))
+        print(f"Baseline: {baseline or 'none'}", file=sys.stderr)
+
+    def create_engine(targets, phase_ports, exclude, resume=None):
+        """Create the scanner for one phase of the scan."""
+        return scanner_class(
+            targets,
+            phase_ports,
+            exclude=exclude,
+            timeout=args.timeout,
+            min_timeout=args.min_timeout,
+            max_timeout=args.max_timeout,
+            retries=args.retries,
+            concurrency=args.concurrency,
+            report=report,
+            window=args.window,
+            order=args.order,
+            seed=args.seed,
+            telemetry=telemetry,
+            source_addresses=args.source_addresses,
+            abort_on_close=args.abort_on_close,
+            resume=resume,
+            fingerprint=args.fingerprint,
+            fingerprint_cache=fingerprint_cache_path(args.results_dir),
+            **options
+        )
+
+    start_time = TimeManager.get_current_time()
+    last_status = start_time
+    open_count = 0
+
+    def on_limit(host, limit: int, reason: str) -> None:
+        """Report congestion window changes; ramps at most once per STATUS_INTERVAL."""
+        nonlocal last_status
+        now = TimeManager.get_current_time()
+        if reason == REASON_RAMP and now - last_status < AppConfig.STATUS_INTERVAL:
+            return
+        last_status = now
+        scope = host or 'global'
+        print(f"In-flight limit ({scope}): {limit} ({reason})", file=sys.stderr)
+
+    if args.order == ORDER_RANDOM and args.seed is None:
+        # One seed for every phase, and printed so the order can be repeated.
+        args.seed = random.randrange(1 << 32)
+        print(f"Random order seed: {args.seed}", file=sys.stderr)
+    # Shared by every phase so the totals cover the whole run.
+    telemetry = ScanTelemetry()
+    store = PortStateStore() if args.state_file else None
+    fingerprints = FingerprintCache.load(fingerprint_cache_path(args.results_dir)) if args.fingerprint else None
+    sink = NdjsonSink(args.ndjson) if args.ndjson else None
+    history = None
+    if args.history and AppConfig.HISTORY_ENABLED:
+        try:
+            history = ScanHistory(history_path(args.results_dir))
+            if resumed and resumed.meta.get('history_scan'):
+                history.resume_scan(resumed.meta['history_scan'])
+            else:
+                history.start_scan(target, str(ports), source=os.path.abspath(args.ndjson) if args.ndjson else None)
+        except (sqlite3.Error, ValueError) as e:
+            print(f"Scan history disabled: {e}", file=sys.stderr)
+            if history:
+                history.close()
+            history = None
+    checkpoint = None
+    if resumed:
+        checkpoint = resumed
+        checkpoint.sink = sink
+        open_count = checkpoint.open_count
+        if checkpoint.store is not None:
+            if store is not None:
+                store = checkpoint.store
+            if plan:
+                # A separate copy, since the plan compares each record with what it has seen.
+                plan.current = PortStateStore.from_bytes(checkpoint.store.to_bytes())
+    elif args.checkpoint:
+        checkpoint = Checkpoint(
+            checkpoint_path(args.results_dir, target),
+            {
+                'ip': target,
+                'start_port': ports[0],
+                'end_port': ports[-1],
+                'ports': str(ports),
+                'multi_host': not TargetList(specs).is_single_host(),
+                'order': args.order,
+                'seed': args.seed,
+                'window': args.window,
+                'processes': args.processes,
+                'all': args.all,
+                'state_file': args.state_file,
+                'report': args.report,
+                'fingerprint': args.fingerprint,
+                'incremental': args.incremental,
+                'baseline': baseline if plan else None,
+                'slices': args.slices,
+                'slice_index': plan.slice_index if plan else None,
+                'history_scan': history.scan_id if history else None
+            },
+            sink=sink
+        )
+    if checkpoint:
+        checkpoint.store = store if store is not None else plan.current if plan else None
+    if sink and not resumed:
+        sink.write(
+            EVENT_STARTED,
+            timestamp=TimeManager.get_formatted_time(),
+            ip=target,
+            start_port=ports[0],
+            end_port=ports[-1],
+            ports=str(ports),
+            multi_host=not TargetList(specs).is_single_host(),
+            order=args.order,
+            seed=args.seed
+        )
+    status = EVENT_COMPLETED
+    scanned = checkpoint.scanned_before if checkpoint else 0
+    engine = None
+
+    cancelled = False
+
+    def on_idle() -> None:
+        """Record the engine position once every finding so far has been handled."""
+        checkpoint.update(engine)
+        checkpoint.maybe_save()
+
+    def on_interrupt(signum, frame) -> None:
+        """Cancel the scan on the first Ctrl-C; a second one interrupts at once."""
+        nonlocal cancelled
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        cancelled = True
+        if engine:
+            engine.cancel()
+
+    previous_handler = signal.signal(signal.SIGINT, on_interrupt)
+    try:
+        for phase, (targets, phase_ports, exclude) in enumerate(phases):
+            if checkpoint and phase < checkpoint.phase:
+                continue
+            if cancelled:
+                break
+            engine = create_engine(targets, phase_ports, exclude, checkpoint.resume_cursors() if checkpoint else None)
+            if engine.budget.is_limited() and phase == 0:
+                print(engine.budget.describe(), file=sys.stderr)
+            for record in engine.results(on_limit=on_limit, on_idle=on_idle if checkpoint else None):
+                if record['state'] == PORT_OPEN:
+                    open_count += 1
+                    if checkpoint:
+                        checkpoint.add_finding(record)
+                if store:
+                    store.add(record)
+                if fingerprints:
+                    fingerprints.add(record)
+                change = plan.delta(record) if plan else None
+                # Recorded before the output filter, so unchanged open ports of an incremental scan are kept too.
+                if history and (change or record['state'] == PORT_OPEN):
+                    history.add(record)
+                if plan:
+                    if change is None and record['state'] != PORT_ERROR:
+                        continue
+                    if change:
+                        record['change'] = change
+                elif record['state'] not in shown:
+                    continue
+                if sink:
+                    sink.record(record)
+                if args.json:
+                    print(json.dumps(record), flush=True)
+                elif record['state'] == PORT_ERROR:
+                    print(format_record(record), file=sys.stderr)
+                elif plan:
+                    print(format_delta(record, record['change']), flush=True)
+                else:
+                    print(format_record(record), flush=True)
+            scanned += engine.scanned
+            if cancelled:
+                break
+            if checkpoint:
+                checkpoint.finish_phase(engine)
+            engine = None
+        if cancelled:
+            status = EVENT_CANCELLED
+            if checkpoint:
+                # The results were drained, so the engine cursors cover every printed finding.
+                checkpoint.save(engine)
+                print("Scan cancelled; continue it with --resume", file=sys.stderr)
+            else:
+                print("Scan cancelled", file=sys.stderr)
+        elif checkpoint:
+            checkpoint.remove()
+    except KeyboardInterrupt:
+        if engine:
+            engine.cancel()
+            scanned += engine.scanned
+        status = EVENT_STOPPED
+        if checkpoint:
+            # Cursors from the last on_idle, which every printed finding is covered by.
+            checkpoint.save()
+            print("Scan interrupted; continue it with --resume", file=sys.stderr)
+        else:
+            print("Scan interrupted", file=sys.stderr)
+    finally:
+        signal.signal(signal.SIGINT, previous_handler)
+        duration = TimeManager.calculate_duration(start_time, TimeManager.get_current_time())
+        if sink:
+            sink.write(
+                status,
+                timestamp=TimeManager.get_formatted_time(),
+                scanned=scanned,
+                duration=round(duration, 3),
+                telemetry=telemetry.snapshot()
+            )
+            sink.close()
+        if history:
+            history.finish_scan(status, scanned)
+            history.close()
+        if store:
+            store.save(args.state_file)
+        if fingerprints:
+            fingerprints.save()
+        if args.prometheus:
+            telemetry.write_prometheus(args.prometheus, {'target': target})
+        if plan and status == EVENT_COMPLETED:
+            # The merged state is the next run's baseline.
+            os.makedirs(args.results_dir, exist_ok=True)
+            stem = result_file_prefix(target) + TimeManager.get_formatted_time().replace(' ', '_').replace(':', '-')
+            plan.merged().save(os.path.join(args.results_dir, f"{stem}.pss"))
+
+    if args.report:
+        meta = summarize_stream(args.ndjson)
+        if history:
+            meta['history_scan'] = history.scan_id
+        writer = write_json_report if args.report.endswith('.json') else write_txt_report
+        writer(args.report, meta, iter_open_ports(args.ndjson), "", telemetry=meta.get('telemetry'))
+    if status in (EVENT_STOPPED, EVENT_CANCELLED):
+        return 130
+    if plan:
+        # Ports probed in both phases are counted once.
+        open_count = plan.current.count()
+    print(
+        f"Scanned {scanned} ports, {open_count} open, in {duration:.2f} seconds",
+        file=sys.stderr
+    )
+    if args.stats:
+        print(telemetry.summary_line(), file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,3 @@
-import customtkinter as ctk
-
 class AppConfig:
     """Class to manage UI configuration and theme settings."""
 
@@ -11,6 +9,8 @@ class AppConfig:
     WINDOW_TITLE = 'Port Scanner'
     SCAN_BUTTON_TEXT = 'Scan'
     STOP_BUTTON_TEXT = 'Stop'
+    PAUSE_BUTTON_TEXT = 'Pause'
+    RESUME_BUTTON_TEXT = 'Resume'
     COLORS = {
         "background": "#2b2b2b",
         "foreground": "white",
@@ -22,17 +22,101 @@ class AppConfig:
         "color_theme": "dark-blue"
     }
     resources_directory_name = 'resources'
+    UI_UPDATE_INTERVAL_MS = 50
+    SOUND_ENABLED = True
+    SOUND_ALERT_INTERVAL = 1.0
 
     # Scan Settings
     DEFAULT_TIMEOUT = 1.0
+    MIN_TIMEOUT = 0.1
+    MAX_TIMEOUT = 3.0
+    DEFAULT_RETRIES = 1
+    AIMD_INITIAL = 64
+    AIMD_MIN = 8
+    AIMD_HOST_INITIAL = 64
+    AIMD_HOST_MIN = 2
+    AIMD_HOST_MAX = 256
+    AIMD_INCREASE = 1.0
+    AIMD_DECREASE = 0.5
+    AIMD_ANSWER_DROP = 0.5
+    AIMD_MIN_ANSWERS = 4
+    AIMD_RTT_GROWTH = 3.0
+    AIMD_RTT_SLACK = 0.05
+    AIMD_COOLDOWN = 0.5
+    AIMD_MIN_WINDOW = 16
     DEFAULT_THREADS = 100
+    DEFAULT_CONCURRENCY = 500
     DEFAULT_PORT_RANGE = (1, 1024)
+    # Named port specifications accepted wherever a port spec is, e.g. 'web,22'.
+    PORT_PRESETS = {
+        'top100': 'top:100',
+        'well-known': '1-1023',
+        'web': '80,443,8000,8008,8080,8443,8888',
+        'remote': '22,23,3389,5900,5985,5986',
+        'mail': '25,110,143,465,587,993,995',
+        'database': '1433,1521,3306,5432,6379,9200,11211,27017',
+        'all': '1-65535'
+    }
+    SCHEDULER_WINDOW = 64
+    DEFAULT_SCAN_ORDER = 'top'
+    DEFAULT_PROCESSES = 1
+    SHARD_BATCH_SIZE = 256
+    SHARD_FLUSH_INTERVAL = 0.1
+    SHARD_JOIN_TIMEOUT = 2.0
+    SHARD_CANCEL_GRACE = 0.5
+    CANCEL_POLL_INTERVAL = 0.02
+
+    STATUS_INTERVAL = 1.0
+
+    # Socket Resource Settings
+    RAISE_FD_LIMIT = True
+    FD_RESERVE = 64
+    EPHEMERAL_PORT_SHARE = 0.5
+    PROBE_RST_ON_CLOSE = True
+    SOURCE_ADDRESSES = ()
+    LOCAL_ERROR_RETRIES = 3
+    LOCAL_ERROR_DELAY = 0.05
+
+    # Fingerprint Settings
+    FINGERPRINT_ENABLED = False
+    FINGERPRINT_CONCURRENCY = 32
+    FINGERPRINT_TIMEOUT = 1.5
+    FINGERPRINT_WAIT = 0.5
+    FINGERPRINT_MAX_BYTES = 1024
+    FINGERPRINT_BANNER_CHARS = 160
+    FINGERPRINT_CACHE_FILE_NAME = 'fingerprints.json'
+    FINGERPRINT_CACHE_TTL = 7 * 24 * 3600.0
+
+    # Incremental Scan Settings
+    INCREMENTAL_SCAN = False
+    INCREMENTAL_SLICES = 1
+
+    # Checkpoint Settings
+    CHECKPOINT_ENABLED = True
+    CHECKPOINT_INTERVAL = 10.0
+
+    # Result Stream Settings
+    STREAM_RESULTS = True
+    STREAM_FLUSH_INTERVAL = 1.0
+    STREAM_BUFFER_SIZE = 64 * 1024
+
+    # History Settings
+    HISTORY_ENABLED = True
+    HISTORY_FILE_NAME = 'history.db'
+    HISTORY_BATCH_SIZE = 1000
+    HISTORY_FLUSH_INTERVAL = 1.0
+    HISTORY_DAYS = 30
 
     # Log Settings
     LOG_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+    LOG_CAPACITY = 10000
+    LOG_VISIBLE_LINES = 500
+    LOG_LEVEL = 'INFO'
 
     # Network Settings
     DEFAULT_IP = '127.0.0.1'
+    REACHABILITY_PORTS = (80, 443, 22, 445, 3389, 139, 135, 53, 21, 25, 8080)
+    REACHABILITY_TTL = 60.0
     PREDEFINED_IPS = [
         "127.0.0.1",
         "192.168.1.1",
@@ -43,6 +127,7 @@ class AppConfig:
     @staticmethod
     def apply_theme(root) -> None:
         """Apply the theme settings to the root window."""
+        import customtkinter as ctk
         ctk.set_appearance_mode(AppConfig.THEME_SETTINGS["appearance_mode"])
         ctk.set_default_color_theme(AppConfig.THEME_SETTINGS["color_theme"])
         root.configure(bg=AppConfig.COLORS["background"])
@@ -50,4 +135,5 @@ class AppConfig:
     @staticmethod
     def toggle_theme() -> None:
         """Toggle between dark and light themes."""
+        import customtkinter as ctk
         ctk.set_appearance_mode("Dark" if ctk.get_appearance_mode() == "Light" else "Light")
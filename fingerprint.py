@@ -0,0 +1,211 @@
+import os
+import re
+import json
+import asyncio
+from datetime import datetime, timedelta
+
+from config import AppConfig
+from manager import TimeManager
+from checkpoint import replace_file
+
+# Sent when a service does not talk first. Besides web servers, most line
+# based and binary protocols answer it with a telling error.
+PROBE_PAYLOAD = b'HEAD / HTTP/1.0\r\n\r\n'
+
+# Fields the stage adds to open port records, besides refining 'service'.
+FINGERPRINT_FIELDS = ('product', 'version', 'banner', 'fingerprinted')
+
+# (service, pattern) pairs matched against the start of a banner in order, so
+# specific signatures come before generic ones. The named groups `product`
+# and `version` are copied into the record when present.
+SIGNATURES = (
+    ('ssh', rb'SSH-[\d.]+-(?P<product>[^\s_-]+)[_-]?(?P<version>[^\s]+)?'),
+    ('ftp', rb'220[- ][^\r\n]*?(?P<product>vsFTPd|ProFTPD|Pure-FTPd|FileZilla Server)[ /]?(?P<version>[\d.]+[\w.]*)?'),
+    ('smtp', rb'220[- ][^\r\n]*?(?P<product>Postfix|Exim|Sendmail|Microsoft ESMTP MAIL Service)(?: (?P<version>[\d.]+))?'),
+    ('ftp', rb'220[- ][^\r\n]*FTP'),
+    ('smtp', rb'220[- ][^\r\n]*(?:E?SMTP|[Mm]ail)'),
+    ('pop3', rb'\+OK'),
+    ('imap', rb'\* (?:OK|PREAUTH)'),
+    ('nntp', rb'20[01] [^\r\n]*(?:NNTP|news)'),
+    ('rtsp', rb'RTSP/1\.0 \d{3}'),
+    ('http', rb'HTTP/[\d.]+ \d{3}(?s:.*?)\r\n(?i:server): *(?P<product>[^\r\n/ ]+)(?:/(?P<version>[^\s\r\n]+))?'),
+    ('http', rb'HTTP/[\d.]+ \d{3}'),
+    ('mysql', rb'(?s:.)\x00\x00\x00\x0a(?P<version>[\d.]+[^\x00]*)\x00'),
+    ('postgresql', rb'E\x00\x00\x00(?s:.)S(?:FATAL|ERROR)'),
+    ('redis', rb'-(?:ERR (?:unknown command|wrong number of arguments)|NOAUTH|DENIED)'),
+    ('memcache', rb'ERROR\r\n'),
+    ('vnc', rb'RFB (?P<version>\d{3}\.\d{3})'),
+    ('rsync', rb'@RSYNCD: (?P<version>[\d.]+)'),
+    ('amqp', rb'AMQP'),
+    ('telnet', rb'\xff[\xfb-\xfe]'),
+    # A TLS alert in reply to the plain text probe.
+    ('ssl', rb'\x15\x03[\x00-\x04]')
+)
+SIGNATURE_TABLE = tuple((service, re.compile(pattern)) for service, pattern in SIGNATURES)
+NON_PRINTABLE = re.compile(rb'[^\x20-\x7e]+')
+
+def match_banner(data: bytes):
+    """Return (service, product, version) of the first signature matching a banner, or None."""
+    for service, pattern in SIGNATURE_TABLE:
+        match = pattern.match(data)
+        if match:
+            groups = match.groupdict()
+            product, version = groups.get('product'), groups.get('version')
+            return (
+                service,
+                product.decode('ascii', 'replace') if product else None,
+                version.decode('ascii', 'replace') if version else None
+            )
+    return None
+
+def identify(data: bytes, service: str) -> dict:
+    """Return the record fields for a banner; `service` is kept if no signature matches."""
+    product = version = None
+    match = match_banner(data)
+    if match:
+        service, product, version = match
+    banner = NON_PRINTABLE.sub(b' ', data[:AppConfig.FINGERPRINT_BANNER_CHARS]).strip()
+    return {
+        'service': service,
+        'product': product,
+        'version': version,
+        'banner': banner.decode('ascii'),
+        'fingerprinted': TimeManager.get_formatted_time()
+    }
+
+def fingerprint_cache_path(results_dir: str) -> str:
+    """Return the path of the fingerprint cache kept in a results directory."""
+    return os.path.join(results_dir, AppConfig.FINGERPRINT_CACHE_FILE_NAME)
+
+class FingerprintCache:
+    """Fingerprints by host:port, kept in a JSON file so rescans skip known services.
+
+    Entries older than `ttl` seconds are ignored and dropped on save. Scans
+    only read the cache; consumers add the fingerprinted records they receive,
+    which also works for records coming back from shard processes.
+    """
+
+    def __init__(self, path: str = None, ttl: float = AppConfig.FINGERPRINT_CACHE_TTL) -> None:
+        """Initialize an empty cache."""
+        self.path = path
+        self.ttl = ttl
+        self.entries = {}
+        self.changed = False
+
+    @classmethod
+    def load(cls, path: str = None, ttl: float = AppConfig.FINGERPRINT_CACHE_TTL) -> 'FingerprintCache':
+        """Read a cache file; a missing or unreadable file gives an empty cache."""
+        cache = cls(path, ttl)
+        if path:
+            try:
+                with open(path, encoding='utf-8') as file:
+                    cache.entries = json.load(file)
+            except (OSError, ValueError):
+                pass
+        return cache
+
+    def cutoff(self) -> str:
+        """Return the oldest fingerprint time that is still fresh."""
+        return (datetime.now() - timedelta(seconds=self.ttl)).strftime(AppConfig.LOG_DATE_FORMAT)
+
+    def get(self, host: str, port: int):
+        """Return the fresh fingerprint fields of a port, or None."""
+        entry = self.entries.get(f"{host}:{port}")
+        if entry is None or entry['fingerprinted'] < self.cutoff():
+            return None
+        return entry
+
+    def add(self, record: dict) -> None:
+        """Remember the fingerprint of a record, if it has one."""
+        if not record.get('fingerprinted'):
+            return
+        key = f"{record['host']}:{record['port']}"
+        entry = {field: record.get(field) for field in ('service',) + FINGERPRINT_FIELDS}
+        if self.entries.get(key) != entry:
+            self.entries[key] = entry
+            self.changed = True
+
+    def save(self) -> None:
+        """Write the cache without stale entries, if anything changed."""
+        if not self.path or not self.changed:
+            return
+        cutoff = self.cutoff()
+        entries = {key: entry for key, entry in self.entries.items() if entry['fingerprinted'] >= cutoff}
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        replace_file(self.path, json.dumps(entries).encode('utf-8'))
+        self.changed = False
+
+class FingerprintStage:
+    """Banner grab on the connection a probe has already established.
+
+    The stage reads what the service sends first and, if it stays silent for
+    `wait` seconds, sends PROBE_PAYLOAD and reads the reply, within `timeout`
+    seconds and `max_bytes` bytes overall. At most `concurrency` grabs run at
+    once. An open port found while every slot is busy is reported without a
+    fingerprint instead of waiting, so slow services cannot hold up the scan.
+    """
+
+    def __init__(
+        self,
+        cache: FingerprintCache = None,
+        concurrency: int = AppConfig.FINGERPRINT_CONCURRENCY,
+        timeout: float = AppConfig.FINGERPRINT_TIMEOUT,
+        wait: float = AppConfig.FINGERPRINT_WAIT,
+        max_bytes: int = AppConfig.FINGERPRINT_MAX_BYTES
+    ) -> None:
+        """Initialize the stage."""
+        self.cache = cache or FingerprintCache()
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.wait = wait
+        self.max_bytes = max_bytes
+        # Only touched from the engine's loop, so no lock is needed.
+        self.active = 0
+
+    def claim(self, host: str, port: int) -> bool:
+        """Take a slot to fingerprint a port, unless it is cached or every slot is busy."""
+        if self.active >= self.concurrency or self.cache.get(host, port) is not None:
+            return False
+        self.active += 1
+        return True
+
+    async def grab(self, connection, service: str) -> dict:
+        """Fingerprint a claimed port on its open connection, then close it and free the slot."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        data = b''
+        try:
+            data = await self.read(loop, connection, min(deadline, loop.time() + self.wait))
+            if not data and loop.time() < deadline:
+                await asyncio.wait_for(loop.sock_sendall(connection, PROBE_PAYLOAD), deadline - loop.time())
+                data = await self.read(loop, connection, deadline)
+        except (OSError, asyncio.TimeoutError):
+            # A reset or a peer that stopped reading; whatever arrived is still used.
+            pass
+        finally:
+            self.release(connection)
+        return identify(data, service)
+
+    def release(self, connection) -> None:
+        """Close the connection of a claimed port and free its slot; later calls do nothing."""
+        if connection.fileno() != -1:
+            connection.close()
+            self.active -= 1
+
+    async def read(self, loop, connection, deadline: float) -> bytes:
+        """Read until the data matches a signature, fills the budget, ends or the deadline passes."""
+        data = b''
+        while len(data) < self.max_bytes:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                chunk = await asyncio.wait_for(loop.sock_recv(connection, self.max_bytes - len(data)), remaining)
+            except asyncio.TimeoutError:
+                break
+            if not chunk:
+                break
+            data += chunk
+            if match_banner(data):
+                break
+        return data
@@ -0,0 +1,408 @@
+"""Indexed history of every scan's findings.
+
+Usage: python -m history hosts 3389 --days 30
+       python -m history first 10.0.0.5 8080
+       python -m history import
+
+Scans write their findings to an SQLite database in the results directory,
+so questions across scans are answered from indexes instead of by parsing
+every result file. The import command loads result files written before
+the history existed.
+"""
+import os
+import sys
+import json
+import sqlite3
+import argparse
+import threading
+from datetime import datetime, timedelta
+
+from config import AppConfig
+from manager import TimeManager
+from results import (
+    EVENT_STARTED,
+    EVENT_PORT,
+    EVENT_COMPLETED,
+    EVENT_STATUS,
+    STATUS_IN_PROGRESS,
+    RESULT_FILE_PREFIX,
+    read_stream
+)
+
+HISTORY_VERSION = 1
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+# Error records say nothing about the port, so they are not kept.
+HISTORY_STATES = ('open', 'closed', 'filtered')
+IMPORT_EXTENSIONS = ('.json', '.ndjson')
+
+# Timestamps are stored in LOG_DATE_FORMAT, which sorts chronologically as text.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    id INTEGER PRIMARY KEY,
+    target TEXT NOT NULL,
+    ports TEXT,
+    started TEXT NOT NULL,
+    finished TEXT,
+    status TEXT NOT NULL,
+    scanned INTEGER,
+    source TEXT UNIQUE
+);
+CREATE TABLE IF NOT EXISTS findings (
+    scan_id INTEGER NOT NULL REFERENCES scans (id),
+    host TEXT NOT NULL,
+    port INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    service TEXT,
+    seen TEXT NOT NULL,
+    PRIMARY KEY (scan_id, host, port)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS findings_by_host ON findings (host, port, state, seen);
+CREATE INDEX IF NOT EXISTS findings_by_port ON findings (port, state, seen, host);
+CREATE INDEX IF NOT EXISTS scans_by_start ON scans (started);
+"""
+
+INSERT_FINDING = "INSERT OR REPLACE INTO findings VALUES (?, ?, ?, ?, ?, ?)"
+
+def history_path(results_dir: str) -> str:
+    """Return the path of the history database kept in a results directory."""
+    return os.path.join(results_dir, AppConfig.HISTORY_FILE_NAME)
+
+def since_days(days: float) -> str:
+    """Return the timestamp `days` days ago in the stored format."""
+    return (datetime.now() - timedelta(days=days)).strftime(AppConfig.LOG_DATE_FORMAT)
+
+def finding_row(scan_id: int, record: dict, seen: str = None):
+    """Return the findings row of a result record, or None if it is not kept."""
+    if record.get('state', 'open') not in HISTORY_STATES:
+        return None
+    return (
+        scan_id,
+        record['host'],
+        record['port'],
+        record.get('state', 'open'),
+        record.get('service'),
+        record.get('timestamp') or seen
+    )
+
+class ScanHistory:
+    """SQLite store of the findings of every scan, indexed by host, port, state and time.
+
+    Findings of the running scan are buffered and written in one transaction
+    per `batch_size` rows or `flush_interval` seconds. A port is kept once per
+    scan, so findings repeated by a resumed scan replace the earlier row.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        batch_size: int = AppConfig.HISTORY_BATCH_SIZE,
+        flush_interval: float = AppConfig.HISTORY_FLUSH_INTERVAL
+    ) -> None:
+        """Open the database, creating it on first use."""
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.scan_id = None
+        self.pending = []
+        self.last_flush = TimeManager.get_current_time()
+        # Scans write from their own thread; the lock serializes the connection.
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        try:
+            self.connection.row_factory = sqlite3.Row
+            version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+            if version not in (0, HISTORY_VERSION):
+                raise ValueError(f"Unsupported history version: {version}")
+            # Readers such as the history window do not block a scan writing.
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.executescript(SCHEMA)
+            self.connection.execute(f"PRAGMA user_version={HISTORY_VERSION}")
+        except BaseException:
+            self.connection.close()
+            raise
+
+    def start_scan(self, target: str, ports: str, started: str = None, source: str = None) -> int:
+        """Record a new scan and make it the one findings are added to.
+
+        `source` is the result stream the scan writes, which the importer
+        then skips; a stream appended to by several scans is owned by the first.
+        """
+        with self.lock, self.connection:
+            if source and self.connection.execute("SELECT 1 FROM scans WHERE source = ?", (source,)).fetchone():
+                source = None
+            cursor = self.connection.execute(
+                "INSERT INTO scans (target, ports, started, status, source) VALUES (?, ?, ?, ?, ?)",
+                (target, ports, started or TimeManager.get_formatted_time(), STATUS_IN_PROGRESS, source)
+            )
+        self.scan_id = cursor.lastrowid
+        return self.scan_id
+
+    def resume_scan(self, scan_id: int) -> None:
+        """Add findings to an earlier scan again, e.g. when it is resumed from a checkpoint."""
+        with self.lock, self.connection:
+            self.connection.execute(
+                "UPDATE scans SET status = ?, finished = NULL WHERE id = ?", (STATUS_IN_PROGRESS, scan_id)
+            )
+        self.scan_id = scan_id
+
+    def add(self, record: dict) -> None:
+        """Buffer a finding of the current scan, writing the batch when it is due."""
+        row = finding_row(self.scan_id, record)
+        if row is None:
+            return
+        with self.lock:
+            self.pending.append(row)
+            if (len(self.pending) >= self.batch_size
+                    or TimeManager.get_elapsed_time(self.last_flush) >= self.flush_interval):
+                self.write_pending()
+
+    def write_pending(self) -> None:
+        """Write the buffered findings in one transaction; the lock must be held."""
+        if self.pending:
+            with self.connection:
+                self.connection.executemany(INSERT_FINDING, self.pending)
+            self.pending = []
+        self.last_flush = TimeManager.get_current_time()
+
+    def flush(self) -> None:
+        """Write the buffered findings now."""
+        with self.lock:
+            self.write_pending()
+
+    def finish_scan(self, event: str, scanned: int = None) -> None:
+        """Write the remaining findings and record how the current scan ended."""
+        with self.lock:
+            self.write_pending()
+            with self.connection:
+                self.connection.execute(
+                    "UPDATE scans SET status = ?, finished = ?, scanned = ? WHERE id = ?",
+                    (EVENT_STATUS[event], TimeManager.get_formatted_time(), scanned, self.scan_id)
+                )
+
+    def close(self) -> None:
+        """Write the remaining findings and close the database."""
+        with self.lock:
+            self.write_pending()
+            self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def query(self, sql: str, parameters=()) -> list:
+        """Run a read-only query and return its rows as dicts."""
+        with self.lock:
+            return [dict(row) for row in self.connection.execute(sql, parameters)]
+
+    def hosts_with_port(self, port: int, state: str = 'open', since: str = None) -> list:
+        """Return the hosts a port was seen in a state on, with first and last sighting."""
+        return self.query(
+            "SELECT host, MIN(seen) AS first_seen, MAX(seen) AS last_seen, COUNT(*) AS scans "
+            "FROM findings WHERE port = ? AND state = ? AND seen >= ? GROUP BY host ORDER BY host",
+            (port, state, since or '')
+        )
+
+    def ports_of_host(self, host: str, state: str = 'open', since: str = None) -> list:
+        """Return the ports seen in a state on a host, with first and last sighting."""
+        return self.query(
+            "SELECT port, MIN(seen) AS first_seen, MAX(seen) AS last_seen, COUNT(*) AS scans "
+            "FROM findings WHERE host = ? AND state = ? AND seen >= ? GROUP BY port ORDER BY port",
+            (host, state, since or '')
+        )
+
+    def first_seen(self, host: str, port: int, state: str = 'open'):
+        """Return when a port was first seen in a state on a host, or None."""
+        return self.query(
+            "SELECT MIN(seen) AS seen FROM findings WHERE host = ? AND port = ? AND state = ?",
+            (host, port, state)
+        )[0]['seen']
+
+    def timeline(self, host: str, port: int) -> list:
+        """Return every recorded state of a port on a host, oldest first."""
+        return self.query(
+            "SELECT findings.seen, findings.state, findings.service, scans.id AS scan_id, scans.target "
+            "FROM findings JOIN scans ON scans.id = findings.scan_id "
+            "WHERE findings.host = ? AND findings.port = ? ORDER BY findings.seen",
+            (host, port)
+        )
+
+    def scans(self, limit: int = 20) -> list:
+        """Return the most recent scans with their open port counts, newest first."""
+        return self.query(
+            "SELECT scans.*, (SELECT COUNT(*) FROM findings WHERE scan_id = scans.id AND state = 'open') "
+            "AS open_count FROM scans ORDER BY started DESC LIMIT ?",
+            (limit,)
+        )
+
+    def import_file(self, path: str):
+        """Import a .json or .ndjson result file in one transaction.
+
+        Returns the number of findings, or None if the file was imported
+        before or comes from a scan that recorded its findings itself.
+        """
+        source = os.path.abspath(path)
+        with self.lock, self.connection:
+            if self.connection.execute("SELECT 1 FROM scans WHERE source = ?", (source,)).fetchone():
+                return None
+            if path.endswith('.ndjson'):
+                return self.import_stream(path, source)
+            return self.import_report(path, source)
+
+    def import_report(self, path: str, source: str) -> int:
+        """Import a JSON export; the caller holds the lock and the transaction."""
+        with open(path, encoding='utf-8') as file:
+            data = json.load(file)
+        if data.get('history_scan') is not None:
+            return None
+        ports = data.get('ports') or f"{data.get('start_port')}-{data.get('end_port')}"
+        scan_id = self.connection.execute(
+            "INSERT INTO scans (target, ports, started, finished, status, source) VALUES (?, ?, ?, ?, ?, ?)",
+            (data['ip'], ports, data['timestamp'], data['timestamp'], data.get('status', EVENT_STATUS[EVENT_COMPLETED]), source)
+        ).lastrowid
+        rows = []
+        for record in data.get('open_ports', []):
+            # Exports from before multi-host scans have no host field.
+            row = finding_row(scan_id, dict(record, host=record.get('host', data['ip'])), data['timestamp'])
+            if row is not None:
+                rows.append(row)
+        self.connection.executemany(INSERT_FINDING, rows)
+        return len(rows)
+
+    def import_stream(self, path: str, source: str) -> int:
+        """Import an NDJSON stream in batches; the caller holds the lock and the transaction.
+
+        A stream that several scans appended to becomes one scan per
+        scan_started event; the first of them owns the file.
+        """
+        scan_id = None
+        started = ''
+        rows = []
+        count = 0
+        for event in read_stream(path):
+            kind = event.get('event')
+            if kind == EVENT_STARTED or scan_id is None:
+                self.connection.executemany(INSERT_FINDING, rows)
+                count += len(rows)
+                rows = []
+                started = event.get('timestamp', '')
+                scan_id = self.connection.execute(
+                    "INSERT INTO scans (target, ports, started, status, source) VALUES (?, ?, ?, ?, ?)",
+                    (event.get('ip', ''), event.get('ports'), started, STATUS_IN_PROGRESS, None if scan_id else source)
+                ).lastrowid
+            if kind == EVENT_PORT:
+                row = finding_row(scan_id, event, started)
+                if row is not None:
+                    rows.append(row)
+                if len(rows) >= self.batch_size:
+                    self.connection.executemany(INSERT_FINDING, rows)
+                    count += len(rows)
+                    rows = []
+            elif kind in EVENT_STATUS:
+                self.connection.execute(
+                    "UPDATE scans SET status = ?, finished = ?, scanned = ? WHERE id = ?",
+                    (EVENT_STATUS[kind], event.get('timestamp'), event.get('scanned'), scan_id)
+                )
+        self.connection.executemany(INSERT_FINDING, rows)
+        return count + len(rows)
+
+    def import_files(self, paths):
+        """Import result files, yielding (path, findings, error) for each.
+
+        `findings` is None for files that were already imported; a file that
+        cannot be read is reported in `error` and skipped.
+        """
+        for path in paths:
+            try:
+                yield path, self.import_file(path), None
+            except (OSError, ValueError, KeyError, sqlite3.Error) as e:
+                yield path, None, e
+
+def result_files(results_dir: str) -> list:
+    """Return the importable result files in a directory, oldest first."""
+    try:
+        names = os.listdir(results_dir)
+    except OSError:
+        return []
+    paths = [
+        os.path.join(results_dir, name) for name in names
+        if name.startswith(RESULT_FILE_PREFIX) and os.path.splitext(name)[1] in IMPORT_EXTENSIONS
+    ]
+    return sorted(paths, key=os.path.getmtime)
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser for the history queries."""
+    parser = argparse.ArgumentParser(prog='python -m history', description='Query the history of earlier scans.')
+    parser.add_argument('--db', metavar='PATH', default=history_path(RESULTS_DIR), help='history database')
+    parser.add_argument('--json', action='store_true', help='print one JSON object per row')
+    commands = parser.add_subparsers(dest='command', required=True)
+    hosts = commands.add_parser('hosts', help='hosts a port was open on')
+    hosts.add_argument('port', type=int)
+    hosts.add_argument('--days', type=float, help='only findings from the last DAYS days')
+    hosts.add_argument('--state', choices=HISTORY_STATES, default='open')
+    ports = commands.add_parser('ports', help='ports that were open on a host')
+    ports.add_argument('host')
+    ports.add_argument('--days', type=float, help='only findings from the last DAYS days')
+    ports.add_argument('--state', choices=HISTORY_STATES, default='open')
+    first = commands.add_parser('first', help='when a port was first seen open on a host')
+    first.add_argument('host')
+    first.add_argument('port', type=int)
+    timeline = commands.add_parser('timeline', help='every recorded state of a port on a host')
+    timeline.add_argument('host')
+    timeline.add_argument('port', type=int)
+    scans = commands.add_parser('scans', help='the most recent scans')
+    scans.add_argument('-n', '--limit', type=int, default=20)
+    importer = commands.add_parser('import', help='load existing .json and .ndjson result files')
+    importer.add_argument('paths', nargs='*', help=f'result files or directories; defaults to {RESULTS_DIR}')
+    return parser
+
+def format_row(row: dict) -> str:
+    """Return a query row as one tab-separated line."""
+    return '\t'.join('' if value is None else str(value) for value in row.values())
+
+def main(argv=None) -> int:
+    """Run one history query or import and print the result."""
+    args = build_parser().parse_args(argv)
+    try:
+        history = ScanHistory(args.db)
+    except (sqlite3.Error, ValueError) as e:
+        print(f"Cannot open {args.db}: {e}", file=sys.stderr)
+        return 2
+    with history:
+        if args.command == 'import':
+            paths = []
+            for path in args.paths or [os.path.dirname(os.path.abspath(args.db))]:
+                paths.extend(result_files(path) if os.path.isdir(path) else [path])
+            files = findings = 0
+            for path, count, error in history.import_files(paths):
+                if error is not None:
+                    print(f"Skipped {path}: {error}", file=sys.stderr)
+                elif count is not None:
+                    files += 1
+                    findings += count
+            print(f"Imported {findings} findings from {files} files", file=sys.stderr)
+            return 0
+        start_time = TimeManager.get_current_time()
+        if args.command == 'hosts':
+            rows = history.hosts_with_port(args.port, args.state, since_days(args.days) if args.days else None)
+        elif args.command == 'ports':
+            rows = history.ports_of_host(args.host, args.state, since_days(args.days) if args.days else None)
+        elif args.command == 'first':
+            seen = history.first_seen(args.host, args.port)
+            rows = [{'host': args.host, 'port': args.port, 'first_seen': seen}] if seen else []
+        elif args.command == 'timeline':
+            rows = history.timeline(args.host, args.port)
+        else:
+            rows = history.scans(args.limit)
+        elapsed_ms = TimeManager.get_elapsed_time(start_time) * 1000
+    for row in rows:
+        print(json.dumps(row) if args.json else format_row(row))
+    print(f"{len(rows)} rows in {elapsed_ms:.1f} ms", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+import os
+import json
+from datetime import date
+
+from ports import PortSet, PortSlice
+from portstate import PortStateStore, STATE_OPEN, STATE_CLOSED, STATE_FILTERED
+from results import EVENT_PORT, read_stream, result_file_prefix
+from scheduler import TargetList
+
+DELTA_OPENED = 'opened'
+DELTA_CLOSED = 'closed'
+
+# Preferred baseline formats for one result stem, most complete first.
+BASELINE_EXTENSIONS = ('.pss', '.ndjson', '.json')
+
+def find_baseline(results_dir: str, target: str):
+    """Return the path of the newest result file for a target, or None."""
+    prefix = result_file_prefix(target)
+    stems = {}
+    try:
+        names = os.listdir(results_dir)
+    except OSError:
+        return None
+    for name in names:
+        stem, extension = os.path.splitext(name)
+        if name.startswith(prefix) and extension in BASELINE_EXTENSIONS:
+            path = os.path.join(results_dir, name)
+            stems.setdefault(stem, []).append((BASELINE_EXTENSIONS.index(extension), path))
+    if not stems:
+        return None
+    # Stems end with the scan time, and a scan's files share one stem.
+    newest = max(stems, key=lambda stem: max(os.path.getmtime(path) for _, path in stems[stem]))
+    return min(stems[newest])[1]
+
+def load_baseline(path: str) -> PortStateStore:
+    """Load the port states recorded in a .pss, .ndjson or .json result file."""
+    if path.endswith('.pss'):
+        return PortStateStore.load(path)
+    store = PortStateStore()
+    if path.endswith('.ndjson'):
+        for event in read_stream(path):
+            if event.get('event') == EVENT_PORT:
+                store.add(event)
+        return store
+    with open(path, encoding='utf-8') as file:
+        data = json.load(file)
+    for record in data.get('open_ports', []):
+        # Exports from before multi-host scans have no host field.
+        store.add(dict(record, host=record.get('host', data.get('ip')), state=STATE_OPEN))
+    return store
+
+class IncrementalPlan:
+    """Re-check of previously scanned targets that reports only changes.
+
+    Ports that were open in the baseline are probed first, then a rotating
+    slice of the range: with `slices=N` each run covers every N-th port,
+    starting at an offset that advances daily, so N runs cover the full range.
+    The slice skips the pairs the first phase already probed.
+    """
+
+    def __init__(self, baseline: PortStateStore, ports: PortSet, slices: int = 1, slice_index: int = None) -> None:
+        """Initialize the plan from the baseline store and the full port set."""
+        self.baseline = baseline
+        self.ports = ports
+        self.slices = max(1, slices)
+        if slice_index is None:
+            slice_index = date.today().toordinal()
+        self.slice_index = slice_index % self.slices
+        self.current = PortStateStore()
+
+    def known_open(self, targets) -> dict:
+        """Return {host: open ports} of the baseline for hosts among the targets."""
+        known = {}
+        for host in self.baseline.hosts:
+            ports = [port for port in self.baseline.ports(host) if port in self.ports]
+            if ports:
+                known[host] = ports
+        if not known:
+            return {}
+        return {host: known[host] for host in targets if host in known}
+
+    def phases(self, targets: TargetList) -> list:
+        """Return the (targets, ports, exclude) triples to scan, in order.
+
+        `exclude` maps hosts to the ports an earlier phase has probed on them.
+        """
+        phases = []
+        exclude = None
+        known = self.known_open(targets)
+        if known:
+            ports = PortSet.from_ports(set().union(*known.values()))
+            phases.append((TargetList(list(known)), ports, None))
+            # Every known host is probed on the union of their ports.
+            exclude = dict.fromkeys(known, ports)
+        sliced = self.ports if self.slices == 1 else PortSlice(self.ports, self.slice_index, self.slices)
+        if len(sliced):
+            phases.append((targets, sliced, exclude))
+        return phases
+
+    def delta(self, record: dict):
+        """Record a result and return DELTA_OPENED, DELTA_CLOSED or None."""
+        host, port, state = record['host'], record['port'], record['state']
+        seen = self.current.state(host, port) == state
+        self.current.add(record)
+        if seen:
+            return None
+        previous = self.baseline.state(host, port)
+        if state == STATE_OPEN and previous != STATE_OPEN:
+            return DELTA_OPENED
+        if state in (STATE_CLOSED, STATE_FILTERED) and previous == STATE_OPEN:
+            return DELTA_CLOSED
+        return None
+
+    def merged(self) -> PortStateStore:
+        """Return the baseline updated with this run's results, the next run's baseline."""
+        store = PortStateStore.from_bytes(self.baseline.to_bytes())
+        store.update(self.current)
+        return store
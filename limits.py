@@ -0,0 +1,118 @@
+import sys
+import socket
+import struct
+import itertools
+
+from config import AppConfig
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+EPHEMERAL_PORT_RANGE_PATH = '/proc/sys/net/ipv4/ip_local_port_range'
+
+# SO_LINGER with a zero timeout makes close() send a RST instead of a FIN,
+# so the local port is not held in TIME_WAIT.
+LINGER_ABORT = struct.pack('ii', 1, 0)
+
+# Lets bind() to a source address defer picking the local port until
+# connect(), so the port can be shared across destinations (Linux 4.2+).
+IP_BIND_ADDRESS_NO_PORT = getattr(
+    socket, 'IP_BIND_ADDRESS_NO_PORT', 24 if sys.platform.startswith('linux') else None
+)
+
+def fd_limit(raise_soft: bool = AppConfig.RAISE_FD_LIMIT, apply: bool = True):
+    """Return the soft RLIMIT_NOFILE, first raising it to the hard limit if allowed.
+
+    With `apply` false the raised limit is returned without setting it, for
+    a parent whose worker processes raise their own. Returns None where the
+    limit cannot be read, e.g. on Windows.
+    """
+    if resource is None:
+        return None
+    try:
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if raise_soft and soft != hard and hard != resource.RLIM_INFINITY:
+            if apply:
+                resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+            soft = hard
+    except (OSError, ValueError):
+        try:
+            soft = resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+        except (OSError, ValueError):
+            return None
+    return None if soft == resource.RLIM_INFINITY else soft
+
+def ephemeral_port_range(path: str = EPHEMERAL_PORT_RANGE_PATH):
+    """Return the (low, high) local port range of the kernel, or None if unknown."""
+    try:
+        with open(path, encoding='ascii') as file:
+            low, high = (int(value) for value in file.read().split())
+    except (OSError, ValueError):
+        return None
+    return (low, high) if low <= high else None
+
+class ProbeBudget:
+    """Upper bound for probes in flight derived from the local socket resources.
+
+    Every probe holds one file descriptor and one local port while it is in
+    flight. The budget keeps FD_RESERVE descriptors free for the rest of the
+    process and uses at most EPHEMERAL_PORT_SHARE of the ephemeral port range
+    per source address, so the engine backs off before the kernel starts
+    failing connects with EMFILE or EADDRNOTAVAIL.
+    """
+
+    def __init__(self, concurrency: int, sources: int = 1, processes: int = 1) -> None:
+        """Initialize the budget for a requested concurrency split across processes."""
+        self.requested = concurrency
+        # Worker processes raise their own limit; the parent only plans with it.
+        self.fd_limit = fd_limit(apply=processes <= 1)
+        self.port_range = ephemeral_port_range()
+        limits = [concurrency]
+        if self.fd_limit is not None:
+            # Each worker process has its own descriptor table.
+            limits.append((self.fd_limit - AppConfig.FD_RESERVE) * max(1, processes))
+        if self.port_range is not None:
+            low, high = self.port_range
+            # The port range is shared by every process on the machine.
+            limits.append(int((high - low + 1) * AppConfig.EPHEMERAL_PORT_SHARE) * max(1, sources))
+        self.limit = max(1, min(limits))
+
+    def is_limited(self) -> bool:
+        """Return whether the local resources lowered the requested concurrency."""
+        return self.limit < self.requested
+
+    def describe(self) -> str:
+        """Return a one-line description for logs."""
+        fds = self.fd_limit if self.fd_limit is not None else "unknown"
+        ports = "{}-{}".format(*self.port_range) if self.port_range else "unknown"
+        return f"In-flight budget {self.limit} (requested {self.requested}, fd limit {fds}, ephemeral ports {ports})"
+
+class SocketFactory:
+    """Create non-blocking probe sockets, optionally bound to rotating source addresses."""
+
+    def __init__(self, sources=(), abort_on_close: bool = AppConfig.PROBE_RST_ON_CLOSE) -> None:
+        """Initialize the factory."""
+        self.sources = tuple(sources)
+        self.abort_on_close = abort_on_close
+        self.next_source = itertools.cycle(self.sources) if self.sources else None
+
+    def create(self) -> socket.socket:
+        """Return a new non-blocking TCP socket ready for connect."""
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            s.setblocking(False)
+            if self.abort_on_close:
+                s.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, LINGER_ABORT)
+            if self.next_source:
+                if IP_BIND_ADDRESS_NO_PORT is not None:
+                    try:
+                        s.setsockopt(socket.IPPROTO_IP, IP_BIND_ADDRESS_NO_PORT, 1)
+                    except OSError:
+                        pass
+                s.bind((next(self.next_source), 0))
+        except BaseException:
+            s.close()
+            raise
+        return s
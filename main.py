@@ -1,17 +1,50 @@
+import time
+
+# Taken before the heavy imports so the startup measurement covers them.
+STARTUP_TIME = time.perf_counter()
+
 import os
-import json
+import sys
+import random
 import socket
 import tkinter
 from tkinter import messagebox
 import customtkinter as ctk
 
 from config import AppConfig
+from scheduler import TargetList, validate_target, SCAN_ORDERS
+from adaptive import REASON_RAMP
+from portstate import PortStateStore
+from ports import PortSet, parse_port_spec
+from telemetry import ScanTelemetry
+from checkpoint import Checkpoint, checkpoint_path
+from results import (
+    NdjsonSink,
+    EVENT_STARTED,
+    EVENT_COMPLETED,
+    EVENT_STOPPED,
+    EVENT_CANCELLED,
+    EVENT_LOG,
+    EVENT_STATUS,
+    STATUS_IN_PROGRESS,
+    iter_logs,
+    iter_open_ports,
+    result_file_prefix,
+    summarize_stream,
+    write_json_report,
+    write_txt_report
+)
 from manager import (
     FileManager,
     LogManager,
+    LOG_LEVELS,
+    LOG_INFO,
+    LOG_WARNING,
+    LOG_ERROR,
     ThreadManager,
     TimeManager,
-    SoundManager
+    SoundManager,
+    UIUpdateManager
 )
 
 class BaseApp:
@@ -59,6 +92,8 @@ class BaseApp:
         self.file_menu.add_command(label="Save Results as JSON", command=lambda: self.save_results("json"))
         self.file_menu.add_command(label="Save Results as TXT", command=lambda: self.save_results("txt"))
         self.file_menu.add_separator()
+        self.file_menu.add_command(label="Scan History", command=self.show_history)
+        self.file_menu.add_separator()
         self.file_menu.add_command(label="Exit", command=self.root.quit)
 
     def create_settings_menu(self) -> None:
@@ -76,6 +111,45 @@ class BaseApp:
             label="Change Theme",
             command=lambda: AppConfig.toggle_theme()
         )
+        self.settings_menu.add_command(
+            label="Toggle Sound",
+            command=self.toggle_sound
+        )
+        self.settings_menu.add_command(
+            label="Toggle Incremental Scan",
+            command=self.toggle_incremental
+        )
+        self.settings_menu.add_command(
+            label="Toggle Fingerprinting",
+            command=self.toggle_fingerprint
+        )
+        self.order_menu = tkinter.Menu(
+            self.settings_menu,
+            tearoff=0,
+            bg=AppConfig.COLORS["background"],
+            fg=AppConfig.COLORS["foreground"],
+            activebackground=AppConfig.COLORS["active_background"],
+            activeforeground=AppConfig.COLORS["active_foreground"]
+        )
+        self.settings_menu.add_cascade(label="Port Order", menu=self.order_menu)
+        for order in SCAN_ORDERS:
+            self.order_menu.add_radiobutton(label=order.capitalize(), value=order, variable=self.scan_order)
+        self.log_level_menu = tkinter.Menu(
+            self.settings_menu,
+            tearoff=0,
+            bg=AppConfig.COLORS["background"],
+            fg=AppConfig.COLORS["foreground"],
+            activebackground=AppConfig.COLORS["active_background"],
+            activeforeground=AppConfig.COLORS["active_foreground"]
+        )
+        self.settings_menu.add_cascade(label="Log Level", menu=self.log_level_menu)
+        for level in LOG_LEVELS:
+            self.log_level_menu.add_radiobutton(
+                label=level.capitalize(),
+                value=level,
+                variable=self.log_level,
+                command=self.change_log_level
+            )
 
 class App(BaseApp):
     """Main GUI class for the port scanner application."""
@@ -85,19 +159,40 @@ class App(BaseApp):
         super().__init__()
 
         self.sound_manager = SoundManager(self.resources_path)
-        self.thread_manager = ThreadManager()
+        self.thread_manager = ThreadManager(self.config.DEFAULT_THREADS)
         self.time_manager = TimeManager()
         self.log_manager = LogManager()
+        self.log_manager.on_record = self.stream_log
         self.file_manager = FileManager()
+        self._reachability = None
 
         self.config.apply_theme(self.root)
 
         self.start_time = self.time_manager.get_current_time()
         self.results_dir = os.path.join(self.directory, "results")
-        self.local_ip = self.get_local_ip()
+        # Filled in by load_in_background; the resolver can block for seconds.
+        self.local_ip = self.config.DEFAULT_IP
         self.scanning = False
         self.timeout = self.config.DEFAULT_TIMEOUT
         self.threads = self.config.DEFAULT_THREADS
+        self.concurrency = self.config.DEFAULT_CONCURRENCY
+        self.processes = self.config.DEFAULT_PROCESSES
+        self.scan_engine = None
+        self.scan_meta = None
+        self.sink = None
+        self.port_states = None
+        self.telemetry = None
+        self.incremental = self.config.INCREMENTAL_SCAN
+        self.fingerprint = self.config.FINGERPRINT_ENABLED
+        self.fingerprints = None
+        self.plan = None
+        self.checkpoint = None
+        self.history = None
+        self.history_window = None
+        self.paused = False
+        self.cancelled = False
+        self.scan_order = tkinter.StringVar(self.root, value=self.config.DEFAULT_SCAN_ORDER)
+        self.log_level = tkinter.StringVar(self.root, value=self.config.LOG_LEVEL)
         self.port_range = self.config.DEFAULT_PORT_RANGE
 
         os.makedirs(self.results_dir, exist_ok=True)
@@ -106,13 +201,95 @@ class App(BaseApp):
         self.create_file_menu()
         self.create_settings_menu()
         self.create_widgets()
-        self.on_ip_change(self.local_ip)
-        
-        self.log_manager.log_message(self.general_logs, "Application started")
+        self.ui = UIUpdateManager(self.root)
+        self.ui.start()
+        self.ip_status_label.configure(text="Detecting...", text_color="gray")
+        self.thread_manager.start_thread(self.load_in_background)
+        self.root.after_idle(self.report_startup_time)
+
+    @property
+    def reachability(self):
+        """Return the reachability checker, importing asyncio on first use."""
+        if self._reachability is None:
+            from reachability import ReachabilityChecker
+            self._reachability = ReachabilityChecker(self.thread_manager)
+        return self._reachability
+
+    def load_in_background(self) -> None:
+        """Do the slow parts of startup off the Tk thread, then fill in their widgets."""
+        # Warm the import cache so the first scan and reachability check start instantly.
+        import scanner
+        import reachability
+        self.sound_manager.preload()
+        local_ip = self.get_local_ip()
+        self.ui.post(self.on_local_ip, local_ip)
+
+    def on_local_ip(self, local_ip: str) -> None:
+        """Show the detected local IP unless the user already picked a target."""
+        if self.ip_entry.get() == self.local_ip:
+            self.ip_entry.set(local_ip)
+        self.local_ip = local_ip
+        self.on_ip_change(self.ip_entry.get())
+
+    def report_startup_time(self) -> None:
+        """Log how long it took until the window was up and idle."""
+        elapsed_ms = (time.perf_counter() - STARTUP_TIME) * 1000
+        self.log_manager.log_message(self.general_logs, f"Application started in {elapsed_ms:.0f} ms")
+        if '--startup-time' in sys.argv:
+            print(f"{elapsed_ms:.1f}")
+            self.root.after(0, self.root.destroy)
+
+    def toggle_sound(self) -> None:
+        """Enable or disable sound effects."""
+        enabled = self.sound_manager.toggle()
+        self.log_manager.log_message(self.general_logs, f"Sound {'enabled' if enabled else 'disabled'}")
+
+    def toggle_incremental(self) -> None:
+        """Switch between full scans and re-checks against the last results."""
+        self.incremental = not self.incremental
+        self.log_manager.log_message(
+            self.general_logs, f"Incremental scan {'enabled' if self.incremental else 'disabled'}"
+        )
+
+    def toggle_fingerprint(self) -> None:
+        """Enable or disable banner grabbing on open ports."""
+        self.fingerprint = not self.fingerprint
+        self.log_manager.log_message(
+            self.general_logs, f"Fingerprinting {'enabled' if self.fingerprint else 'disabled'}"
+        )
+
+    def change_log_level(self) -> None:
+        """Redraw the log view with the selected minimum level."""
+        self.log_manager.set_level(self.log_level.get(), self.general_logs)
+
+    def post_log(self, message: str, level: str = LOG_INFO) -> None:
+        """Record a log message from any thread and schedule a redraw of the log view."""
+        self.log_manager.add(message, level)
+        self.ui.post_latest('logs', self.render_logs)
+
+    def render_logs(self) -> None:
+        """Append the records logged since the last redraw."""
+        self.log_manager.render(self.general_logs)
+
+    def stream_log(self, record) -> None:
+        """Keep the full log in the result stream while one is open."""
+        if self.sink:
+            self.sink.write(EVENT_LOG, timestamp=record.timestamp, level=record.level, message=record.message)
 
     def get_local_ip(self) -> str:
         """Get the local IP address of the machine."""
-        return socket.gethostbyname(socket.gethostname())
+        # Connecting a UDP socket selects the outgoing interface without sending packets
+        # or touching the resolver.
+        try:
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+                s.connect(('10.255.255.255', 1))
+                return s.getsockname()[0]
+        except OSError:
+            pass
+        try:
+            return socket.gethostbyname(socket.gethostname())
+        except OSError:
+            return self.config.DEFAULT_IP
 
     def create_widgets(self) -> None:
         """Create the widgets for the application."""
@@ -187,9 +364,30 @@ class App(BaseApp):
         self.end_port_slider.grid(row=2, column=2, padx=5, pady=5)
         self.end_port_slider.set(1024)
 
+        # Port specification; overrides the range above when filled in
+        self.ports_label = ctk.CTkLabel(
+            main_frame,
+            text="Ports:"
+        )
+        self.ports_entry = ctk.CTkComboBox(
+            main_frame,
+            width=150,
+            values=list(AppConfig.PORT_PRESETS)
+        )
+        self.ports_hint_label = ctk.CTkLabel(
+            main_frame,
+            text="e.g. 22,80,1000-2000",
+            text_color="gray"
+        )
+
+        self.ports_label.grid(row=3, column=0, padx=5, pady=5)
+        self.ports_entry.set("")
+        self.ports_entry.grid(row=3, column=1, padx=5, pady=5)
+        self.ports_hint_label.grid(row=3, column=2, padx=5, pady=5)
+
         # Butonlar
         button_frame = ctk.CTkFrame(main_frame)
-        button_frame.grid(row=3, column=0, columnspan=3, pady=10)
+        button_frame.grid(row=4, column=0, columnspan=3, pady=10)
 
         # Widget Definitions
         self.scan_button = ctk.CTkButton(
@@ -202,16 +400,23 @@ class App(BaseApp):
             text=AppConfig.STOP_BUTTON_TEXT,
             command=self.stop_scan
         )
+        self.pause_button = ctk.CTkButton(
+            button_frame,
+            text=AppConfig.PAUSE_BUTTON_TEXT,
+            command=self.toggle_pause
+        )
 
         # Widget Placements
         self.scan_button.pack(side='left', padx=5)
         self.stop_button.pack(side='left', padx=5)
         self.stop_button.pack_forget()
         self.stop_button.configure(state="disabled")
+        self.pause_button.pack(side='left', padx=5)
+        self.pause_button.pack_forget()
 
         # Progress Bar with scan range label (initially hidden)
         self.progress_frame = ctk.CTkFrame(main_frame)
-        self.progress_frame.grid(row=4, column=0, columnspan=3, padx=5, pady=5, sticky='ew')
+        self.progress_frame.grid(row=5, column=0, columnspan=3, padx=5, pady=5, sticky='ew')
         self.progress_label_left = ctk.CTkLabel(
             self.progress_frame,
             text="Progress:"
@@ -234,12 +439,22 @@ class App(BaseApp):
             main_frame,
             text=""
         )
-        self.scan_range_label.grid(row=5, column=0, columnspan=3, pady=5, padx=5)
+        self.scan_range_label.grid(row=6, column=0, columnspan=3, pady=5, padx=5)
         self.scan_range_label.grid_remove()  # Hide initially
 
+        # Scan statistics (initially hidden)
+        self.stats_label = ctk.CTkLabel(
+            main_frame,
+            text="",
+            text_color="gray",
+            justify='left'
+        )
+        self.stats_label.grid(row=7, column=0, columnspan=3, pady=5, padx=5)
+        self.stats_label.grid_remove()
+
         # Logs Frame
         logs_frame = ctk.CTkFrame(main_frame)
-        logs_frame.grid(row=6, column=0, columnspan=3, padx=5, pady=5, sticky='nsew')
+        logs_frame.grid(row=8, column=0, columnspan=3, padx=5, pady=5, sticky='nsew')
 
         # General Logs
         self.general_logs = ctk.CTkTextbox(
@@ -261,7 +476,7 @@ class App(BaseApp):
         self.open_ports_list.pack(side='right', fill='y', padx=5, pady=5)
 
         # Configure grid weights
-        main_frame.grid_rowconfigure(6, weight=1)
+        main_frame.grid_rowconfigure(8, weight=1)
         main_frame.grid_columnconfigure(1, weight=1)
 
     def update_start_port_entry(self, value) -> None:
@@ -275,202 +490,597 @@ class App(BaseApp):
         self.end_port_entry.insert(0, str(int(value)))
 
     def validate_ip(self, ip: str) -> bool:
-        """Validate the given IP address."""
-        try:
-            socket.inet_aton(ip)
-            return True
-        except socket.error:
-            return False
-
-    def check_ip_reachability(self, ip: str) -> bool:
-        """Check if the given IP address is reachable."""
-        try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.settimeout(1)
-                s.connect((ip, 80))
-                s.close()
-            return True
-        except (socket.timeout, ConnectionRefusedError, OSError):
-            return False
+        """Validate the given target: an IP address, host name, CIDR network, range or @file."""
+        return all(validate_target(spec) for spec in ip.split(','))
 
     def on_ip_change(self, selected_ip: str) -> None:
         """Handle the IP address change event."""
         ip = selected_ip
-        if self.validate_ip(ip):
-            if self.check_ip_reachability(ip):
-                self.ip_status_label.configure(text="Reachable", text_color="green")
-            else:
-                self.ip_status_label.configure(text="Unreachable", text_color="red")
-        else:
+        if not self.validate_ip(ip):
             self.ip_status_label.configure(text="Invalid IP", text_color="red")
+            return
+        hosts = TargetList(ip.split(',')).count()
+        if hosts != 1:
+            self.ip_status_label.configure(text=f"{hosts} hosts" if hosts else "Host list", text_color="green")
+            return
+        self.ip_status_label.configure(text="Checking...", text_color="gray")
+        self.reachability.check(ip, lambda reachable: self.ui.post(self.show_reachability, ip, reachable))
+
+    def show_reachability(self, ip: str, reachable: bool) -> None:
+        """Show a reachability verdict if the target has not changed since the check."""
+        if self.ip_entry.get() != ip:
+            return
+        if reachable:
+            self.ip_status_label.configure(text="Reachable", text_color="green")
+        else:
+            self.ip_status_label.configure(text="Unreachable", text_color="red")
 
     def start_scan(self) -> None:
-        """Start the port scanning process."""
+        """Validate the input and start the scan once the target is known to be up."""
         ip = self.ip_entry.get()
-        if not self.check_ip_reachability(ip):
-            response = messagebox.askyesno("Warning", "IP is unreachable. Do you want to continue scanning?")
-            if not response:
+        if not self.validate_ip(ip):
+            messagebox.showerror("Error", "Invalid target. Use an IP, host name, CIDR network, range or @file.")
+            return
+        spec = self.ports_entry.get().strip()
+        if spec:
+            try:
+                port_spec = parse_port_spec(spec)
+            except ValueError as e:
+                messagebox.showerror("Error", f"Invalid port specification: {e}")
+                return
+            if port_spec.udp:
+                self.log_manager.log_message(
+                    self.general_logs, f"UDP ports are not scanned: {port_spec.udp}", LOG_WARNING
+                )
+            ports = port_spec.tcp
+            if not ports:
+                messagebox.showerror("Error", "No TCP ports to scan.")
                 return
-        start_port = int(self.start_port_entry.get())
-        end_port = int(self.end_port_entry.get())
+        else:
+            start_port = int(self.start_port_entry.get())
+            end_port = int(self.end_port_entry.get())
+
+            if start_port > end_port:
+                messagebox.showerror("Error", "Start port cannot be greater than end port.")
+                return
+            ports = PortSet([(start_port, end_port)])
+
+        path = checkpoint_path(self.results_dir, ip)
+        if os.path.exists(path) and messagebox.askyesno(
+            "Resume", f"An unfinished scan of {ip} was found. Continue it instead of starting over?"
+        ):
+            self.resume_scan(path)
+            return
 
-        if start_port > end_port:
-            messagebox.showerror("Error", "Start port cannot be greater than end port.")
+        targets = TargetList(ip.split(','))
+        if not targets.is_single_host():
+            self.begin_scan(ip, targets, ports)
             return
 
+        # The verdict is usually cached from on_ip_change; otherwise wait for it off the Tk thread.
+        self.scan_button.configure(state="disabled")
+        self.reachability.check(
+            ip,
+            lambda reachable: self.ui.post(self.confirm_scan, ip, targets, ports, reachable)
+        )
+
+    def confirm_scan(self, ip: str, targets, ports: PortSet, reachable: bool) -> None:
+        """Ask before scanning an unreachable host, then start the scan."""
+        self.scan_button.configure(state="normal")
+        self.show_reachability(ip, reachable)
+        if not reachable:
+            response = messagebox.askyesno("Warning", "IP is unreachable. Do you want to continue scanning?")
+            if not response:
+                return
+        self.begin_scan(ip, targets, ports)
+
+    def begin_scan(self, ip: str, targets, ports: PortSet, checkpoint: Checkpoint = None) -> None:
+        """Start the port scanning process, or continue it from a checkpoint."""
+        from scanner import ScanEngine, PORT_OPEN, PORT_CLOSED, PORT_FILTERED, PORT_ERROR
+        resumed = checkpoint is not None
         self.scanning = True  # Set scanning flag to True
-        self.stop_button.pack()  # Show stop button when scan starts
+        self.paused = False
+        self.cancelled = False
+        self.stop_button.pack(side='left', padx=5)  # Show stop button when scan starts
         self.stop_button.configure(state="normal")
+        self.pause_button.configure(text=AppConfig.PAUSE_BUTTON_TEXT, state="normal")
+        self.pause_button.pack(side='left', padx=5)
         self.scan_button.configure(state="disabled")  # Disable start button when scan starts
-        target_ip = self.ip_entry.get()
 
-        self.general_logs.delete(1.0, 'end')
+        self.log_manager.clear()
         self.open_ports_list.delete(1.0, 'end')
         self.open_ports = []  # Initialize open_ports list
+        # Every probed port's state, two bits per port, for the binary export.
+        self.port_states = PortStateStore()
+        # Shared by every phase of the scan.
+        self.telemetry = ScanTelemetry()
+        if resumed:
+            self.scan_meta = checkpoint.meta
+            if checkpoint.store is not None:
+                self.port_states = checkpoint.store
+        else:
+            self.scan_meta = {
+                'ip': ip,
+                'start_port': ports[0],
+                'end_port': ports[-1],
+                'ports': str(ports),
+                'multi_host': not targets.is_single_host(),
+                'order': self.scan_order.get(),
+                # Recorded so a random order can be repeated.
+                'seed': random.randrange(1 << 32),
+                'processes': self.processes,
+                'window': self.config.SCHEDULER_WINDOW,
+                'incremental': self.incremental,
+                'slices': self.config.INCREMENTAL_SLICES
+            }
+        self.multi_host = self.scan_meta['multi_host']
+
+        self.plan = None
+        if self.scan_meta['incremental']:
+            from incremental import IncrementalPlan, find_baseline, load_baseline
+            baseline = checkpoint.meta['baseline'] if resumed else find_baseline(self.results_dir, ip)
+            self.plan = IncrementalPlan(
+                load_baseline(baseline) if baseline else PortStateStore(),
+                ports,
+                slices=self.scan_meta['slices'],
+                slice_index=checkpoint.meta['slice_index'] if resumed else None
+            )
+            # The same phases and slice must be scanned when the scan is resumed.
+            self.scan_meta['baseline'] = baseline
+            self.scan_meta['slice_index'] = self.plan.slice_index
+            if resumed:
+                self.plan.current = PortStateStore.from_bytes(self.port_states.to_bytes())
+
+        if self.sink:
+            self.sink.close()
+        self.sink = None
+        if resumed and checkpoint.stream:
+            self.sink = NdjsonSink(checkpoint.stream)
+        elif self.config.STREAM_RESULTS and not resumed:
+            # Findings go straight to disk instead of accumulating in open_ports.
+            self.sink = NdjsonSink(os.path.join(self.results_dir, f"{self.result_file_stem()}.ndjson"))
+            self.sink.write(EVENT_STARTED, timestamp=self.time_manager.get_formatted_time(), **self.scan_meta)
+
+        if self.history:
+            self.history.close()
+        self.history = None
+        if self.config.HISTORY_ENABLED:
+            import sqlite3
+            from history import ScanHistory, history_path
+            try:
+                self.history = ScanHistory(history_path(self.results_dir))
+                if resumed and checkpoint.meta.get('history_scan'):
+                    self.history.resume_scan(checkpoint.meta['history_scan'])
+                else:
+                    self.history.start_scan(ip, str(ports), source=self.sink.path if self.sink else None)
+                    self.scan_meta['history_scan'] = self.history.scan_id
+            except (sqlite3.Error, ValueError) as e:
+                self.log_manager.log_message(self.general_logs, f"Scan history disabled: {e}", LOG_WARNING)
+                if self.history:
+                    self.history.close()
+                self.history = None
+
+        if resumed:
+            checkpoint.sink = self.sink
+            checkpoint.store = self.port_states
+            found = iter_open_ports(checkpoint.stream) if checkpoint.stream else checkpoint.findings
+            if not checkpoint.stream:
+                self.open_ports = list(checkpoint.findings)
+            self.open_ports_list.insert('end', "".join(
+                f"{record['host']}:{record['port']}\n" if self.multi_host else f"{record['port']}\n"
+                for record in found
+            ))
+        elif self.config.CHECKPOINT_ENABLED:
+            checkpoint = Checkpoint(
+                checkpoint_path(self.results_dir, ip),
+                self.scan_meta,
+                sink=self.sink,
+                store=self.port_states
+            )
+        self.checkpoint = checkpoint
 
         # Log the start time
         self.start_time = self.time_manager.get_current_time()
-        self.log_manager.log_message(self.general_logs, "Scan started")
+        if resumed:
+            self.log_manager.log_message(self.general_logs, f"Scan resumed from {os.path.basename(checkpoint.path)}")
+        else:
+            self.log_manager.log_message(self.general_logs, "Scan started")
 
-        self.scan_range_label.configure(text=f"Scanning {target_ip} from port {start_port} to {end_port}...")
+        self.scan_range_label.configure(text=f"Scanning {ip} ports {ports}...")
         self.scan_range_label.grid()  # Show scan range label
+        self.stats_label.configure(text=self.telemetry.summary_line())
+        self.stats_label.grid()
         self.progress_frame.grid()  # Show progress bar
         self.progress.set(0)
-        self.progress['maximum'] = end_port - start_port + 1
+        self.progress['maximum'] = len(ports)
+
+        # Very large sweeps are sharded across worker processes.
+        scanner_class = ScanEngine
+        options = {}
+        if self.scan_meta['processes'] > 1:
+            from sharding import ShardedScanner
+            scanner_class = ShardedScanner
+            options = {'processes': self.scan_meta['processes']}
+        phases = self.plan.phases(targets) if self.plan else [(targets, ports, None)]
+        if self.plan:
+            self.log_manager.log_message(
+                self.general_logs,
+                f"Comparing with {os.path.basename(baseline) if baseline else 'no earlier results'}"
+            )
+        self.fingerprints = None
+        if self.fingerprint:
+            from fingerprint import FingerprintCache, fingerprint_cache_path
+            # Earlier fingerprints are reused by the engines and refreshed from the results.
+            self.fingerprints = FingerprintCache.load(fingerprint_cache_path(self.results_dir))
+        first_phase = checkpoint.phase if checkpoint else 0
+        engines = []
+        for phase_targets, phase_ports, exclude in phases[first_phase:]:
+            engines.append(scanner_class(
+                phase_targets,
+                phase_ports,
+                exclude=exclude,
+                timeout=self.timeout,
+                concurrency=self.concurrency,
+                report=(PORT_OPEN, PORT_CLOSED, PORT_FILTERED, PORT_ERROR),
+                window=self.scan_meta['window'],
+                order=self.scan_meta['order'],
+                seed=self.scan_meta['seed'],
+                telemetry=self.telemetry,
+                resume=checkpoint.resume_cursors() if resumed and not engines else None,
+                fingerprint=self.fingerprint,
+                fingerprint_cache=self.fingerprints.path if self.fingerprints else None,
+                **options
+            ))
+        self.scan_engine = engines[0] if engines else None
+        if self.scan_engine and self.scan_engine.budget.is_limited():
+            self.log_manager.log_message(self.general_logs, self.scan_engine.budget.describe(), LOG_WARNING)
+        self.total_ports = sum(
+            engine.count() or len(phase_ports)
+            for engine, (_, phase_ports, _) in zip(engines, phases[first_phase:])
+        ) + (checkpoint.scanned_before if checkpoint else 0) or 1
+        self.scanned_before = checkpoint.scanned_before if checkpoint else 0
+        self.congestion = (AppConfig.AIMD_INITIAL, "initial")
+
+        # Engine callbacks run on the scan thread and only post to the UI queue.
+        history = self.history
+        fingerprints = self.fingerprints
 
-        def scan_port(port: int) -> None:
-            """Scan a single port and update the UI with the result."""
-            if not self.scanning:  # Check scanning flag
+        def on_result(record: dict) -> None:
+            """Stream a finding and queue it for the next UI tick."""
+            self.port_states.add(record)
+            if fingerprints:
+                fingerprints.add(record)
+            change = self.plan.delta(record) if self.plan else None
+            # Recorded before the output filter, so unchanged open ports of an incremental scan are kept too.
+            if history and (change or record['state'] == PORT_OPEN):
+                history.add(record)
+            if self.plan:
+                # Incremental scans only show what changed since the last results.
+                if change is None and record['state'] != PORT_ERROR:
+                    return
+                if change:
+                    record['change'] = change
+                    self.post_log(f"Port {record['host']}:{record['port']} {change} since the last scan", LOG_WARNING)
+            elif record['state'] in (PORT_CLOSED, PORT_FILTERED):
                 return
-            try:
-                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                    s.settimeout(0.1)
-                    result = s.connect_ex((target_ip, port))
-                    if result == 0:
-                        timestamp = self.time_manager.get_formatted_time()
-                        try:
-                            service = socket.getservbyport(port)
-                        except OSError:
-                            service = "Unknown"
-                        self.open_ports_list.insert('end', f"{port}\n")
-                        self.open_ports_list.see('end')
-                        self.open_ports.append({'port': port, 'service': service, 'timestamp': timestamp})
-                        self.log_manager.log_message(self.general_logs, f"Port {port} ({service}) is open")
-                        self.sound_manager.play_port_detected_sound()
-            except Exception as e:
-                self.log_manager.log_message(self.general_logs, f"Error occurred while scanning port {port}: {str(e)}")
+            if self.sink:
+                self.sink.record(record)
+            if record['state'] == PORT_ERROR:
+                self.post_log(f"Error occurred while scanning port {record['port']}: {record['error']}", LOG_ERROR)
+                return
+            if record['state'] != PORT_OPEN:
+                # Closed since the last scan: streamed and logged, but not listed.
+                return
+            if checkpoint:
+                checkpoint.add_finding(record)
+            if not self.sink:
+                self.open_ports.append(record)
+            self.ui.post_batch('open_ports', record, self.show_open_ports)
+
+        def on_limit(host, limit: int, reason: str) -> None:
+            """Track the in-flight limit for the status line and log back-offs."""
+            if host is None:
+                self.congestion = (limit, reason)
+            if reason != REASON_RAMP:
+                scope = host or "all hosts"
+                self.post_log(f"In-flight limit for {scope} lowered to {limit}: {reason}", LOG_WARNING)
+
+        def on_progress(scanned: int) -> None:
+            """Queue a coalesced progress update and checkpoint now and then."""
+            self.ui.post_latest('progress', self.show_progress, self.scanned_before + scanned)
+            if checkpoint:
+                checkpoint.maybe_save(self.scan_engine)
 
         def scan_ports() -> None:
-            """Scan the ports in the given range."""
-            total_ports = end_port - start_port + 1
-
-            for port in range(start_port, end_port + 1):
-                if not self.scanning:  # Check scanning flag
-                    break
-                self.thread_manager.start_thread(scan_port, args=(port,))
-
-                # Update progress bar and scan range label
-                elapsed_time = self.time_manager.get_elapsed_time(self.start_time)
-                estimated_time = self.time_manager.estimate_remaining_time(elapsed_time, port - start_port + 1, total_ports)
-                self.scan_range_label.configure(
-                    text=f"Scanned {port - start_port + 1} of {total_ports} ports. "
-                         f"Elapsed: {elapsed_time:.2f}s, Estimated: {estimated_time:.2f}s"
-                )
-                self.progress.set((port - start_port + 1) / (end_port - start_port + 1))
-                self.progress_label_right.configure(
-                    text=f"{(port - start_port + 1) / (end_port - start_port + 1) * 100:.2f}%"
-                )
-                self.root.update_idletasks()
-
-            # Wait for remaining threads to finish
-            self.thread_manager.stop_all_threads()
-
-            if self.scanning:  # Check scanning flag
-                duration = self.time_manager.calculate_duration(self.start_time, self.time_manager.get_current_time())
-                self.scan_range_label.configure(text="Scan completed.")
-                self.log_manager.log_message(self.general_logs, "Scan completed")
-                self.log_manager.log_message(self.general_logs, f"Scan duration: {duration:.2f} seconds")
-                self.sound_manager.play_scan_completed_sound()
-            self.scanning = False  # Set scanning flag to False
-            self.stop_button.pack_forget()
-            self.stop_button.configure(state="disabled")
-            self.scan_button.configure(state="normal")
-            self.scan_range_label.grid_remove()  # Remove the scan range label
-
-        # Start the scan in a separate thread
+            """Scan the ports in the given range on the asyncio engine."""
+            sink = self.sink
+            plan = self.plan
+            try:
+                for engine in engines:
+                    # Published first, so a stop in between cancels this engine before it runs.
+                    self.scan_engine = engine
+                    if not self.scanning:
+                        break
+                    engine.run(on_result=on_result, on_progress=on_progress, on_limit=on_limit)
+                    self.scanned_before += engine.scanned
+                    if checkpoint and self.scanning:
+                        checkpoint.finish_phase(engine)
+                if plan and self.scanning:
+                    # The merged state is the baseline of the next incremental scan.
+                    plan.merged().save(os.path.join(self.results_dir, f"{self.result_file_stem(ip)}.pss"))
+                if checkpoint:
+                    if self.scanning:
+                        checkpoint.remove()
+                    else:
+                        # Stopped or paused: every delivered result is covered, so resume from here.
+                        checkpoint.save(self.scan_engine)
+            finally:
+                status = EVENT_COMPLETED if self.scanning else EVENT_STOPPED if self.paused else EVENT_CANCELLED
+                if sink:
+                    sink.write(
+                        status,
+                        timestamp=self.time_manager.get_formatted_time(),
+                        scanned=self.scanned_before,
+                        duration=round(self.time_manager.get_elapsed_time(self.start_time), 3),
+                        telemetry=self.telemetry.snapshot()
+                    )
+                    sink.flush()
+                if history:
+                    history.finish_scan(status, self.scanned_before)
+                if fingerprints:
+                    fingerprints.save()
+                self.ui.post(self.finish_scan)
+
+        # Run the event loop in a separate thread
         self.thread_manager.start_thread(scan_ports)
 
-    def stop_scan(self) -> None:
-        """Stop the ongoing port scanning process."""
-        self.scanning = False
+    def show_open_ports(self, records: list) -> None:
+        """Show a batch of open ports in the list, the log and with one alert sound."""
+        labels = [
+            f"{record['host']}:{record['port']}" if self.multi_host else f"{record['port']}"
+            for record in records
+        ]
+        self.open_ports_list.insert('end', "".join(f"{label}\n" for label in labels))
+        self.open_ports_list.see('end')
+        for label, record in zip(labels, records):
+            product = f" {record['product']} {record.get('version') or ''}".rstrip() if record.get('product') else ""
+            self.log_manager.add(f"Port {label} ({record['service']}{product}) is open")
+        self.render_logs()
+        self.sound_manager.play_port_detected_sound()
+
+    def show_progress(self, scanned: int) -> None:
+        """Update progress bar, ETA and in-flight status line."""
+        if not self.scanning:
+            return
+        elapsed_time = self.time_manager.get_elapsed_time(self.start_time)
+        estimated_time = self.time_manager.estimate_remaining_time(elapsed_time, scanned, self.total_ports)
+        limit, reason = self.congestion
+        self.scan_range_label.configure(
+            text=f"Scanned {scanned} of {self.total_ports} ports. "
+                 f"Elapsed: {elapsed_time:.2f}s, Estimated: {estimated_time:.2f}s\n"
+                 f"In flight: {limit} ({reason})"
+        )
+        self.progress.set(min(scanned / self.total_ports, 1))
+        self.progress_label_right.configure(text=f"{scanned / self.total_ports * 100:.2f}%")
+        self.stats_label.configure(text=self.telemetry.summary_line())
+
+    def finish_scan(self) -> None:
+        """Restore the idle UI state once the engine has returned."""
+        if self.scanning:  # Check scanning flag
+            duration = self.time_manager.calculate_duration(self.start_time, self.time_manager.get_current_time())
+            self.scan_range_label.configure(text="Scan completed.")
+            self.log_manager.log_message(self.general_logs, "Scan completed")
+            self.log_manager.log_message(self.general_logs, f"Scan duration: {duration:.2f} seconds")
+            self.sound_manager.play_scan_completed_sound()
+        elif not self.paused:
+            self.log_manager.log_message(self.general_logs, "Scan cancelled")
+        self.scanning = False  # Set scanning flag to False
+        self.stats_label.configure(text=self.telemetry.summary_line())
         self.stop_button.pack_forget()
         self.stop_button.configure(state="disabled")
         self.scan_button.configure(state="normal")
+        self.scan_range_label.grid_remove()  # Remove the scan range label
+        if self.paused and self.checkpoint:
+            self.log_manager.log_message(self.general_logs, "Scan paused")
+            self.pause_button.configure(text=AppConfig.RESUME_BUTTON_TEXT, state="normal")
+        else:
+            self.pause_button.pack_forget()
+
+    def toggle_pause(self) -> None:
+        """Pause the running scan, or resume the paused one."""
+        if self.paused:
+            self.resume_scan(self.checkpoint.path)
+            return
+        if not self.scanning:
+            return
+        # The scan thread saves a checkpoint once the engine has returned.
+        self.paused = True
+        self.scanning = False
+        if self.scan_engine:
+            self.scan_engine.cancel()
+        self.pause_button.configure(state="disabled")
+
+    def resume_scan(self, path: str) -> None:
+        """Continue a stopped, paused or interrupted scan from its checkpoint."""
+        try:
+            checkpoint = Checkpoint.load(path)
+            ports = parse_port_spec(checkpoint.meta['ports']).tcp
+        except (OSError, ValueError, KeyError) as e:
+            messagebox.showerror("Error", f"Cannot resume the scan: {e}")
+            return
+        ip = checkpoint.meta['ip']
+        self.ip_entry.set(ip)
+        self.scan_order.set(checkpoint.meta['order'])
+        self.begin_scan(ip, TargetList(ip.split(',')), ports, checkpoint)
+
+    def stop_scan(self) -> None:
+        """Stop the ongoing port scanning process; it can be resumed from its checkpoint."""
+        self.scanning = False
+        self.paused = False
+        self.cancelled = True
+        if self.scan_engine:
+            # Aborts the probes in flight; finish_scan restores the UI once the engine has returned.
+            self.scan_engine.cancel()
+        self.stop_button.configure(state="disabled")
+        self.pause_button.configure(state="disabled")
         self.progress_frame.grid_remove()
         self.scan_range_label.grid_remove()
 
+    def result_file_stem(self, target: str = None) -> str:
+        """Return the file name stem for results of a target, by default the current one."""
+        return (
+            f"{result_file_prefix(target or self.ip_entry.get())}"
+            f"{self.time_manager.get_formatted_time().replace(' ', '_').replace(':', '-')}"
+        )
+
     def save_results(self, file_type: str = "txt") -> None:
         """Save the scan results to a file in the results directory."""
-        if not hasattr(self, 'open_ports') or not self.open_ports:
+        if self.scan_meta is None:
             messagebox.showwarning("No Results", "No scan results to save.")
             return
 
-        # Get the current open ports at the time of saving
-        current_open_ports = self.open_ports.copy()
+        # Reports are generated from the result stream when there is one.
+        if self.sink:
+            self.sink.flush()
+            meta = dict(self.scan_meta, **summarize_stream(self.sink.path))
+            open_ports = iter_open_ports(self.sink.path)
+        else:
+            status = EVENT_CANCELLED if self.cancelled else EVENT_STOPPED if self.paused else EVENT_COMPLETED
+            meta = dict(self.scan_meta, status=STATUS_IN_PROGRESS if self.scanning else EVENT_STATUS[status])
+            meta['open_count'] = len(self.open_ports)
+            open_ports = self.open_ports.copy()
+        if not meta['open_count']:
+            messagebox.showwarning("No Results", "No scan results to save.")
+            return
 
-        # Get the logs from the general logs textbox
-        logs = self.general_logs.get(1.0, 'end').strip()
+        # The stream keeps every log record; the in-memory buffer only the newest ones.
+        logs = "\n".join(iter_logs(self.sink.path)) if self.sink else self.log_manager.text()
 
         # If scanning is in progress, show a warning and adjust the port range
         if self.scanning:
             response = messagebox.askyesno("Warning", "Scanning in progress. Save partial results?")
             if not response:
                 return
-            current_end_port = self.start_port_slider.get() - 1
+            meta['scanned'] = self.scanned_before + (self.scan_engine.scanned if self.scan_engine else 0)
+        meta.setdefault('scanned', self.scanned_before)
+
+        file_path = os.path.join(self.results_dir, f"{self.result_file_stem()}.{file_type}")
+
+        if file_type == 'json':
+            write_json_report(file_path, meta, open_ports, logs, telemetry=self.telemetry.snapshot())
+            # The binary state file also keeps closed and filtered ports.
+            self.port_states.save(os.path.splitext(file_path)[0] + ".pss")
+            self.telemetry.write_prometheus(os.path.splitext(file_path)[0] + ".prom", {'target': meta['ip']})
         else:
-            current_end_port = int(self.end_port_entry.get())
+            write_txt_report(file_path, meta, open_ports, logs, telemetry=self.telemetry.snapshot())
+        messagebox.showinfo("Success", f"Results saved successfully to {file_path}")
 
-        default_filename = (
-            f"scan_results_{self.ip_entry.get()}_"
-            f"{self.time_manager.get_formatted_time().replace(' ', '_').replace(':', '-')}"
+    def show_history(self) -> None:
+        """Open the scan history window, or raise it if it is already open."""
+        if self.history_window is not None and self.history_window.winfo_exists():
+            self.history_window.focus()
+            return
+        window = ctk.CTkToplevel(self.root)
+        window.title("Scan History")
+        window.geometry(f'{self.config.WINDOW_WIDTH}x{self.config.WINDOW_HEIGHT}')
+        self.history_window = window
+
+        form = ctk.CTkFrame(window)
+        form.pack(fill='x', padx=10, pady=10)
+        self.history_host_entry = ctk.CTkEntry(form, width=130, placeholder_text="Host")
+        self.history_port_entry = ctk.CTkEntry(form, width=70, placeholder_text="Port")
+        self.history_days_entry = ctk.CTkEntry(form, width=50)
+        self.history_days_entry.insert(0, str(self.config.HISTORY_DAYS))
+        self.history_host_entry.grid(row=0, column=0, padx=5, pady=5)
+        self.history_port_entry.grid(row=0, column=1, padx=5, pady=5)
+        ctk.CTkLabel(form, text="Days:").grid(row=0, column=2, padx=5, pady=5)
+        self.history_days_entry.grid(row=0, column=3, padx=5, pady=5)
+        ctk.CTkButton(form, text="Search", width=80, command=self.search_history).grid(row=1, column=0, padx=5, pady=5)
+        ctk.CTkButton(form, text="Import Results", width=120, command=self.import_history).grid(
+            row=1, column=1, columnspan=2, padx=5, pady=5
+        )
+        self.history_status_label = ctk.CTkLabel(
+            window,
+            text="Port: hosts it was open on. Host: its open ports. Both: the port's timeline.",
+            text_color="gray"
         )
-        file_path = os.path.join(self.results_dir, f"{default_filename}.{file_type}")
+        self.history_status_label.pack(padx=10)
+        self.history_results = ctk.CTkTextbox(window, wrap='none')
+        self.history_results.pack(fill='both', expand=True, padx=10, pady=10)
 
-        if not file_path:
+    def search_history(self) -> None:
+        """Query the history for the host and port in the history window off the Tk thread."""
+        host = self.history_host_entry.get().strip()
+        port = self.history_port_entry.get().strip()
+        days = self.history_days_entry.get().strip()
+        try:
+            port = int(port) if port else None
+            days = float(days) if days else None
+        except ValueError:
+            messagebox.showerror("Error", "Port and days must be numbers.", parent=self.history_window)
             return
+        self.history_status_label.configure(text="Searching...")
+        self.thread_manager.start_thread(self.run_history_query, (host, port, days))
 
-        results = {
-            'ip': self.ip_entry.get(),
-            'start_port': int(self.start_port_entry.get()),
-            'end_port': current_end_port,
-            'open_ports': current_open_ports,
-            'logs': logs,
-            'timestamp': self.time_manager.get_formatted_time()
-        }
-
-        if file_path.endswith('.json'):
-            self.file_manager.save_to_file(file_path, json.dumps(results, indent=4))
-            messagebox.showinfo("Success", f"Results saved successfully to {file_path}")
-        else:
-            results_str = (
-                f"=== Scan Results ===\n"
-                f"Target IP: {self.ip_entry.get()}\n"
-                f"Scan Range: {self.start_port_entry.get()} - {current_end_port}\n"
-                f"Timestamp: {self.time_manager.get_formatted_time()}\n"
-                f"Status: {'In Progress' if self.scanning else 'Completed'}\n\n"
-                "=== Open Ports ===\n"
-            )
-            for port in current_open_ports:
-                results_str += f"{port['port']} ({port['service']})\n"
-            results_str += (
-                "\n=== Logs ===\n"
-                f"{logs}\n\n"
-                "=== Summary ===\n"
-                f"Total Ports Scanned: {current_end_port - int(self.start_port_entry.get()) + 1}\n"
-                f"Open Ports Found: {len(current_open_ports)}\n"
-            )
-            self.file_manager.save_to_file(file_path, results_str)
-            messagebox.showinfo("Success", f"Results saved successfully to {file_path}")
+    def run_history_query(self, host: str, port, days) -> None:
+        """Run a history query on a worker thread and post the rows to the history window."""
+        import sqlite3
+        from history import ScanHistory, history_path, since_days
+        start_time = self.time_manager.get_current_time()
+        since = since_days(days) if days else None
+        try:
+            with ScanHistory(history_path(self.results_dir)) as history:
+                if host and port:
+                    rows = history.timeline(host, port)
+                    title = f"{host}:{port} first seen open {history.first_seen(host, port) or 'never'}"
+                elif port:
+                    rows = history.hosts_with_port(port, since=since)
+                    title = f"Hosts with port {port} open"
+                elif host:
+                    rows = history.ports_of_host(host, since=since)
+                    title = f"Open ports of {host}"
+                else:
+                    rows = history.scans()
+                    title = "Recent scans"
+        except (sqlite3.Error, ValueError) as e:
+            self.ui.post(self.show_history_rows, f"Cannot read the history: {e}", [], 0)
+            return
+        self.ui.post(self.show_history_rows, title, rows, self.time_manager.get_elapsed_time(start_time))
+
+    def show_history_rows(self, title: str, rows: list, elapsed: float) -> None:
+        """Fill the history window with query results."""
+        if self.history_window is None or not self.history_window.winfo_exists():
+            return
+        self.history_status_label.configure(text=f"{title}: {len(rows)} rows in {elapsed * 1000:.1f} ms")
+        self.history_results.delete(1.0, 'end')
+        if rows:
+            lines = ["\t".join(rows[0])]
+            lines.extend("\t".join("" if value is None else str(value) for value in row.values()) for row in rows)
+            self.history_results.insert('end', "\n".join(lines))
+
+    def import_history(self) -> None:
+        """Import the result files in the results directory into the history off the Tk thread."""
+        self.history_status_label.configure(text="Importing...")
+        self.thread_manager.start_thread(self.run_history_import)
+
+    def run_history_import(self) -> None:
+        """Import result files on a worker thread, logging files that cannot be read."""
+        import sqlite3
+        from history import ScanHistory, history_path, result_files
+        files = findings = 0
+        try:
+            with ScanHistory(history_path(self.results_dir)) as history:
+                for path, count, error in history.import_files(result_files(self.results_dir)):
+                    if error is not None:
+                        self.post_log(f"Skipped {os.path.basename(path)}: {error}", LOG_WARNING)
+                    elif count is not None:
+                        files += 1
+                        findings += count
+        except (sqlite3.Error, ValueError) as e:
+            self.ui.post(self.show_history_rows, f"Cannot import: {e}", [], 0)
+            return
+        self.post_log(f"Imported {findings} findings from {files} result files into the scan history")
+        self.ui.post(self.show_history_rows, f"Imported {findings} findings from {files} files", [], 0)
 
 if __name__ == "__main__":
     try:
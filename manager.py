@@ -1,30 +1,90 @@
 import os
 import time
+import queue
 import threading
 from datetime import datetime
-import pygame
+from itertools import islice
+from collections import deque
 
 from config import AppConfig
 
 class SoundManager:
-    """Manages sound effects for the application."""
+    """Manages sound effects for the application.
 
-    def __init__(self, resources_path: str):
+    The mixer is only initialised the first time a sound is played while sound
+    is enabled. Both sounds are then decoded once into in-memory buffers and
+    played on a reserved channel, and port alerts are coalesced so that a
+    burst of findings plays at most one alert per `alert_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        resources_path: str,
+        enabled: bool = AppConfig.SOUND_ENABLED,
+        alert_interval: float = AppConfig.SOUND_ALERT_INTERVAL
+    ) -> None:
         """Initialize the SoundManager."""
         self.PORT_DETECTED_SOUND_PATH = os.path.join(resources_path, 'port_detected.mp3')
         self.SCAN_COMPLETED_SOUND_PATH = os.path.join(resources_path, 'scan_completed.mp3')
-        pygame.mixer.init()
+        self.enabled = enabled
+        self.alert_interval = alert_interval
+        self.last_alert = float('-inf')
+        self.sounds = None
+        self.channel = None
+        self.lock = threading.Lock()
+
+    def _load(self) -> bool:
+        """Initialise the mixer and decode the sounds, once."""
+        if self.sounds is not None:
+            return True
+        try:
+            # Imported here so headless scans never load pygame.
+            import pygame
+            pygame.mixer.init()
+            pygame.mixer.set_reserved(1)
+            self.channel = pygame.mixer.Channel(0)
+            self.sounds = {
+                'port_detected': pygame.mixer.Sound(self.PORT_DETECTED_SOUND_PATH),
+                'scan_completed': pygame.mixer.Sound(self.SCAN_COMPLETED_SOUND_PATH)
+            }
+            return True
+        except Exception as e:
+            print(f"Sound disabled: {e}")
+            self.enabled = False
+            return False
+
+    def preload(self) -> None:
+        """Initialise the mixer and decode the sounds ahead of the first alert."""
+        with self.lock:
+            if self.enabled:
+                self._load()
+
+    def _play(self, name: str) -> None:
+        """Play a preloaded sound on the reserved channel, replacing the previous one."""
+        with self.lock:
+            if self.enabled and self._load():
+                self.channel.play(self.sounds[name])
+
+    def set_enabled(self, enabled: bool) -> None:
+        """Enable or disable sound effects."""
+        self.enabled = enabled
 
-    def play_port_detected_sound(self):
-        """Plays port detected sound."""
-        pygame.mixer.music.stop()  # Önceki sesi durdur
-        pygame.mixer.music.load(self.PORT_DETECTED_SOUND_PATH)
-        pygame.mixer.music.play()
+    def toggle(self) -> bool:
+        """Toggle sound effects and return the new state."""
+        self.set_enabled(not self.enabled)
+        return self.enabled
 
-    def play_scan_completed_sound(self):
+    def play_port_detected_sound(self) -> None:
+        """Plays port detected sound, at most once per alert interval."""
+        now = TimeManager.get_current_time()
+        if now - self.last_alert < self.alert_interval:
+            return
+        self.last_alert = now
+        self._play('port_detected')
+
+    def play_scan_completed_sound(self) -> None:
         """Plays scan completed sound."""
-        pygame.mixer.music.load(self.SCAN_COMPLETED_SOUND_PATH)
-        pygame.mixer.music.play()
+        self._play('scan_completed')
 
 class TimeManager:
     """Class to manage timestamps and duration calculations."""
@@ -54,15 +114,139 @@ class TimeManager:
         """Calculate the estimated time remaining."""
         return (elapsed / progress) * (total - progress)
 
+LOG_DEBUG = 'DEBUG'
+LOG_INFO = 'INFO'
+LOG_WARNING = 'WARNING'
+LOG_ERROR = 'ERROR'
+LOG_LEVELS = {LOG_DEBUG: 10, LOG_INFO: 20, LOG_WARNING: 30, LOG_ERROR: 40}
+
+class LogRecord:
+    """One structured log entry."""
+
+    __slots__ = ('seq', 'timestamp', 'level', 'message')
+
+    def __init__(self, seq: int, timestamp: str, level: str, message: str) -> None:
+        """Initialize the record."""
+        self.seq = seq
+        self.timestamp = timestamp
+        self.level = level
+        self.message = message
+
+    def format(self) -> str:
+        """Return the record as a display line; levels above INFO are tagged."""
+        tag = f"[{self.level}] " if LOG_LEVELS[self.level] > LOG_LEVELS[LOG_INFO] else ""
+        return f"{self.timestamp} - {tag}{self.message}"
+
 class LogManager:
-    """Class to manage logging functionality."""
+    """Bounded, thread-safe log of structured records with a tail-only widget view.
+
+    Records live in a ring buffer of `capacity` entries and can be added from
+    any thread. `render` runs on the Tk thread and shows at most
+    `visible_lines` of the newest records at or above the display level,
+    appending only what is new since the last render. `on_record`, if set,
+    receives every record, e.g. to keep the full log in the result stream.
+    """
+
+    def __init__(
+        self,
+        capacity: int = AppConfig.LOG_CAPACITY,
+        visible_lines: int = AppConfig.LOG_VISIBLE_LINES,
+        level: str = AppConfig.LOG_LEVEL
+    ) -> None:
+        """Initialize an empty log."""
+        self.records = deque(maxlen=capacity)
+        self.visible_lines = visible_lines
+        self.level = level
+        self.on_record = None
+        self.seq = 0
+        self.dropped = 0
+        self.rendered_seq = 0
+        self.rendered_lines = 0
+        self.redraw = False
+        self.lock = threading.Lock()
 
     @staticmethod
-    def log_message(log_widget, message: str) -> None:
-        """Log a message to the specified widget."""
-        log_widget.insert('end', f"{TimeManager.get_formatted_time()} - {message}\n")
+    def format_message(message: str) -> str:
+        """Prefix a message with the current timestamp."""
+        return f"{TimeManager.get_formatted_time()} - {message}"
+
+    def add(self, message: str, level: str = LOG_INFO) -> LogRecord:
+        """Append a record; safe to call from any thread."""
+        with self.lock:
+            self.seq += 1
+            if len(self.records) == self.records.maxlen:
+                self.dropped += 1
+            record = LogRecord(self.seq, TimeManager.get_formatted_time(), level, message)
+            self.records.append(record)
+        if self.on_record:
+            self.on_record(record)
+        return record
+
+    def clear(self) -> None:
+        """Forget every record, e.g. when a new scan starts."""
+        with self.lock:
+            self.records.clear()
+            self.dropped = 0
+            self.redraw = True
+
+    def filter(self, level: str = LOG_DEBUG, text: str = None) -> list:
+        """Return the buffered records at or above a level, optionally containing text."""
+        minimum = LOG_LEVELS[level]
+        with self.lock:
+            records = list(self.records)
+        return [
+            record for record in records
+            if LOG_LEVELS[record.level] >= minimum and (not text or text in record.message)
+        ]
+
+    def set_level(self, level: str, log_widget=None) -> None:
+        """Change the display level and redraw the widget if one is given."""
+        with self.lock:
+            self.level = level
+            self.redraw = True
+        if log_widget is not None:
+            self.render(log_widget)
+
+    def render(self, log_widget) -> None:
+        """Bring the widget up to date, touching only the visible tail."""
+        with self.lock:
+            redraw = self.redraw
+            self.redraw = False
+            if redraw:
+                new = list(self.records)
+            else:
+                # Sequence numbers are contiguous, so the new records are the last few.
+                count = min(self.seq - self.rendered_seq, len(self.records))
+                new = list(islice(reversed(self.records), count))[::-1]
+            self.rendered_seq = self.seq
+            minimum = LOG_LEVELS[self.level]
+        lines = [record.format() for record in new if LOG_LEVELS[record.level] >= minimum]
+        lines = lines[-self.visible_lines:]
+        if redraw:
+            log_widget.delete(1.0, 'end')
+            self.rendered_lines = 0
+        if not lines:
+            return
+        log_widget.insert('end', "\n".join(lines) + "\n")
+        self.rendered_lines += len(lines)
+        excess = self.rendered_lines - self.visible_lines
+        if excess > 0:
+            log_widget.delete(1.0, f"{excess + 1}.0")
+            self.rendered_lines -= excess
         log_widget.see('end')
 
+    def text(self, level: str = LOG_DEBUG) -> str:
+        """Return the buffered log as text, noting records that fell out of the buffer."""
+        lines = [record.format() for record in self.filter(level)]
+        if self.dropped:
+            lines.insert(0, f"... {self.dropped} earlier log records were dropped from the buffer")
+        return "\n".join(lines)
+
+    def log_message(self, log_widget, message: str, level: str = LOG_INFO) -> None:
+        """Log a message and update the specified widget."""
+        self.add(message, level)
+        self.render(log_widget)
+
 class FileManager:
     """Class to manage file operations."""
 
@@ -73,21 +257,140 @@ class FileManager:
             file.write(data)
 
 class ThreadManager:
-    """Manage threads for the port scanner application."""
+    """Bounded pool of long-lived worker threads fed from a job queue."""
 
-    def __init__(self) -> None:
+    def __init__(self, max_workers: int = AppConfig.DEFAULT_THREADS, queue_size: int = 0) -> None:
         """Initialize the ThreadManager."""
-        self.threads = []
+        self.max_workers = max(1, max_workers)
+        # A bounded queue makes start_thread block once the workers fall behind.
+        self.jobs = queue.Queue(maxsize=queue_size or self.max_workers * 2)
+        self.workers = []
+        self.idle = 0
+        self.lock = threading.Lock()
 
-    def start_thread(self, target, args=()) -> None:
-        """Start a new thread with the given target function and arguments."""
-        thread = threading.Thread(target=target, args=args)
+    def _worker(self) -> None:
+        """Run queued jobs until a None sentinel is received."""
+        while True:
+            with self.lock:
+                self.idle += 1
+            job = self.jobs.get()
+            with self.lock:
+                self.idle -= 1
+            try:
+                if job is None:
+                    return
+                target, args = job
+                target(*args)
+            except Exception as e:
+                print(f"Error occurred in worker thread: {e}")
+            finally:
+                self.jobs.task_done()
+
+    def _spawn_worker(self) -> None:
+        """Start another worker if every existing one is busy and the pool is not full."""
+        with self.lock:
+            if self.idle > self.jobs.qsize() or len(self.workers) >= self.max_workers:
+                return
+            thread = threading.Thread(target=self._worker, daemon=True)
+            self.workers.append(thread)
         thread.start()
-        self.threads.append(thread)
+
+    def start_thread(self, target, args=()) -> None:
+        """Queue a job for the pool, blocking while the queue is full."""
+        self._spawn_worker()
+        self.jobs.put((target, args))
+
+    def wait(self) -> None:
+        """Block until every queued job has finished."""
+        self.jobs.join()
 
     def stop_all_threads(self) -> None:
-        """Stop all running threads except the current one."""
+        """Wait for queued jobs, then shut the workers down."""
         current_thread = threading.current_thread()
-        for thread in self.threads:
-            if thread != current_thread:
-                thread.join()
\ No newline at end of file
+        if current_thread in self.workers:
+            raise RuntimeError("stop_all_threads cannot be called from a pool worker")
+        with self.lock:
+            workers, self.workers = self.workers, []
+        for _ in workers:
+            self.jobs.put(None)
+        for thread in workers:
+            thread.join()
+
+class UIUpdateManager:
+    """Channel from worker threads to the Tk thread, drained in batches on a timer.
+
+    Worker threads never touch widgets. They post callbacks instead, and the Tk
+    thread runs them every `interval_ms` milliseconds via `root.after`:
+
+    - `post` runs a callback once, in order.
+    - `post_latest` keeps only the most recent call per key, for progress
+      labels and other state where intermediate values are worthless.
+    - `post_batch` collects items per key and hands them to the callback as
+      one list, so a burst of results costs one widget update per tick.
+
+    Coalesced entries keep the queue position of their first post, so a
+    completion message posted after a batch is still handled after it.
+    """
+
+    def __init__(self, root, interval_ms: int = AppConfig.UI_UPDATE_INTERVAL_MS) -> None:
+        """Initialize the UIUpdateManager for the given root window."""
+        self.root = root
+        self.interval_ms = interval_ms
+        self.events = queue.SimpleQueue()
+        self.latest = {}
+        self.batches = {}
+        self.lock = threading.Lock()
+        self.running = False
+
+    def post(self, callback, *args) -> None:
+        """Run a callback on the Tk thread at the next tick."""
+        self.events.put((callback, args))
+
+    def post_latest(self, key: str, callback, *args) -> None:
+        """Run only the most recent callback posted under key at the next tick."""
+        with self.lock:
+            if key not in self.latest:
+                self.events.put((self._run_latest, (key,)))
+            self.latest[key] = (callback, args)
+
+    def post_batch(self, key: str, item, callback) -> None:
+        """Queue an item; callback receives every item posted under key this tick."""
+        with self.lock:
+            batch = self.batches.get(key)
+            if batch is None:
+                batch = self.batches[key] = (callback, [])
+                self.events.put((self._run_batch, (key,)))
+            batch[1].append(item)
+
+    def _run_latest(self, key: str) -> None:
+        """Run the coalesced callback for key."""
+        with self.lock:
+            callback, args = self.latest.pop(key)
+        callback(*args)
+
+    def _run_batch(self, key: str) -> None:
+        """Hand the collected items for key to their callback."""
+        with self.lock:
+            callback, items = self.batches.pop(key)
+        callback(items)
+
+    def start(self) -> None:
+        """Start draining the queue on the Tk thread."""
+        if not self.running:
+            self.running = True
+            self.root.after(self.interval_ms, self._drain)
+
+    def stop(self) -> None:
+        """Stop draining after the current tick."""
+        self.running = False
+
+    def _drain(self) -> None:
+        """Run every callback queued so far, then schedule the next tick."""
+        for _ in range(self.events.qsize()):
+            callback, args = self.events.get_nowait()
+            try:
+                callback(*args)
+            except Exception as e:
+                print(f"Error occurred while updating the UI: {e}")
+        if self.running:
+            self.root.after(self.interval_ms, self._drain)
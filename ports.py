@@ -0,0 +1,186 @@
+from bisect import bisect_right
+
+from config import AppConfig
+from services import TOP_PORTS
+
+MIN_PORT = 1
+MAX_PORT = 65535
+
+PROTOCOL_PREFIXES = {'T': 'tcp', 'U': 'udp'}
+
+class PortSet:
+    """Sorted set of ports stored as merged, non-overlapping intervals.
+
+    Membership and indexing are binary searches over the interval bounds and
+    iteration walks the intervals, so `1-65535` costs two integers.
+    """
+
+    def __init__(self, intervals=()) -> None:
+        """Initialize the set from (start, end) pairs, merging overlaps and neighbours."""
+        self.starts = []
+        self.ends = []
+        for start, end in sorted(intervals):
+            if self.ends and start <= self.ends[-1] + 1:
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+        # offsets[i] is the number of ports before interval i.
+        self.offsets = []
+        total = 0
+        for start, end in zip(self.starts, self.ends):
+            self.offsets.append(total)
+            total += end - start + 1
+        self.size = total
+
+    @classmethod
+    def from_ports(cls, ports) -> 'PortSet':
+        """Build a set from individual ports."""
+        return cls((port, port) for port in ports)
+
+    def __contains__(self, port) -> bool:
+        index = bisect_right(self.starts, port) - 1
+        return index >= 0 and port <= self.ends[index]
+
+    def __iter__(self):
+        for start, end in zip(self.starts, self.ends):
+            yield from range(start, end + 1)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, index: int) -> int:
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError("Port index out of range")
+        interval = bisect_right(self.offsets, index) - 1
+        return self.starts[interval] + index - self.offsets[interval]
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, PortSet) and (self.starts, self.ends) == (other.starts, other.ends)
+
+    def __repr__(self) -> str:
+        return f"PortSet({str(self)!r})"
+
+    def __str__(self) -> str:
+        return ','.join(
+            str(start) if start == end else f"{start}-{end}"
+            for start, end in zip(self.starts, self.ends)
+        )
+
+    def intervals(self) -> list:
+        """Return the merged (start, end) intervals."""
+        return list(zip(self.starts, self.ends))
+
+    def index(self, port: int) -> int:
+        """Return the position of a port in the set."""
+        interval = bisect_right(self.starts, port) - 1
+        if interval < 0 or port > self.ends[interval]:
+            raise ValueError(f"Port not in set: {port}")
+        return self.offsets[interval] + port - self.starts[interval]
+
+class PortSlice:
+    """Every `step`-th port of a PortSet, or another slice, starting at position `offset`, without copying it."""
+
+    def __init__(self, ports, offset: int, step: int) -> None:
+        """Initialize the slice of the given set."""
+        self.ports = ports
+        self.offset = offset
+        self.step = max(1, step)
+        self.size = max(0, (len(ports) - offset + self.step - 1) // self.step)
+
+    def __contains__(self, port) -> bool:
+        return port in self.ports and self.ports.index(port) % self.step == self.offset
+
+    def __iter__(self):
+        for index in range(self.size):
+            yield self.ports[self.offset + index * self.step]
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, index: int) -> int:
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError("Port index out of range")
+        return self.ports[self.offset + index * self.step]
+
+    def __repr__(self) -> str:
+        return f"PortSlice({self.ports!r}, {self.offset}, {self.step})"
+
+    def index(self, port: int) -> int:
+        """Return the position of a port in the slice."""
+        position, remainder = divmod(self.ports.index(port) - self.offset, self.step)
+        if remainder or position < 0:
+            raise ValueError(f"Port not in slice: {port}")
+        return position
+
+class PortSpec:
+    """Parsed port specification with separate TCP and UDP port sets."""
+
+    def __init__(self, tcp: PortSet, udp: PortSet) -> None:
+        """Initialize the specification."""
+        self.tcp = tcp
+        self.udp = udp
+
+def parse_port(value: str) -> int:
+    """Parse a single port number."""
+    port = int(value)
+    if not MIN_PORT <= port <= MAX_PORT:
+        raise ValueError(f"Port out of range: {value}")
+    return port
+
+def parse_port_spec(spec: str, presets: dict = None) -> PortSpec:
+    """Parse a port specification such as '22,80,443,1000-2000,U:53,top:100'.
+
+    Items are single ports, ranges (open ends default to 1 and 65535),
+    'top:N' for the N most common ports or preset names from
+    AppConfig.PORT_PRESETS. A 'T:' or 'U:' prefix selects the protocol for
+    that item and the ones after it; the default is TCP.
+    """
+    presets = AppConfig.PORT_PRESETS if presets is None else presets
+    intervals = {'tcp': [], 'udp': []}
+    protocol = 'tcp'
+    expanding = set()
+
+    def add(items: str) -> None:
+        nonlocal protocol
+        for item in items.split(','):
+            item = item.strip()
+            prefix, colon, rest = item.partition(':')
+            if colon and prefix.upper() in PROTOCOL_PREFIXES:
+                protocol = PROTOCOL_PREFIXES[prefix.upper()]
+                item = rest.strip()
+            if not item:
+                continue
+            name = item.lower()
+            if name in presets:
+                if name in expanding:
+                    raise ValueError(f"Recursive port preset: {item}")
+                expanding.add(name)
+                outer = protocol
+                add(presets[name])
+                protocol = outer
+                expanding.discard(name)
+            elif name.startswith('top:'):
+                count = int(name[4:])
+                if not 1 <= count <= len(TOP_PORTS):
+                    raise ValueError(f"Top port count out of range (1-{len(TOP_PORTS)}): {item}")
+                intervals[protocol].extend((port, port) for port in TOP_PORTS[:count])
+            elif '-' in item:
+                start, end = item.split('-', 1)
+                first = parse_port(start) if start.strip() else MIN_PORT
+                last = parse_port(end) if end.strip() else MAX_PORT
+                if last < first:
+                    raise ValueError(f"Invalid port range: {item}")
+                intervals[protocol].append((first, last))
+            else:
+                port = parse_port(item)
+                intervals[protocol].append((port, port))
+
+    add(spec)
+    if not intervals['tcp'] and not intervals['udp']:
+        raise ValueError(f"Empty port specification: {spec}")
+    return PortSpec(PortSet(intervals['tcp']), PortSet(intervals['udp']))
@@ -0,0 +1,240 @@
+import json
+import zlib
+import struct
+
+STATE_UNKNOWN = 'unknown'
+STATE_OPEN = 'open'
+STATE_CLOSED = 'closed'
+STATE_FILTERED = 'filtered'
+
+# Each state is a 2-bit code split across two bit planes: (low, high).
+STATE_BITS = {
+    STATE_UNKNOWN: (0, 0),
+    STATE_OPEN: (1, 0),
+    STATE_CLOSED: (0, 1),
+    STATE_FILTERED: (1, 1)
+}
+STATE_NAMES = {bits: name for name, bits in STATE_BITS.items()}
+
+PLANE_SIZE = 65536 // 8
+FILE_MAGIC = b'PSS1'
+
+def iter_bits(mask: int):
+    """Yield the positions of the set bits of an integer bitmap in ascending order."""
+    data = mask.to_bytes((mask.bit_length() + 7) // 8, 'little')
+    for index, byte in enumerate(data):
+        while byte:
+            low = byte & -byte
+            yield index * 8 + low.bit_length() - 1
+            byte ^= low
+
+class HostPorts:
+    """Port states of one host stored as two bit planes over ports 0-65535.
+
+    A port costs two bits instead of a dict. Planes grow in whole bytes up to
+    the highest port seen, so they never exceed 8 KiB each. Timestamps and
+    service names are only kept for open ports, in sparse side tables.
+    """
+
+    __slots__ = ('low', 'high', 'timestamps', 'services')
+
+    def __init__(self) -> None:
+        """Initialize an empty host with every port unknown."""
+        self.low = bytearray()
+        self.high = bytearray()
+        self.timestamps = {}
+        self.services = {}
+
+    def set(self, port: int, state: str) -> None:
+        """Set the state of a port."""
+        index, bit = port >> 3, 1 << (port & 7)
+        if index >= len(self.low):
+            grow = index + 1 - len(self.low)
+            self.low.extend(bytes(grow))
+            self.high.extend(bytes(grow))
+        low, high = STATE_BITS[state]
+        if low:
+            self.low[index] |= bit
+        else:
+            self.low[index] &= ~bit
+        if high:
+            self.high[index] |= bit
+        else:
+            self.high[index] &= ~bit
+        if state != STATE_OPEN:
+            self.timestamps.pop(port, None)
+            self.services.pop(port, None)
+
+    def get(self, port: int) -> str:
+        """Return the state of a port."""
+        index, bit = port >> 3, 1 << (port & 7)
+        if index >= len(self.low):
+            return STATE_UNKNOWN
+        return STATE_NAMES[(bool(self.low[index] & bit), bool(self.high[index] & bit))]
+
+    def mask(self, state: str = STATE_OPEN) -> int:
+        """Return the ports in a state as an integer bitmap."""
+        low = int.from_bytes(self.low, 'little')
+        high = int.from_bytes(self.high, 'little')
+        if state == STATE_OPEN:
+            return low & ~high
+        if state == STATE_CLOSED:
+            return high & ~low
+        if state == STATE_FILTERED:
+            return low & high
+        full = (1 << (PLANE_SIZE * 8)) - 1
+        return full & ~(low | high)
+
+    def ports(self, state: str = STATE_OPEN):
+        """Yield the ports in a state in ascending order."""
+        return iter_bits(self.mask(state))
+
+class PortStateStore:
+    """Compact open/closed/filtered result store for many hosts.
+
+    Set operations work on integer bitmaps, so comparing two sweeps of a
+    subnet costs a few big-integer operations per host.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty store."""
+        self.hosts = {}
+
+    def get_host(self, host: str) -> HostPorts:
+        """Return the port states of a host, creating them on first use."""
+        ports = self.hosts.get(host)
+        if ports is None:
+            ports = self.hosts[host] = HostPorts()
+        return ports
+
+    def add(self, record: dict) -> None:
+        """Store a scan result record; records in other states are ignored."""
+        state = record['state']
+        if state not in STATE_BITS:
+            return
+        ports = self.get_host(record['host'])
+        ports.set(record['port'], state)
+        if state == STATE_OPEN:
+            if record.get('timestamp'):
+                ports.timestamps[record['port']] = record['timestamp']
+            if record.get('service'):
+                ports.services[record['port']] = record['service']
+
+    def state(self, host: str, port: int) -> str:
+        """Return the state of a host's port."""
+        ports = self.hosts.get(host)
+        return ports.get(port) if ports else STATE_UNKNOWN
+
+    def mask(self, host: str, state: str = STATE_OPEN) -> int:
+        """Return a host's ports in a state as an integer bitmap."""
+        ports = self.hosts.get(host)
+        return ports.mask(state) if ports else 0
+
+    def ports(self, host: str, state: str = STATE_OPEN) -> list:
+        """Return a host's ports in a state."""
+        return list(iter_bits(self.mask(host, state)))
+
+    def count(self, state: str = STATE_OPEN) -> int:
+        """Return the number of host/port pairs in a state."""
+        return sum(bin(ports.mask(state)).count('1') for ports in self.hosts.values())
+
+    def hosts_with(self, port: int, state: str = STATE_OPEN) -> list:
+        """Return the hosts where a port is in the given state."""
+        return [host for host, ports in self.hosts.items() if ports.get(port) == state]
+
+    def union(self, other: 'PortStateStore', state: str = STATE_OPEN) -> dict:
+        """Return {host: bitmap} of ports in the state in either store."""
+        return {
+            host: self.mask(host, state) | other.mask(host, state)
+            for host in self.hosts.keys() | other.hosts.keys()
+        }
+
+    def intersection(self, other: 'PortStateStore', state: str = STATE_OPEN) -> dict:
+        """Return {host: bitmap} of ports in the state in both stores."""
+        result = {}
+        for host in self.hosts.keys() & other.hosts.keys():
+            mask = self.mask(host, state) & other.mask(host, state)
+            if mask:
+                result[host] = mask
+        return result
+
+    def diff(self, other: 'PortStateStore', state: str = STATE_OPEN) -> dict:
+        """Return {host: bitmap} of ports in the state here but not in the other store."""
+        result = {}
+        for host in self.hosts:
+            mask = self.mask(host, state) & ~other.mask(host, state)
+            if mask:
+                result[host] = mask
+        return result
+
+    def update(self, other: 'PortStateStore') -> None:
+        """Overwrite this store with every known port state of another store."""
+        for host, theirs in list(other.hosts.items()):
+            ours = self.get_host(host)
+            size = max(len(ours.low), len(theirs.low))
+            known = int.from_bytes(theirs.low, 'little') | int.from_bytes(theirs.high, 'little')
+            low = int.from_bytes(ours.low, 'little') & ~known | int.from_bytes(theirs.low, 'little')
+            high = int.from_bytes(ours.high, 'little') & ~known | int.from_bytes(theirs.high, 'little')
+            ours.low = bytearray(low.to_bytes(size, 'little'))
+            ours.high = bytearray(high.to_bytes(size, 'little'))
+            for table in (ours.timestamps, ours.services):
+                for port in [port for port in table if known >> port & 1]:
+                    del table[port]
+            ours.timestamps.update(theirs.timestamps)
+            ours.services.update(theirs.services)
+
+    def to_bytes(self) -> bytes:
+        """Serialize the store into a compact zlib-compressed binary blob.
+
+        Layout: magic, host count and side-table length, then compressed
+        [host name length, host name, low plane, high plane] records and the
+        JSON side tables for timestamps and services of open ports.
+        """
+        hosts = list(self.hosts.items())
+        body = bytearray()
+        side = {}
+        for host, ports in hosts:
+            name = host.encode('utf-8')
+            body += struct.pack('<HH', len(name), len(ports.low)) + name + ports.low + ports.high
+            if ports.timestamps or ports.services:
+                side[host] = {'t': ports.timestamps, 's': ports.services}
+        side_data = json.dumps(side, separators=(',', ':')).encode('utf-8')
+        header = FILE_MAGIC + struct.pack('<II', len(hosts), len(side_data))
+        return header + zlib.compress(bytes(body) + side_data)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'PortStateStore':
+        """Deserialize a store written by to_bytes."""
+        if data[:4] != FILE_MAGIC:
+            raise ValueError("Not a port state file")
+        host_count, side_length = struct.unpack_from('<II', data, 4)
+        payload = zlib.decompress(data[12:])
+        store = cls()
+        offset = 0
+        for _ in range(host_count):
+            name_length, plane_length = struct.unpack_from('<HH', payload, offset)
+            offset += 4
+            host = payload[offset:offset + name_length].decode('utf-8')
+            offset += name_length
+            ports = store.get_host(host)
+            ports.low = bytearray(payload[offset:offset + plane_length])
+            offset += plane_length
+            ports.high = bytearray(payload[offset:offset + plane_length])
+            offset += plane_length
+        side = json.loads(payload[offset:offset + side_length].decode('utf-8'))
+        for host, tables in side.items():
+            ports = store.get_host(host)
+            ports.timestamps = {int(port): value for port, value in tables['t'].items()}
+            ports.services = {int(port): value for port, value in tables['s'].items()}
+        return store
+
+    def save(self, path: str) -> None:
+        """Write the binary serialization to a file."""
+        with open(path, 'wb') as file:
+            file.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: str) -> 'PortStateStore':
+        """Read a store from a file written by save."""
+        with open(path, 'rb') as file:
+            return cls.from_bytes(file.read())
@@ -0,0 +1,100 @@
+import socket
+import asyncio
+import threading
+
+from config import AppConfig
+from manager import TimeManager
+
+async def probe_connect(host: str, port: int, timeout: float) -> bool:
+    """Return True if the host answers on a port with either a handshake or a RST."""
+    loop = asyncio.get_running_loop()
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.setblocking(False)
+        try:
+            await asyncio.wait_for(loop.sock_connect(s, (host, port)), timeout)
+            return True
+        except ConnectionRefusedError:
+            return True
+        except (asyncio.TimeoutError, OSError):
+            return False
+
+async def probe_host(host: str, ports, timeout: float) -> bool:
+    """Probe several ports concurrently and return as soon as one of them answers."""
+    tasks = [asyncio.ensure_future(probe_connect(host, port, timeout)) for port in ports]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            if await finished:
+                return True
+        return False
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+class ReachabilityChecker:
+    """Background host reachability probing with a per-target verdict cache.
+
+    Probes run on the ThreadManager pool so callers on the Tk thread never
+    block. Concurrent checks for the same host share one probe, and verdicts
+    are reused for `ttl` seconds.
+    """
+
+    def __init__(
+        self,
+        thread_manager,
+        ports=AppConfig.REACHABILITY_PORTS,
+        timeout: float = AppConfig.DEFAULT_TIMEOUT,
+        ttl: float = AppConfig.REACHABILITY_TTL
+    ) -> None:
+        """Initialize the checker."""
+        self.thread_manager = thread_manager
+        self.ports = ports
+        self.timeout = timeout
+        self.ttl = ttl
+        self.cache = {}
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def cached(self, host: str):
+        """Return the cached verdict for a host, or None if unknown or expired."""
+        with self.lock:
+            entry = self.cache.get(host)
+        if entry is None:
+            return None
+        reachable, expires = entry
+        if TimeManager.get_current_time() >= expires:
+            return None
+        return reachable
+
+    def check(self, host: str, callback) -> None:
+        """Call callback(reachable) with a cached verdict now, or from a pool thread later."""
+        reachable = self.cached(host)
+        if reachable is not None:
+            callback(reachable)
+            return
+        with self.lock:
+            if host in self.pending:
+                self.pending[host].append(callback)
+                return
+            self.pending[host] = [callback]
+        self.thread_manager.start_thread(self._probe, args=(host,))
+
+    def _probe(self, host: str) -> None:
+        """Probe a host and deliver the verdict to every waiting callback."""
+        try:
+            reachable = asyncio.run(probe_host(host, self.ports, self.timeout))
+        except Exception:
+            reachable = False
+        with self.lock:
+            self.cache[host] = (reachable, TimeManager.get_current_time() + self.ttl)
+            callbacks = self.pending.pop(host, [])
+        for callback in callbacks:
+            callback(reachable)
+
+    def invalidate(self, host: str = None) -> None:
+        """Forget the verdict for a host, or for every host."""
+        with self.lock:
+            if host is None:
+                self.cache.clear()
+            else:
+                self.cache.pop(host, None)
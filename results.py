@@ -0,0 +1,195 @@
+import json
+import threading
+
+from config import AppConfig
+from manager import LogRecord, TimeManager
+
+EVENT_STARTED = 'scan_started'
+EVENT_PORT = 'port'
+EVENT_COMPLETED = 'scan_completed'
+EVENT_STOPPED = 'scan_stopped'
+EVENT_CANCELLED = 'scan_cancelled'
+EVENT_LOG = 'log'
+
+# Final status of a scan by the event that ended its stream.
+STATUS_IN_PROGRESS = 'In Progress'
+EVENT_STATUS = {
+    EVENT_COMPLETED: 'Completed',
+    EVENT_STOPPED: 'Stopped',
+    EVENT_CANCELLED: 'Cancelled'
+}
+
+RESULT_FILE_PREFIX = 'scan_results_'
+
+def target_file_name(target: str) -> str:
+    """Return a target specification in a form usable in file names."""
+    return target.replace('/', '_').replace('@', '')
+
+def result_file_prefix(target: str) -> str:
+    """Return the file name prefix shared by every result file of a target."""
+    return f"{RESULT_FILE_PREFIX}{target_file_name(target)}_"
+
+class NdjsonSink:
+    """Append-only NDJSON stream of findings and scan lifecycle events.
+
+    Each event is one JSON object per line. Writes go through a buffered file
+    that a background thread flushes every `flush_interval` seconds, also
+    through quiet stretches of a scan, so a crash loses at most that much and
+    nothing is accumulated in memory.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        flush_interval: float = AppConfig.STREAM_FLUSH_INTERVAL,
+        buffer_size: int = AppConfig.STREAM_BUFFER_SIZE
+    ) -> None:
+        """Open the stream for appending."""
+        self.path = path
+        self.flush_interval = flush_interval
+        self.file = open(path, 'a', buffering=buffer_size, encoding='utf-8')
+        self.last_flush = TimeManager.get_current_time()
+        self.pending = False
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.flusher = threading.Thread(target=self.run_flusher, daemon=True)
+        self.flusher.start()
+
+    def write(self, event: str, **fields) -> None:
+        """Append one event line, flushing if the interval has passed."""
+        line = json.dumps({'event': event, **fields}) + '\n'
+        with self.lock:
+            if self.file.closed:
+                return
+            self.file.write(line)
+            self.pending = True
+            if TimeManager.get_current_time() - self.last_flush >= self.flush_interval:
+                self.flush_locked()
+
+    def run_flusher(self) -> None:
+        """Flush lines waiting in the buffer every interval until the stream is closed."""
+        while not self.stopped.wait(self.flush_interval):
+            with self.lock:
+                if self.pending and not self.file.closed:
+                    self.flush_locked()
+
+    def flush_locked(self) -> None:
+        """Flush the file; the caller holds the lock."""
+        self.file.flush()
+        self.pending = False
+        self.last_flush = TimeManager.get_current_time()
+
+    def record(self, record: dict) -> None:
+        """Append a port finding."""
+        self.write(EVENT_PORT, **record)
+
+    def flush(self) -> None:
+        """Push buffered lines to the operating system."""
+        with self.lock:
+            if not self.file.closed:
+                self.flush_locked()
+
+    def close(self) -> None:
+        """Flush and close the stream."""
+        self.stopped.set()
+        with self.lock:
+            if not self.file.closed:
+                self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+def read_stream(path: str):
+    """Yield the events of an NDJSON stream, skipping a line truncated by a crash."""
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+def iter_open_ports(path: str):
+    """Yield the open port records of a stream."""
+    for event in read_stream(path):
+        if event.get('event') == EVENT_PORT and event.get('state') == 'open':
+            yield {key: value for key, value in event.items() if key != 'event'}
+
+def iter_logs(path: str):
+    """Yield the log lines recorded in a stream."""
+    for event in read_stream(path):
+        if event.get('event') == EVENT_LOG:
+            yield LogRecord(0, event['timestamp'], event['level'], event['message']).format()
+
+def summarize_stream(path: str) -> dict:
+    """Return the scan metadata and open-port count recorded in a stream."""
+    summary = {'status': STATUS_IN_PROGRESS, 'open_count': 0}
+    for event in read_stream(path):
+        kind = event.get('event')
+        if kind == EVENT_STARTED:
+            summary.update(event)
+        elif kind == EVENT_PORT and event.get('state') == 'open':
+            summary['open_count'] += 1
+        elif kind in EVENT_STATUS:
+            summary.update(event, status=EVENT_STATUS[kind])
+    summary.pop('event', None)
+    return summary
+
+def write_json_report(out_path: str, meta: dict, open_ports, logs: str, telemetry: dict = None) -> None:
+    """Write the JSON export, streaming the open ports one at a time."""
+    head = {
+        'ip': meta.get('ip'),
+        'start_port': meta.get('start_port'),
+        'end_port': meta.get('end_port'),
+        'ports': meta.get('ports'),
+        'status': meta.get('status', EVENT_STATUS[EVENT_COMPLETED])
+    }
+    if meta.get('history_scan') is not None:
+        # The scan is already in the history, so the importer skips this export.
+        head['history_scan'] = meta['history_scan']
+    with open(out_path, 'w', encoding='utf-8') as file:
+        file.write(json.dumps(head, indent=4)[:-2] + ',\n    "open_ports": [')
+        for index, port in enumerate(open_ports):
+            file.write(',' if index else '')
+            file.write('\n        ' + json.dumps(port))
+        file.write('\n    ],\n')
+        if telemetry is not None:
+            file.write('    "telemetry": ' + json.dumps(telemetry, indent=4).replace('\n', '\n    ') + ',\n')
+        file.write(f'    "logs": {json.dumps(logs)},\n')
+        file.write(f'    "timestamp": {json.dumps(TimeManager.get_formatted_time())}\n}}\n')
+
+def write_txt_report(out_path: str, meta: dict, open_ports, logs: str, telemetry: dict = None) -> None:
+    """Write the TXT export line by line."""
+    open_count = 0
+    scan_range = meta.get('ports') or f"{meta.get('start_port')} - {meta.get('end_port')}"
+    with open(out_path, 'w', encoding='utf-8') as file:
+        file.write(
+            "=== Scan Results ===\n"
+            f"Target IP: {meta.get('ip')}\n"
+            f"Scan Range: {scan_range}\n"
+            f"Timestamp: {TimeManager.get_formatted_time()}\n"
+            f"Status: {meta.get('status', EVENT_STATUS[EVENT_COMPLETED])}\n\n"
+            "=== Open Ports ===\n"
+        )
+        for port in open_ports:
+            open_count += 1
+            host = f"{port['host']}:" if meta.get('multi_host') else ""
+            file.write(f"{host}{port['port']} ({port['service']})\n")
+        file.write(
+            "\n=== Logs ===\n"
+            f"{logs}\n\n"
+            "=== Summary ===\n"
+            f"Total Ports Scanned: {meta.get('scanned')}\n"
+            f"Open Ports Found: {open_count}\n"
+        )
+        if telemetry is not None:
+            latency = telemetry['latency']
+            file.write("\n=== Telemetry ===\n")
+            for outcome, count in telemetry['counters'].items():
+                file.write(f"{outcome}: {count}\n")
+            file.write(
+                f"Peak In Flight: {telemetry['peak_inflight']}\n"
+                f"Latency p50/p90/p99 (s): {latency['p50']} / {latency['p90']} / {latency['p99']}\n"
+            )
@@ -0,0 +1,553 @@
+import errno
+import random
+import asyncio
+from collections import deque
+
+from config import AppConfig
+from manager import TimeManager
+from adaptive import RttEstimator, AimdController, REASON_RAMP
+from scheduler import (
+    TargetList,
+    InterleavedScheduler,
+    PermutationScheduler,
+    PermutedPorts,
+    TopPortsFirst,
+    ORDER_TOP,
+    ORDER_RANDOM,
+    is_address,
+    resolve_host
+)
+from services import service_index
+from limits import ProbeBudget, SocketFactory
+from checkpoint import ScheduleCursor
+from fingerprint import FingerprintStage, FingerprintCache
+from telemetry import (
+    ScanTelemetry,
+    OUTCOME_OPEN,
+    OUTCOME_REFUSED,
+    OUTCOME_TIMEOUT,
+    OUTCOME_CANCELLED,
+    outcome_for_errno
+)
+
+PORT_OPEN = 'open'
+PORT_CLOSED = 'closed'
+PORT_FILTERED = 'filtered'
+PORT_ERROR = 'error'
+
+# Errors raised by our own socket layer rather than by the target.
+LOCAL_ERRNOS = {
+    errno.EMFILE,
+    errno.ENFILE,
+    errno.ENOBUFS,
+    errno.EADDRNOTAVAIL,
+    errno.EAGAIN
+}
+
+def count_probes(targets: TargetList, ports, exclude: dict = None):
+    """Return the number of (host, port) pairs a scan probes, or None for target files."""
+    hosts = targets.count()
+    if hosts is None:
+        return None
+    excluded = sum(sum(1 for port in skip if port in ports) for skip in (exclude or {}).values())
+    return hosts * len(ports) - excluded
+
+class HostState:
+    """Per-host address, RTT estimate, congestion window and in-flight probe count.
+
+    `address` is a future while the host name is being resolved. `retired`
+    is set once the scheduler has handed out the host's last probe.
+    """
+
+    __slots__ = ('address', 'estimator', 'congestion', 'inflight', 'waiters', 'retired')
+
+    def __init__(self, address, estimator: RttEstimator, congestion: AimdController) -> None:
+        """Initialize the host state."""
+        self.address = address
+        self.estimator = estimator
+        self.congestion = congestion
+        self.inflight = 0
+        self.waiters = deque()
+        self.retired = False
+
+class ScanEngine:
+    """Asyncio connect-scan engine that drives many non-blocking probes from one thread.
+
+    The engine has no GUI dependencies. Results are delivered as dict records
+    either through the `on_result` callback of `run` or by iterating `results`.
+    The number of probes in flight is steered by AIMD congestion control,
+    globally between AIMD_MIN and `concurrency` and per host between
+    AIMD_HOST_MIN and AIMD_HOST_MAX. `concurrency` is first capped by the
+    ProbeBudget of the machine's descriptor limit and ephemeral port range.
+    With `fingerprint` enabled, open ports are identified by their banner
+    on the probe's own connection, in a FingerprintStage with its own slots.
+    """
+
+    def __init__(
+        self,
+        targets,
+        ports,
+        timeout: float = AppConfig.DEFAULT_TIMEOUT,
+        concurrency: int = AppConfig.DEFAULT_CONCURRENCY,
+        report=(PORT_OPEN,),
+        window: int = AppConfig.SCHEDULER_WINDOW,
+        shard=None,
+        min_timeout: float = AppConfig.MIN_TIMEOUT,
+        max_timeout: float = AppConfig.MAX_TIMEOUT,
+        retries: int = AppConfig.DEFAULT_RETRIES,
+        order: str = AppConfig.DEFAULT_SCAN_ORDER,
+        seed: int = None,
+        telemetry: ScanTelemetry = None,
+        source_addresses=AppConfig.SOURCE_ADDRESSES,
+        abort_on_close: bool = AppConfig.PROBE_RST_ON_CLOSE,
+        resume=None,
+        fingerprint: bool = AppConfig.FINGERPRINT_ENABLED,
+        fingerprint_cache: str = None,
+        exclude: dict = None
+    ) -> None:
+        """Initialize the engine for the given target specifications and re-iterable ports.
+
+        `resume` is the list of ScheduleCursors saved by a checkpoint of the
+        same scan; probes they mark as done are skipped. `fingerprint_cache`
+        is the path of a FingerprintCache whose fresh entries are not grabbed again.
+        `exclude` maps hosts to ports that are not probed on them.
+        """
+        self.targets = targets if isinstance(targets, TargetList) else TargetList(targets)
+        self.ports = ports
+        self.exclude = exclude or {}
+        self.timeout = timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.retries = max(0, retries)
+        self.budget = ProbeBudget(max(1, concurrency), len(source_addresses) or 1)
+        self.concurrency = self.budget.limit
+        self.sockets = SocketFactory(source_addresses, abort_on_close)
+        self.fingerprints = FingerprintStage(FingerprintCache.load(fingerprint_cache)) if fingerprint else None
+        self.report = frozenset(report)
+        self.window = window
+        self.shard = shard
+        self.cursor = resume[0] if resume else ScheduleCursor()
+        self.order = order
+        # Kept so a random order can be reproduced, e.g. by every shard of a scan.
+        self.seed = random.randrange(1 << 32) if seed is None else seed
+        self.hosts = {}
+        # Pass one ScanTelemetry to several engines to accumulate across them.
+        self.telemetry = telemetry or ScanTelemetry()
+        # Hosts differ in how many ports answer and how fast, so the global
+        # limit only backs off on drops and local errors.
+        self.congestion = AimdController(
+            AppConfig.AIMD_INITIAL,
+            min(AppConfig.AIMD_MIN, self.concurrency),
+            self.concurrency,
+            answer_drop=0.0,
+            rtt_growth=float('inf'),
+            on_change=self.on_global_limit
+        )
+        self.on_limit = None
+        self.loop = None
+        self.cancelled = False
+        self.workers = set()
+        self.active = 0
+        self.exhausted = False
+        self.scanning = False
+        self.scanned = 0
+
+    def stop(self) -> None:
+        """Ask the engine to stop handing out new probes."""
+        self.scanning = False
+
+    def cancel(self) -> None:
+        """Stop the scan and abort every probe in flight; safe to call from any thread.
+
+        Worker tasks are cancelled on the engine's loop at its next iteration,
+        which closes their sockets, so the scan returns within milliseconds
+        regardless of timeouts or range size.
+        """
+        self.cancelled = True
+        self.scanning = False
+        loop = self.loop
+        if loop is None:
+            return
+        try:
+            loop.call_soon_threadsafe(self.cancel_workers)
+        except RuntimeError:
+            # The loop has already finished.
+            pass
+
+    def cancel_workers(self) -> None:
+        """Cancel every worker task; runs on the engine's loop."""
+        for task in self.workers:
+            task.cancel()
+
+    def probes(self):
+        """Return an iterator over every (host, port) pair to probe.
+
+        The 'top' order probes the most frequently open ports first and the
+        'random' order visits the host x port space in a seeded permutation.
+        With `shard=(index, count)` only the pairs of one residue class of the
+        host x port grid are returned, which is how ShardedScanner splits the work.
+        """
+        if self.order == ORDER_RANDOM and self.targets.count() is not None:
+            return iter(PermutationScheduler(
+                self.targets,
+                self.ports,
+                self.seed,
+                self.exclude,
+                shard=self.shard,
+                retire=self.retire_host
+            ))
+        order = None
+        if self.order == ORDER_TOP:
+            order = TopPortsFirst
+        elif self.order == ORDER_RANDOM:
+            # Target files cannot be indexed, so only the ports are permuted.
+            order = lambda ports: PermutedPorts(ports, self.seed)
+        return iter(InterleavedScheduler(
+            self.targets,
+            self.ports,
+            self.window,
+            self.exclude,
+            admit=self.get_host,
+            retire=self.retire_host,
+            order=order,
+            shard=self.shard
+        ))
+
+    def cursors(self) -> list:
+        """Return the schedule position of the engine for a checkpoint."""
+        return [self.cursor]
+
+    def get_host(self, host: str) -> HostState:
+        """Return the state for a host, creating it and starting to resolve its name on first use."""
+        state = self.hosts.get(host)
+        if state is None:
+            # Resolved once per host in the loop's executor, not by every connect.
+            address = host if is_address(host) else self.loop.run_in_executor(None, resolve_host, host)
+            state = self.hosts[host] = HostState(
+                address,
+                RttEstimator(self.timeout, self.min_timeout, self.max_timeout),
+                AimdController(
+                    AppConfig.AIMD_HOST_INITIAL,
+                    AppConfig.AIMD_HOST_MIN,
+                    AppConfig.AIMD_HOST_MAX,
+                    on_change=lambda limit, reason: self.on_host_limit(host, limit, reason)
+                )
+            )
+        return state
+
+    def retire_host(self, host: str) -> None:
+        """Mark a host as done by the scheduler and drop its state once nothing of it is in flight."""
+        state = self.hosts.get(host)
+        if state is not None:
+            state.retired = True
+            self.evict_host(host, state)
+
+    def evict_host(self, host: str, state: HostState) -> None:
+        """Drop the state of a retired host that has no probes in flight or waiting."""
+        # Probes still holding the state keep working with it after it is dropped.
+        if state.retired and not state.inflight and not state.waiters and self.hosts.get(host) is state:
+            del self.hosts[host]
+
+    def on_global_limit(self, limit: int, reason: str) -> None:
+        """Forward a change of the global in-flight limit to the consumer."""
+        if self.on_limit:
+            self.on_limit(None, limit, reason)
+
+    def on_host_limit(self, host: str, limit: int, reason: str) -> None:
+        """Forward per-host back-offs to the consumer; ramps are too frequent to report."""
+        if self.on_limit and reason != REASON_RAMP:
+            self.on_limit(host, limit, reason)
+
+    async def acquire_host(self, state: HostState) -> None:
+        """Wait until the host is below its congestion window, first come first served.
+
+        Newcomers queue behind earlier waiters, otherwise a probe could wait
+        for the whole scan and hold back the checkpoint watermark.
+        """
+        waiters = state.waiters
+        if waiters or state.inflight >= state.congestion.current():
+            loop = asyncio.get_running_loop()
+            waiter = loop.create_future()
+            waiters.append(waiter)
+            while True:
+                try:
+                    await waiter
+                except asyncio.CancelledError:
+                    # Pass on a wake-up this probe can no longer use.
+                    if waiter.done() and not waiter.cancelled():
+                        self.wake_host(state)
+                    raise
+                if state.inflight < state.congestion.current():
+                    break
+                waiter = loop.create_future()
+                waiters.appendleft(waiter)
+        state.inflight += 1
+        if state.inflight < state.congestion.current():
+            # The window may have grown while this probe waited.
+            self.wake_host(state)
+
+    def release_host(self, host: str, state: HostState) -> None:
+        """Free a host slot and wake one waiter, or drop the host's state if it was the last probe."""
+        state.inflight -= 1
+        self.wake_host(state)
+        self.evict_host(host, state)
+
+    def wake_host(self, state: HostState) -> None:
+        """Wake the longest waiting probe of a host."""
+        while state.waiters:
+            waiter = state.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                break
+
+    async def probe(self, host: str, address: str, port: int, timeout: float) -> tuple:
+        """Attempt a non-blocking TCP connect to the host's address and return the port state, RTT and connection.
+
+        The connection is only returned, still open, for an open port the
+        fingerprint stage has claimed; the caller must hand it to `fingerprint`.
+        """
+        loop = asyncio.get_running_loop()
+        telemetry = self.telemetry
+        telemetry.probe_started()
+        start = loop.time()
+        try:
+            s = self.sockets.create()
+            try:
+                start = loop.time()
+                await asyncio.wait_for(loop.sock_connect(s, (address, port)), timeout)
+                rtt = loop.time() - start
+            except BaseException:
+                s.close()
+                raise
+            telemetry.probe_finished(OUTCOME_OPEN, rtt)
+            if self.fingerprints is not None and PORT_OPEN in self.report and self.fingerprints.claim(host, port):
+                return PORT_OPEN, rtt, s
+            s.close()
+            return PORT_OPEN, rtt, None
+        except ConnectionRefusedError:
+            rtt = loop.time() - start
+            telemetry.probe_finished(OUTCOME_REFUSED, rtt)
+            return PORT_CLOSED, rtt, None
+        except asyncio.TimeoutError:
+            telemetry.probe_finished(OUTCOME_TIMEOUT)
+            return PORT_FILTERED, None, None
+        except OSError as e:
+            # Also covers creating the socket failing, e.g. with EMFILE.
+            telemetry.probe_finished(outcome_for_errno(e.errno))
+            raise
+        except asyncio.CancelledError:
+            telemetry.probe_finished(OUTCOME_CANCELLED)
+            raise
+        except BaseException:
+            telemetry.inflight -= 1
+            raise
+
+    async def probe_with_retries(self, host: str, port: int) -> tuple:
+        """Probe a port with the host's adaptive timeout, retrying only on timeouts.
+
+        Returns the port state and the connection kept open for fingerprinting, if any.
+        The state is None when a stop interrupts the retries.
+        """
+        state = self.get_host(host)
+        if not isinstance(state.address, str):
+            # Shielded, since other probes of the host wait for the same lookup.
+            # A failed lookup stays in the future and fails every probe of the host.
+            state.address = await asyncio.shield(state.address)
+        estimator = state.estimator
+        loop = asyncio.get_running_loop()
+        await self.acquire_host(state)
+        try:
+            for attempt in range(self.retries + 1):
+                result, rtt, connection = await self.probe(host, state.address, port, estimator.timeout(attempt))
+                if rtt is not None:
+                    estimator.update(rtt)
+                    state.congestion.on_success(loop.time(), rtt)
+                    self.congestion.on_success(loop.time())
+                    if attempt:
+                        # The port answers, so the earlier attempts were dropped.
+                        state.congestion.on_loss(loop.time(), "retry answered")
+                        self.congestion.on_loss(loop.time(), "retry answered")
+                    break
+                # Silence is normal for filtered ports, so it only lowers the host's answer rate.
+                state.congestion.on_timeout(loop.time())
+                self.congestion.on_timeout(loop.time())
+                if not self.scanning and attempt < self.retries:
+                    # Filtered would be a guess, so the port is left for a resumed scan.
+                    return None, None
+        finally:
+            self.release_host(host, state)
+        return result, connection
+
+    async def probe_local_retries(self, host: str, port: int) -> tuple:
+        """Probe a port, backing off and trying again when local socket resources run out.
+
+        EMFILE, EADDRNOTAVAIL and similar errors say nothing about the target,
+        so the probe is repeated after the global window has been halved
+        instead of being reported as an error.
+        """
+        for attempt in range(AppConfig.LOCAL_ERROR_RETRIES + 1):
+            try:
+                return await self.probe_with_retries(host, port)
+            except OSError as e:
+                if e.errno not in LOCAL_ERRNOS or attempt == AppConfig.LOCAL_ERROR_RETRIES or not self.scanning:
+                    raise
+                reason = errno.errorcode.get(e.errno, str(e.errno))
+                self.congestion.on_error(asyncio.get_running_loop().time(), reason)
+                await asyncio.sleep(AppConfig.LOCAL_ERROR_DELAY * (attempt + 1))
+
+    def make_record(self, host: str, port: int, state: str) -> dict:
+        """Build the result record handed to consumers."""
+        record = {
+            'host': host,
+            'port': port,
+            'state': state,
+            'service': self.get_service(port) if state == PORT_OPEN else None,
+            'timestamp': TimeManager.get_formatted_time()
+        }
+        if state == PORT_OPEN and self.fingerprints is not None:
+            cached = self.fingerprints.cache.get(host, port)
+            if cached is not None:
+                record.update(cached)
+        return record
+
+    async def worker(self, probes, on_result, on_progress) -> None:
+        """Pull probes from the shared iterator until it is exhausted, the scan stops
+        or the congestion window shrinks below the number of running workers."""
+        try:
+            await self.work(probes, on_result, on_progress)
+        finally:
+            self.active -= 1
+
+    async def work(self, probes, on_result, on_progress) -> None:
+        """Probe loop run by each worker."""
+        for index, (host, port) in probes:
+            if not self.scanning:
+                break
+            record = connection = None
+            try:
+                state, connection = await self.probe_local_retries(host, port)
+                if state is None:
+                    # Neither reported nor completed, so a resumed scan probes it again.
+                    continue
+                if state in self.report:
+                    record = self.make_record(host, port, state)
+            except OSError as e:
+                if PORT_ERROR in self.report:
+                    record = self.make_record(host, port, PORT_ERROR)
+                    record['error'] = str(e)
+            if connection is not None:
+                # Grabbed in its own task, so a slow service does not hold up this worker.
+                task = asyncio.create_task(self.fingerprint(index, record, connection, on_result, on_progress))
+                # A task cancelled before its first step never runs grab's cleanup.
+                task.add_done_callback(lambda task, connection=connection: self.fingerprints.release(connection))
+                self.track(task)
+            else:
+                self.finish_probe(index, record, on_result, on_progress)
+            if self.active > self.congestion.current():
+                return
+            self.spawn_workers(probes, on_result, on_progress)
+        else:
+            self.exhausted = True
+
+    def finish_probe(self, index: int, record, on_result, on_progress) -> None:
+        """Hand on the record of a probe, if it is reported, and count the probe as done."""
+        if record is not None and on_result:
+            on_result(record)
+        # Only after the result has been handed on, so a checkpoint never skips it.
+        # Also after a stop: a delivered record must not be probed again on resume.
+        self.cursor.complete(index)
+        self.scanned += 1
+        if on_progress:
+            on_progress(self.scanned)
+
+    async def fingerprint(self, index: int, record: dict, connection, on_result, on_progress) -> None:
+        """Fingerprint an open port on its probe connection, then finish the probe."""
+        record.update(await self.fingerprints.grab(connection, record['service']))
+        self.finish_probe(index, record, on_result, on_progress)
+
+    def track(self, task: asyncio.Task) -> None:
+        """Add a task to the ones the scan waits for and cancels."""
+        self.workers.add(task)
+        task.add_done_callback(self.workers.discard)
+
+    def spawn_workers(self, probes, on_result, on_progress) -> None:
+        """Start workers until their number matches the global congestion window."""
+        while self.scanning and not self.exhausted and self.active < self.congestion.current():
+            self.active += 1
+            self.track(asyncio.create_task(self.worker(probes, on_result, on_progress)))
+
+    async def run_async(self, on_result=None, on_progress=None, on_limit=None) -> None:
+        """Scan every target with an adaptive number of connects in flight."""
+        if self.cancelled:
+            return
+        self.loop = asyncio.get_running_loop()
+        self.scanning = True
+        self.exhausted = False
+        self.scanned = self.cursor.count()
+        self.on_limit = on_limit
+        # Workers share one iterator, so the host x port product is never materialized.
+        probes = self.cursor.remaining(self.probes())
+        self.spawn_workers(probes, on_result, on_progress)
+        try:
+            while self.workers:
+                done, _ = await asyncio.wait(set(self.workers))
+                for task in done:
+                    if not task.cancelled():
+                        task.result()
+        finally:
+            self.loop = None
+
+    def run(self, on_result=None, on_progress=None, on_limit=None) -> None:
+        """Run the scan to completion on a fresh event loop in the calling thread."""
+        asyncio.run(self.run_async(on_result, on_progress, on_limit))
+
+    def results(self, on_limit=None, on_idle=None):
+        """Yield result records as they are produced, driving the loop from the caller.
+
+        `on_idle` is called whenever every record produced so far has been
+        consumed, which is when a checkpoint of the engine is consistent.
+        """
+        loop = asyncio.new_event_loop()
+        pending = deque()
+        waiter = None
+
+        last_idle = TimeManager.get_current_time()
+
+        def on_result(record: dict) -> None:
+            pending.append(record)
+            if waiter is not None and not waiter.done():
+                waiter.set_result(None)
+
+        def on_progress(scanned: int) -> None:
+            # Hand control back now and then so on_idle also runs while nothing is found.
+            if waiter is not None and not waiter.done() and TimeManager.get_elapsed_time(last_idle) >= AppConfig.STATUS_INTERVAL:
+                waiter.set_result(None)
+
+        task = loop.create_task(self.run_async(on_result, on_progress if on_idle else None, on_limit))
+        try:
+            while True:
+                while pending:
+                    yield pending.popleft()
+                if task.done():
+                    break
+                if on_idle:
+                    on_idle()
+                    last_idle = TimeManager.get_current_time()
+                waiter = loop.create_future()
+                loop.run_until_complete(asyncio.wait({task, waiter}, return_when=asyncio.FIRST_COMPLETED))
+            task.result()
+        finally:
+            if not task.done():
+                # The consumer gave up early, so abort the probes in flight.
+                self.cancel()
+                loop.run_until_complete(task)
+            loop.close()
+
+    def count(self):
+        """Return the number of probes in this scan, or None if it cannot be known upfront."""
+        return count_probes(self.targets, self.ports, self.exclude)
+
+    @staticmethod
+    def get_service(port: int) -> str:
+        """Return the service name registered for a TCP port."""
+        return service_index.lookup(port)
@@ -0,0 +1,381 @@
+import socket
+import ipaddress
+from itertools import filterfalse
+from collections import deque
+
+from config import AppConfig
+from services import TOP_PORTS
+from ports import PortSlice
+
+ORDER_SEQUENTIAL = 'sequential'
+ORDER_TOP = 'top'
+ORDER_RANDOM = 'random'
+SCAN_ORDERS = (ORDER_SEQUENTIAL, ORDER_TOP, ORDER_RANDOM)
+
+def expand_target(spec: str):
+    """Lazily yield the host addresses described by a single target specification.
+
+    Supported forms are single addresses or host names, CIDR networks
+    (10.0.0.0/22), address ranges (10.0.0.1-10.0.0.50 or 10.0.0.1-50) and
+    target files (@targets.txt) containing one specification per line.
+    Only IPv4 is supported, like the sockets the engine opens.
+    """
+    spec = spec.strip()
+    if spec.startswith('@'):
+        with open(spec[1:]) as file:
+            for line in file:
+                line = line.split('#', 1)[0].strip()
+                if line:
+                    yield from expand_target(line)
+    elif '/' in spec:
+        network = ipaddress.IPv4Network(spec, strict=False)
+        for address in network.hosts():
+            yield str(address)
+    elif '-' in spec and is_address(spec.split('-', 1)[0]):
+        first, last = parse_range(spec)
+        for value in range(int(first), int(last) + 1):
+            yield str(ipaddress.ip_address(value))
+    else:
+        # Host names are resolved once, when the scheduler admits the host.
+        yield spec
+
+def is_address(value: str) -> bool:
+    """Return True if the value is a literal IPv4 address."""
+    try:
+        ipaddress.IPv4Address(value)
+        return True
+    except ValueError:
+        return False
+
+def resolve_host(host: str) -> str:
+    """Return the first IPv4 address of a host name; raises OSError if it does not resolve."""
+    if is_address(host):
+        return host
+    return socket.getaddrinfo(host, None, socket.AF_INET, socket.SOCK_STREAM)[0][4][0]
+
+def parse_range(spec: str):
+    """Parse an address range into its first and last address."""
+    start, end = spec.split('-', 1)
+    first = ipaddress.IPv4Address(start)
+    if '.' not in end:
+        end = start.rsplit('.', 1)[0] + '.' + end
+    last = ipaddress.IPv4Address(end)
+    if last < first:
+        raise ValueError(f"Invalid address range: {spec}")
+    return first, last
+
+def target_first(spec: str):
+    """Return the first address of a network or range specification, or None for a host name."""
+    spec = spec.strip()
+    if '/' in spec:
+        network = ipaddress.IPv4Network(spec, strict=False)
+        # hosts() skips the network address except on /31 and /32.
+        offset = 0 if network.prefixlen >= network.max_prefixlen - 1 else 1
+        return network.network_address + offset
+    if '-' in spec and is_address(spec.split('-', 1)[0]):
+        return parse_range(spec)[0]
+    return None
+
+def count_target(spec: str):
+    """Return the number of hosts a specification expands to, or None if unknown."""
+    spec = spec.strip()
+    if spec.startswith('@'):
+        return None
+    if '/' in spec:
+        network = ipaddress.IPv4Network(spec, strict=False)
+        if network.prefixlen >= network.max_prefixlen - 1:
+            return network.num_addresses
+        return network.num_addresses - 2
+    if '-' in spec and is_address(spec.split('-', 1)[0]):
+        first, last = parse_range(spec)
+        return int(last) - int(first) + 1
+    return 1
+
+def validate_target(spec: str) -> bool:
+    """Check that a specification is syntactically valid without expanding it."""
+    spec = spec.strip()
+    if not spec:
+        return False
+    try:
+        if spec.startswith('@'):
+            with open(spec[1:]):
+                return True
+        if '/' in spec:
+            ipaddress.IPv4Network(spec, strict=False)
+        elif '-' in spec and is_address(spec.split('-', 1)[0]):
+            parse_range(spec)
+        elif not is_address(spec):
+            labels = spec.split('.')
+            # No top-level domain is numeric, so such a name is a malformed address like 10.0.0.300.
+            if labels[-1].isdigit():
+                return False
+            return all(label and label.replace('-', '').isalnum() for label in labels)
+        return True
+    except (OSError, ValueError):
+        return False
+
+class TargetList:
+    """Re-iterable collection of scan targets that expands lazily."""
+
+    def __init__(self, specs) -> None:
+        """Initialize the target list from one or more specifications."""
+        self.specs = [specs] if isinstance(specs, str) else list(specs)
+        self.bounds = None
+
+    def __iter__(self):
+        """Yield every host address in specification order."""
+        for spec in self.specs:
+            yield from expand_target(spec)
+
+    def count(self):
+        """Return the total number of hosts, or None if a target file is involved."""
+        total = 0
+        for spec in self.specs:
+            hosts = count_target(spec)
+            if hosts is None:
+                return None
+            total += hosts
+        return total
+
+    def is_single_host(self) -> bool:
+        """Return True if the list names exactly one host."""
+        return self.count() == 1
+
+    def host_at(self, index: int) -> str:
+        """Return the index-th host without expanding the ones before it; not supported for target files."""
+        if self.bounds is None:
+            if self.count() is None:
+                raise ValueError("Target files cannot be indexed")
+            self.bounds = [(spec.strip(), target_first(spec), count_target(spec)) for spec in self.specs]
+        for spec, first, hosts in self.bounds:
+            if index < hosts:
+                return spec if first is None else str(first + index)
+            index -= hosts
+        raise IndexError("Target index out of range")
+
+def permutation(size: int, seed: int):
+    """Lazily yield every integer in [0, size) exactly once in a seeded pseudorandom order.
+
+    A full-period LCG walks [0, 2**k) and each value is scrambled by an
+    invertible mix; values >= size are skipped. Memory use is constant.
+    """
+    if size <= 0:
+        return
+    bits = max(2, (size - 1).bit_length())
+    mask = (1 << bits) - 1
+    # Hull-Dobell: with a power-of-two modulus, c odd and a = 1 mod 4 give a full period.
+    multiplier = (seed * 4 + 1) & mask
+    increment = ((seed >> 16) * 2 + 1) & mask
+    mix = ((seed >> 8) | 1) * 0x9E3779B1 | 1
+    shift = bits // 2 + 1
+    value = seed & mask
+    for _ in range(mask + 1):
+        value = (value * multiplier + increment) & mask
+        # Multiplying by an odd number and xor-shifting are both bijections on k bits.
+        mixed = (value * mix) & mask
+        mixed ^= mixed >> shift
+        if mixed < size:
+            yield mixed
+
+class TopPortsFirst:
+    """Re-iterable port order that yields the most frequently open ports first."""
+
+    def __init__(self, ports, top=TOP_PORTS) -> None:
+        """Initialize the order for the given re-iterable ports."""
+        self.ports = ports
+        self.top = [port for port in top if port in ports]
+
+    def __iter__(self):
+        """Yield the top ports in rank order, then the others in their original order."""
+        yield from self.top
+        seen = set(self.top)
+        for port in self.ports:
+            if port not in seen:
+                yield port
+
+    def __len__(self) -> int:
+        return len(self.ports)
+
+    def __contains__(self, port: int) -> bool:
+        return port in self.ports
+
+class PermutedPorts:
+    """Re-iterable seeded pseudorandom order of an indexable port sequence."""
+
+    def __init__(self, ports, seed: int) -> None:
+        """Initialize the order for the given ports and seed."""
+        self.ports = ports
+        self.seed = seed
+
+    def __iter__(self):
+        """Yield every port once in permuted order."""
+        for index in permutation(len(self.ports), self.seed):
+            yield self.ports[index]
+
+    def __len__(self) -> int:
+        return len(self.ports)
+
+    def __contains__(self, port: int) -> bool:
+        return port in self.ports
+
+class PermutationScheduler:
+    """(host, port) scheduler that visits the whole host x port space in a seeded random order.
+
+    Consecutive probes land on unrelated hosts and ports, which avoids the
+    sequential bursts that trip rate limiting, and nothing is materialized:
+    each probe index is mapped back to a host and port arithmetically.
+    Pairs listed in `exclude` ({host: ports}) are skipped. With
+    `shard=(index, count)` only the pairs whose index is congruent to `index`
+    modulo `count` are permuted, so each shard walks just its own pairs.
+    `retire` is called with each host once its last pair has been handed out,
+    which takes a counter per host that has pairs left.
+    """
+
+    def __init__(
+        self,
+        targets: TargetList,
+        ports,
+        seed: int,
+        exclude: dict = None,
+        shard=None,
+        retire=None
+    ) -> None:
+        """Initialize the scheduler with countable targets and indexable ports."""
+        self.targets = targets
+        self.ports = ports
+        self.seed = seed
+        self.exclude = exclude or {}
+        self.shard = shard or (0, 1)
+        self.retire = retire
+
+    def row_size(self, number: int, host: str) -> int:
+        """Return the number of pairs of the shard on the number-th host."""
+        port_count = len(self.ports)
+        first, step = self.shard
+        start = number * port_count
+        size = len(range(start + (first - start) % step, start + port_count, step))
+        skip = self.exclude.get(host)
+        if skip:
+            size -= sum(1 for port in skip if port in self.ports and (start + self.ports.index(port)) % step == first)
+        return size
+
+    def __iter__(self):
+        """Yield every (host, port) pair of the shard once in permuted order."""
+        port_count = len(self.ports)
+        first, step = self.shard
+        size = max(0, (self.targets.count() * port_count - first + step - 1) // step)
+        left = {}
+        finished = None
+        for index in permutation(size, self.seed):
+            if finished is not None:
+                # Retired one step late, when the probe of its last pair has started.
+                self.retire(finished)
+                finished = None
+            number, port = divmod(first + index * step, port_count)
+            host, port = self.targets.host_at(number), self.ports[port]
+            skip = self.exclude.get(host)
+            if skip is not None and port in skip:
+                continue
+            if self.retire:
+                remaining = left.pop(number, None)
+                remaining = (self.row_size(number, host) if remaining is None else remaining) - 1
+                if remaining:
+                    left[number] = remaining
+                else:
+                    finished = host
+            yield host, port
+        if finished is not None:
+            self.retire(finished)
+
+class InterleavedScheduler:
+    """Round-robin (host, port) scheduler over a sliding window of active hosts.
+
+    Only `window` hosts and their port iterators are held at a time, so a
+    subnet sweep never builds the host x port product, and consecutive probes
+    to the same host are spread `window` probes apart. Pairs listed in
+    `exclude` ({host: ports}) are skipped. `admit` is called with each host
+    as it enters the window, e.g. to start resolving its name, and `retire`
+    once its ports are used up.
+
+    `order` arranges a host's ports, e.g. TopPortsFirst. With
+    `shard=(index, count)` the scheduler only yields the pairs whose position
+    in the host x port grid is congruent to `index` modulo `count`. It takes
+    them from `count` strided views of the ports, so a shard never walks the
+    pairs of the others.
+    """
+
+    def __init__(
+        self,
+        targets,
+        ports,
+        window: int = AppConfig.SCHEDULER_WINDOW,
+        exclude: dict = None,
+        admit=None,
+        retire=None,
+        order=None,
+        shard=None
+    ) -> None:
+        """Initialize the scheduler with re-iterable targets and indexable ports."""
+        self.targets = targets
+        self.ports = ports
+        self.window = max(1, window)
+        self.exclude = exclude or {}
+        self.admit = admit
+        self.retire = retire
+        self.order = order or (lambda ports: ports)
+        self.shard = shard or (0, 1)
+
+    def views(self) -> list:
+        """Return the ordered ports for every offset a host's first port can have in the shard."""
+        index, count = self.shard
+        if count == 1:
+            return [self.order(self.ports)]
+        return [self.order(PortSlice(self.ports, offset, count)) for offset in range(count)]
+
+    def hosts(self):
+        """Yield (host, ordered ports) for every host the shard has ports of."""
+        index, count = self.shard
+        views = self.views()
+        port_count = len(self.ports)
+        # The view of host number n only depends on n modulo count.
+        owned = [number for number in range(count) if len(views[(index - number * port_count) % count])]
+        total = self.targets.count() if isinstance(self.targets, TargetList) else None
+        if len(owned) < count and total is not None:
+            # Fewer ports than shards: index the hosts with ports of ours instead of expanding them all.
+            for first in range(0, total, count):
+                for number in owned:
+                    if first + number < total:
+                        yield self.targets.host_at(first + number), views[(index - number * port_count) % count]
+            return
+        for number, host in enumerate(self.targets):
+            view = views[(index - number * port_count) % count]
+            if len(view):
+                yield host, view
+
+    def __iter__(self):
+        """Yield (host, port) pairs, interleaving ports across hosts."""
+        hosts = self.hosts()
+        active = deque()
+
+        def refill() -> None:
+            while len(active) < self.window:
+                host, view = next(hosts, (None, None))
+                if host is None:
+                    return
+                skip = self.exclude.get(host)
+                ports = iter(view) if skip is None else filterfalse(skip.__contains__, view)
+                active.append((host, ports))
+                if self.admit:
+                    self.admit(host)
+
+        refill()
+        while active:
+            host, ports = active.popleft()
+            port = next(ports, None)
+            if port is None:
+                if self.retire:
+                    self.retire(host)
+                refill()
+                continue
+            yield host, port
+            active.append((host, ports))
@@ -0,0 +1,113 @@
+import os
+import threading
+
+UNKNOWN_SERVICE = "Unknown"
+
+# Well-known names used when the system services database lacks an entry or
+# does not exist at all. Extend at runtime with ServiceIndex.register.
+BUNDLED_SERVICES = {
+    'tcp': {
+        20: 'ftp-data', 21: 'ftp', 22: 'ssh', 23: 'telnet', 25: 'smtp', 53: 'domain',
+        80: 'http', 88: 'kerberos', 110: 'pop3', 111: 'sunrpc', 119: 'nntp', 135: 'msrpc',
+        139: 'netbios-ssn', 143: 'imap', 179: 'bgp', 389: 'ldap', 443: 'https', 445: 'microsoft-ds',
+        465: 'smtps', 514: 'shell', 515: 'printer', 548: 'afp', 554: 'rtsp', 587: 'submission',
+        631: 'ipp', 636: 'ldaps', 873: 'rsync', 993: 'imaps', 995: 'pop3s', 1080: 'socks',
+        1433: 'ms-sql-s', 1521: 'oracle', 1723: 'pptp', 1883: 'mqtt', 2049: 'nfs', 2375: 'docker',
+        2376: 'docker-s', 3000: 'http-dev', 3306: 'mysql', 3389: 'ms-wbt-server', 5000: 'upnp',
+        5432: 'postgresql', 5671: 'amqps', 5672: 'amqp', 5900: 'vnc', 5984: 'couchdb',
+        6379: 'redis', 6443: 'kubernetes', 8000: 'http-alt', 8080: 'http-proxy', 8443: 'https-alt',
+        8888: 'http-alt', 9000: 'cslistener', 9090: 'websm', 9200: 'elasticsearch',
+        9418: 'git', 11211: 'memcache', 27017: 'mongodb'
+    },
+    'udp': {
+        53: 'domain', 67: 'bootps', 68: 'bootpc', 69: 'tftp', 123: 'ntp', 137: 'netbios-ns',
+        138: 'netbios-dgm', 161: 'snmp', 162: 'snmp-trap', 500: 'isakmp', 514: 'syslog',
+        1194: 'openvpn', 1900: 'ssdp', 4500: 'ipsec-nat-t', 5353: 'mdns', 51820: 'wireguard'
+    }
+}
+
+# TCP ports ranked by how often they are found open on internet hosts, most
+# frequent first. Used by the 'top' scan order.
+TOP_PORTS = (
+    80, 23, 443, 21, 22, 25, 3389, 110, 445, 139, 143, 53, 135, 3306, 8080, 1723, 111, 995,
+    993, 5900, 1025, 587, 8888, 199, 1720, 465, 548, 113, 81, 6001, 10000, 514, 5060, 179,
+    1026, 2000, 8443, 8000, 32768, 554, 26, 1433, 49152, 2001, 515, 8008, 49154, 1027, 5666,
+    646, 5000, 5631, 631, 49153, 8081, 2049, 88, 79, 5800, 106, 2121, 1110, 49155, 6000, 513,
+    990, 5357, 427, 49156, 543, 544, 5101, 144, 7, 389, 8009, 3128, 444, 9999, 5009, 7070,
+    5190, 3000, 5432, 1900, 3986, 13, 1029, 9, 5051, 6646, 49157, 1028, 873, 1755, 2717,
+    4899, 9100, 119, 37
+)
+
+def default_services_path() -> str:
+    """Return the location of the system services database."""
+    if os.name == 'nt':
+        return os.path.join(os.environ.get('SystemRoot', r'C:\Windows'), 'System32', 'drivers', 'etc', 'services')
+    return '/etc/services'
+
+class ServiceIndex:
+    """Port to service name index built once, lazily, per protocol.
+
+    Each protocol gets a flat 65536-entry table filled from the bundled
+    mapping and then the system services database, so `lookup` is a list
+    index that never touches the resolver, raises or allocates.
+    """
+
+    def __init__(self, services_path: str = None) -> None:
+        """Initialize the index; nothing is read until the first lookup."""
+        self.services_path = services_path or default_services_path()
+        self.tables = {}
+        self.extra = {}
+        self.lock = threading.Lock()
+
+    def register(self, port: int, name: str, protocol: str = 'tcp') -> None:
+        """Add or override a service name; takes precedence over every other source."""
+        with self.lock:
+            self.extra.setdefault(protocol, {})[port] = name
+            table = self.tables.get(protocol)
+            if table is not None:
+                table[port] = name
+
+    def lookup(self, port: int, protocol: str = 'tcp') -> str:
+        """Return the service name for a port, or 'Unknown'."""
+        table = self.tables.get(protocol)
+        if table is None:
+            table = self.load(protocol)
+        return table[port] or UNKNOWN_SERVICE
+
+    def load(self, protocol: str) -> list:
+        """Build the lookup table for a protocol."""
+        with self.lock:
+            table = self.tables.get(protocol)
+            if table is not None:
+                return table
+            table = [None] * 65536
+            for port, name in BUNDLED_SERVICES.get(protocol, {}).items():
+                table[port] = name
+            for port, name in self.read_services_file(protocol):
+                table[port] = name
+            for port, name in self.extra.get(protocol, {}).items():
+                table[port] = name
+            self.tables[protocol] = table
+            return table
+
+    def read_services_file(self, protocol: str):
+        """Yield (port, name) pairs for a protocol from the services database."""
+        seen = set()
+        try:
+            with open(self.services_path, encoding='utf-8', errors='replace') as file:
+                for line in file:
+                    fields = line.split('#', 1)[0].split()
+                    if len(fields) < 2:
+                        continue
+                    port, _, proto = fields[1].partition('/')
+                    if proto != protocol or not port.isdigit():
+                        continue
+                    port = int(port)
+                    # Like getservbyport, the first entry for a port wins.
+                    if port < 65536 and port not in seen:
+                        seen.add(port)
+                        yield port, fields[0]
+        except OSError:
+            return
+
+service_index = ServiceIndex()
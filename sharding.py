@@ -0,0 +1,265 @@
+import queue
+import random
+import signal
+import asyncio
+import multiprocessing
+
+from config import AppConfig
+from manager import TimeManager
+from scanner import ScanEngine, count_probes
+from scheduler import TargetList
+from adaptive import REASON_RAMP
+from telemetry import ScanTelemetry
+from limits import ProbeBudget
+from checkpoint import ScheduleCursor
+from fingerprint import FINGERPRINT_FIELDS
+
+# Records cross the process boundary as flat tuples in this field order.
+RECORD_FIELDS = ('host', 'port', 'state', 'service', 'timestamp', 'error') + FINGERPRINT_FIELDS
+
+MSG_RESULTS = 'r'
+MSG_PROGRESS = 'p'
+MSG_LIMIT = 'l'
+MSG_TELEMETRY = 't'
+MSG_CURSOR = 'c'
+MSG_DONE = 'd'
+
+def run_shard(index: int, count: int, options: dict, channel, stop_event, cancel_event, cursor=None) -> None:
+    """Scan one shard in a worker process and stream batches back to the parent."""
+    # Ctrl-C reaches the whole process group; the parent decides how to stop.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    resume = [ScheduleCursor.from_dict(cursor)] if cursor else None
+    engine = ScanEngine(shard=(index, count), resume=resume, **options)
+    batch = []
+    ramp = None
+    last_flush = TimeManager.get_current_time()
+
+    def flush() -> None:
+        nonlocal batch, ramp, last_flush
+        if batch:
+            channel.put((MSG_RESULTS, index, batch))
+            batch = []
+        if ramp:
+            channel.put((MSG_LIMIT, index, ramp))
+            ramp = None
+        channel.put((MSG_TELEMETRY, index, engine.telemetry.export()))
+        # Sent after the results it covers, so the parent's cursors never run ahead.
+        channel.put((MSG_CURSOR, index, engine.cursor.to_dict()))
+        channel.put((MSG_PROGRESS, index, engine.scanned))
+        last_flush = TimeManager.get_current_time()
+
+    def on_limit(host, limit: int, reason: str) -> None:
+        nonlocal ramp
+        # Ramps are coalesced into the next flush; back-offs are sent at once.
+        if reason == REASON_RAMP:
+            ramp = (host, limit, reason)
+        else:
+            channel.put((MSG_LIMIT, index, (host, limit, reason)))
+
+    def on_result(record: dict) -> None:
+        batch.append(tuple(record.get(field) for field in RECORD_FIELDS))
+        if len(batch) >= AppConfig.SHARD_BATCH_SIZE:
+            flush()
+
+    def on_progress(scanned: int) -> None:
+        if TimeManager.get_elapsed_time(last_flush) >= AppConfig.SHARD_FLUSH_INTERVAL:
+            flush()
+
+    async def watch_cancel() -> None:
+        stopped = False
+        while True:
+            if cancel_event.is_set():
+                engine.cancel()
+                return
+            if stop_event.is_set() and not stopped:
+                engine.stop()
+                stopped = True
+            await asyncio.sleep(AppConfig.CANCEL_POLL_INTERVAL)
+
+    async def main() -> None:
+        watcher = asyncio.create_task(watch_cancel())
+        await engine.run_async(on_result, on_progress, on_limit)
+        watcher.cancel()
+
+    try:
+        asyncio.run(main())
+    finally:
+        flush()
+        channel.put((MSG_DONE, index, engine.scanned))
+
+class ShardedScanner:
+    """Split a scan across worker processes, each running its own ScanEngine loop.
+
+    Shard `i` of `n` owns the (host, port) pairs whose position in the host x
+    port grid is congruent to `i` modulo `n`, and its scheduler only generates
+    those. Results, progress counts and
+    cancellation travel over a single multiprocessing queue and event, and
+    the public interface mirrors ScanEngine so the GUI and CLI can use either.
+    """
+
+    def __init__(
+        self,
+        targets,
+        ports,
+        processes: int = AppConfig.DEFAULT_PROCESSES,
+        concurrency: int = AppConfig.DEFAULT_CONCURRENCY,
+        **options
+    ) -> None:
+        """Initialize the sharded scanner with ScanEngine options."""
+        self.processes = max(1, processes)
+        # Shards report their telemetry to the parent, which sums it up here.
+        self.telemetry = options.pop('telemetry', None) or ScanTelemetry()
+        resume = options.pop('resume', None)
+        self.targets = targets if isinstance(targets, TargetList) else TargetList(targets)
+        self.ports = ports
+        self.exclude = options.get('exclude')
+        # The ephemeral port range is shared by the shards, descriptors are not.
+        self.budget = ProbeBudget(
+            max(1, concurrency),
+            len(options.get('source_addresses', AppConfig.SOURCE_ADDRESSES)) or 1,
+            self.processes
+        )
+        # Every shard must use the same seed, which is also kept for the checkpoint.
+        self.seed = random.randrange(1 << 32) if options.get('seed') is None else options['seed']
+        self.options = dict(
+            options,
+            targets=self.targets,
+            ports=ports,
+            concurrency=max(1, self.budget.limit // self.processes),
+            seed=self.seed
+        )
+        # Each shard walks its own slice of the schedule and has its own cursor.
+        self.shard_cursors = resume or [ScheduleCursor() for _ in range(self.processes)]
+        if len(self.shard_cursors) != self.processes:
+            raise ValueError("A sharded scan must resume with the number of processes it was started with")
+        self.context = multiprocessing.get_context()
+        self.stop_event = self.context.Event()
+        self.cancel_event = self.context.Event()
+        self.scanning = False
+        self.cancelled = False
+        self.scanned = 0
+
+    def stop(self) -> None:
+        """Signal every worker process to stop handing out probes."""
+        self.scanning = False
+        self.stop_event.set()
+
+    def cancel(self) -> None:
+        """Abort every shard's probes in flight; shards that do not exit within
+        SHARD_CANCEL_GRACE seconds are terminated."""
+        self.cancelled = True
+        self.scanning = False
+        self.cancel_event.set()
+
+    def count(self):
+        """Return the number of probes in this scan, or None if it cannot be known upfront."""
+        return count_probes(self.targets, self.ports, self.exclude)
+
+    def cursors(self) -> list:
+        """Return the schedule position of every shard for a checkpoint."""
+        return self.shard_cursors
+
+    def messages(self):
+        """Start the workers and yield (kind, payload) messages until every shard is done.
+
+        Kinds are 'result' with a record, 'progress' with the total probe count
+        and 'limit' with a (host, limit, reason) tuple; the global limit is the
+        sum of the shard limits.
+        """
+        channel = self.context.Queue()
+        self.stop_event.clear()
+        self.cancel_event.clear()
+        self.cancelled = False
+        workers = [
+            self.context.Process(
+                target=run_shard,
+                args=(
+                    index, self.processes, self.options, channel, self.stop_event, self.cancel_event,
+                    self.shard_cursors[index].to_dict()
+                ),
+                daemon=True
+            )
+            for index in range(self.processes)
+        ]
+        for worker in workers:
+            worker.start()
+
+        self.scanning = True
+        progress = [cursor.count() for cursor in self.shard_cursors]
+        self.scanned = sum(progress)
+        limits = [AppConfig.AIMD_INITIAL] * self.processes
+        running = set(range(self.processes))
+        base = self.telemetry.export()
+        shard_telemetry = {}
+        deadline = None
+        try:
+            while running:
+                if self.cancelled:
+                    deadline = deadline or TimeManager.get_current_time() + AppConfig.SHARD_CANCEL_GRACE
+                    if TimeManager.get_current_time() >= deadline:
+                        break
+                try:
+                    kind, index, payload = channel.get(
+                        timeout=AppConfig.CANCEL_POLL_INTERVAL if self.cancelled else AppConfig.SHARD_FLUSH_INTERVAL
+                    )
+                except queue.Empty:
+                    # A worker that died without reporting must not hang the parent.
+                    running = {i for i in running if workers[i].is_alive()}
+                    continue
+                if kind == MSG_RESULTS:
+                    for values in payload:
+                        yield 'result', dict(zip(RECORD_FIELDS, values))
+                elif kind == MSG_LIMIT:
+                    host, limit, reason = payload
+                    if host is None:
+                        limits[index] = limit
+                        limit = sum(limits)
+                    yield 'limit', (host, limit, reason)
+                elif kind == MSG_CURSOR:
+                    self.shard_cursors[index] = ScheduleCursor.from_dict(payload)
+                elif kind == MSG_TELEMETRY:
+                    shard_telemetry[index] = payload
+                    self.telemetry.combine([base, *shard_telemetry.values()])
+                else:
+                    progress[index] = payload
+                    self.scanned = sum(progress)
+                    if kind == MSG_DONE:
+                        running.discard(index)
+                    yield 'progress', self.scanned
+        finally:
+            if running:
+                # Abandoned by the consumer, or shards outlived the cancel grace period.
+                self.cancel()
+            self.stop()
+            for worker in workers:
+                worker.join(0 if self.cancelled else AppConfig.SHARD_JOIN_TIMEOUT)
+                if worker.is_alive():
+                    worker.terminate()
+                    worker.join()
+            self.scanning = False
+
+    def run(self, on_result=None, on_progress=None, on_limit=None) -> None:
+        """Run the sharded scan to completion, dispatching callbacks in the calling thread."""
+        callbacks = {'result': on_result, 'progress': on_progress, 'limit': on_limit}
+        for kind, payload in self.messages():
+            callback = callbacks[kind]
+            if callback is None:
+                continue
+            if kind == 'limit':
+                callback(*payload)
+            else:
+                callback(payload)
+
+    def results(self, on_limit=None, on_idle=None):
+        """Yield result records from every shard as they arrive.
+
+        `on_idle` is called after each progress message, when every record
+        covered by the shard cursors has been consumed.
+        """
+        for kind, payload in self.messages():
+            if kind == 'result':
+                yield payload
+            elif kind == 'limit' and on_limit:
+                on_limit(*payload)
+            elif kind == 'progress' and on_idle:
+                on_idle()
@@ -0,0 +1,222 @@
+import errno
+import threading
+from bisect import bisect_left
+from collections import deque
+
+from manager import TimeManager
+
+OUTCOME_OPEN = 'open'
+OUTCOME_REFUSED = 'refused'
+OUTCOME_TIMEOUT = 'timeout'
+OUTCOME_UNREACHABLE = 'unreachable'
+OUTCOME_OTHER_ERROR = 'other_error'
+# Probes aborted in flight by a cancelled scan.
+OUTCOME_CANCELLED = 'cancelled'
+
+# Local socket errors are counted under their errno name, e.g. 'EMFILE'.
+LOCAL_ERROR_NAMES = ('EMFILE', 'ENFILE', 'ENOBUFS', 'EADDRNOTAVAIL', 'EAGAIN')
+UNREACHABLE_ERRNOS = {
+    errno.ENETUNREACH,
+    errno.EHOSTUNREACH,
+    getattr(errno, 'EHOSTDOWN', errno.EHOSTUNREACH)
+}
+OUTCOMES = (
+    OUTCOME_OPEN, OUTCOME_REFUSED, OUTCOME_TIMEOUT, OUTCOME_UNREACHABLE
+) + LOCAL_ERROR_NAMES + (OUTCOME_OTHER_ERROR, OUTCOME_CANCELLED)
+
+# Upper bounds in seconds of the connect latency histogram buckets.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+RATE_WINDOW = 2.0
+
+def outcome_for_errno(number: int) -> str:
+    """Return the counter name for a socket error number."""
+    if number in UNREACHABLE_ERRNOS:
+        return OUTCOME_UNREACHABLE
+    name = errno.errorcode.get(number)
+    return name if name in LOCAL_ERROR_NAMES else OUTCOME_OTHER_ERROR
+
+class LatencyHistogram:
+    """Fixed-bucket histogram of connect latencies for answered probes."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS) -> None:
+        """Initialize empty buckets; the last count is for values above every bound."""
+        self.bounds = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """Add one latency in seconds."""
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += 1
+        self.sum += value
+
+    def quantile(self, q: float):
+        """Return the upper bound of the bucket holding the q-quantile, or None if empty."""
+        if not self.total:
+            return None
+        rank = q * self.total
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+class ScanTelemetry:
+    """Per-scan outcome counters, connect latency histogram, in-flight count and probe rate.
+
+    Counters are per connect attempt, so a retried timeout counts twice.
+    Updates come from the engine's event loop thread; readers only take
+    snapshots, so plain integer updates are sufficient.
+    """
+
+    def __init__(self) -> None:
+        """Initialize empty telemetry."""
+        self.counters = dict.fromkeys(OUTCOMES, 0)
+        self.latency = LatencyHistogram()
+        self.inflight = 0
+        self.peak_inflight = 0
+        self.start_time = TimeManager.get_current_time()
+        self.samples = deque()
+        self.lock = threading.Lock()
+
+    def probe_started(self) -> None:
+        """Count a connect attempt going out."""
+        self.inflight += 1
+        if self.inflight > self.peak_inflight:
+            self.peak_inflight = self.inflight
+
+    def probe_finished(self, outcome: str, latency: float = None) -> None:
+        """Count a finished connect attempt and its latency if the target answered."""
+        self.inflight -= 1
+        self.counters[outcome] += 1
+        if latency is not None:
+            self.latency.observe(latency)
+
+    def attempts(self) -> int:
+        """Return the number of finished connect attempts."""
+        return sum(self.counters.values())
+
+    def probes_per_second(self, now: float = None) -> float:
+        """Return the attempt rate over the last RATE_WINDOW seconds, or the average so far."""
+        now = TimeManager.get_current_time() if now is None else now
+        attempts = self.attempts()
+        with self.lock:
+            self.samples.append((now, attempts))
+            while len(self.samples) > 2 and now - self.samples[1][0] >= RATE_WINDOW:
+                self.samples.popleft()
+            then, before = self.samples[0]
+        if now - then < RATE_WINDOW / 4:
+            then, before = self.start_time, 0
+        elapsed = now - then
+        return (attempts - before) / elapsed if elapsed > 0 else 0.0
+
+    def snapshot(self) -> dict:
+        """Return a JSON-serializable summary."""
+        histogram = self.latency
+
+        def bound(value):
+            return '+Inf' if value == float('inf') else value
+
+        return {
+            'counters': dict(self.counters),
+            'attempts': self.attempts(),
+            'inflight': self.inflight,
+            'peak_inflight': self.peak_inflight,
+            'probes_per_second': round(self.probes_per_second(), 1),
+            'latency': {
+                'count': histogram.total,
+                'mean': histogram.sum / histogram.total if histogram.total else None,
+                'p50': bound(histogram.quantile(0.5)),
+                'p90': bound(histogram.quantile(0.9)),
+                'p99': bound(histogram.quantile(0.99)),
+                'buckets': dict(zip([str(bound) for bound in histogram.bounds] + ['+Inf'], histogram.counts))
+            }
+        }
+
+    def export(self) -> dict:
+        """Return the raw state, e.g. to send it from a shard to the parent process."""
+        return {
+            'counters': dict(self.counters),
+            'latency_counts': list(self.latency.counts),
+            'latency_sum': self.latency.sum,
+            'inflight': self.inflight,
+            'peak_inflight': self.peak_inflight
+        }
+
+    def combine(self, exports) -> None:
+        """Replace the totals with the sum of several exported states."""
+        self.counters = dict.fromkeys(OUTCOMES, 0)
+        self.latency = LatencyHistogram(self.latency.bounds)
+        inflight = peak_inflight = 0
+        for state in exports:
+            for outcome, count in state['counters'].items():
+                self.counters[outcome] = self.counters.get(outcome, 0) + count
+            for index, count in enumerate(state['latency_counts']):
+                self.latency.counts[index] += count
+            self.latency.total += sum(state['latency_counts'])
+            self.latency.sum += state['latency_sum']
+            inflight += state['inflight']
+            peak_inflight += state['peak_inflight']
+        self.inflight = inflight
+        self.peak_inflight = max(self.peak_inflight, peak_inflight)
+
+    def summary_line(self) -> str:
+        """Return a compact two-line summary for status displays."""
+        counters = self.counters
+        local_errors = sum(counters[name] for name in LOCAL_ERROR_NAMES)
+        p50 = self.latency.quantile(0.5)
+        p99 = self.latency.quantile(0.99)
+        latency = f"p50 <{p50 * 1000:g} ms, p99 <{p99 * 1000:g} ms" if p50 is not None else "no latency yet"
+        return (
+            f"Open {counters[OUTCOME_OPEN]} | Refused {counters[OUTCOME_REFUSED]} | "
+            f"Timeout {counters[OUTCOME_TIMEOUT]} | Unreachable {counters[OUTCOME_UNREACHABLE]} | "
+            f"Local errors {local_errors}\n"
+            f"In flight {self.inflight} (peak {self.peak_inflight}) | "
+            f"{self.probes_per_second():.0f} probes/s | {latency}"
+        )
+
+    def to_prometheus(self, labels: dict = None) -> str:
+        """Return the telemetry in the Prometheus text exposition format."""
+        label_text = ','.join(f'{key}="{value}"' for key, value in (labels or {}).items())
+
+        def series(name: str, extra: str = '') -> str:
+            joined = ','.join(part for part in (label_text, extra) if part)
+            return f"{name}{{{joined}}}" if joined else name
+
+        lines = [
+            "# HELP portscanner_probes_total Connect attempts by outcome.",
+            "# TYPE portscanner_probes_total counter"
+        ]
+        for outcome, count in self.counters.items():
+            label = f'outcome="{outcome}"'
+            lines.append(f"{series('portscanner_probes_total', label)} {count}")
+        lines += [
+            "# HELP portscanner_connect_latency_seconds Connect latency of answered probes.",
+            "# TYPE portscanner_connect_latency_seconds histogram"
+        ]
+        cumulative = 0
+        for bound, count in zip(list(self.latency.bounds) + ['+Inf'], self.latency.counts):
+            cumulative += count
+            label = f'le="{bound}"'
+            lines.append(f"{series('portscanner_connect_latency_seconds_bucket', label)} {cumulative}")
+        lines += [
+            f"{series('portscanner_connect_latency_seconds_sum')} {self.latency.sum}",
+            f"{series('portscanner_connect_latency_seconds_count')} {self.latency.total}",
+            "# HELP portscanner_inflight_probes Connect attempts in flight.",
+            "# TYPE portscanner_inflight_probes gauge",
+            f"{series('portscanner_inflight_probes')} {self.inflight}",
+            "# HELP portscanner_inflight_probes_peak Highest number of connect attempts in flight.",
+            "# TYPE portscanner_inflight_probes_peak gauge",
+            f"{series('portscanner_inflight_probes_peak')} {self.peak_inflight}",
+            "# HELP portscanner_probes_per_second Recent connect attempt rate.",
+            "# TYPE portscanner_probes_per_second gauge",
+            f"{series('portscanner_probes_per_second')} {self.probes_per_second():.1f}"
+        ]
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: str, labels: dict = None) -> None:
+        """Write the Prometheus text format to a file, e.g. for the node exporter textfile collector."""
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(self.to_prometheus(labels))